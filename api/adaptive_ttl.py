@@ -0,0 +1,57 @@
+"""
+TTL de cada feed segons la freqüència amb què canvia a Wikipedia
+"""
+from typing import Dict, Hashable, Optional
+import threading
+
+from api import metrics
+
+
+class AdaptiveTTL:
+    """
+    Tria el TTL de cada clau a partir dels refrescos anteriors
+
+    Cada vegada que es torna a descarregar un feed es compara el hash del
+    contingut amb el de l'última baixada: si no ha canviat el TTL es
+    multiplica per `factor` (fins a max_ttl) i si ha canviat es divideix
+    (fins a min_ttl). Els dies passats, que gairebé no s'editen, acaben amb
+    TTLs llargs i el d'avui, amb editors actius, amb TTLs curts.
+    """
+
+    def __init__(self, initial_ttl: float, min_ttl: float, max_ttl: float, factor: float = 2.0):
+        self.initial_ttl = min(max(initial_ttl, min_ttl), max_ttl)
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.factor = factor
+        self._state: Dict[Hashable, Dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: Hashable, content_hash: str) -> float:
+        """Registra una baixada de `key` i retorna el TTL amb què s'ha de desar"""
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                state = {'hash': content_hash, 'ttl': self.initial_ttl,
+                         'refreshes': 0, 'changes': 0}
+                self._state[key] = state
+            else:
+                changed = state['hash'] != content_hash
+                state['refreshes'] += 1
+                if changed:
+                    state['changes'] += 1
+                    state['ttl'] = max(self.min_ttl, state['ttl'] / self.factor)
+                else:
+                    state['ttl'] = min(self.max_ttl, state['ttl'] * self.factor)
+                state['hash'] = content_hash
+                metrics.FEED_REFRESHES.labels(result='changed' if changed else 'unchanged').inc()
+            ttl = state['ttl']
+        metrics.FEED_TTL.observe(ttl)
+        return ttl
+
+    def get(self, key: Hashable) -> Optional[Dict]:
+        """TTL actual, refrescos i canvis observats d'una clau (None si no s'ha vist mai)"""
+        with self._lock:
+            state = self._state.get(key)
+            return None if state is None else {
+                'ttl': state['ttl'], 'refreshes': state['refreshes'], 'changes': state['changes']
+            }
@@ -0,0 +1,54 @@
+"""
+Manifest dels fitxers estàtics generats per scripts/build_assets.py
+"""
+from typing import Dict, List, Optional
+import json
+import os
+import threading
+
+
+class AssetManifest:
+    """
+    Resol noms lògics ('app.js') a les URLs amb hash de static/dist
+
+    Si el manifest no existeix (no s'ha executat el build) retorna None i la
+    plantilla fa servir els fitxers originals. Es torna a llegir quan canvia
+    la data de modificació, perquè un build nou no requereixi reiniciar.
+    """
+
+    def __init__(self, path: str, url_prefix: str = '/static/dist/'):
+        self.path = path
+        self.url_prefix = url_prefix
+        self._manifest: Dict = {}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return {}
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    with open(self.path, encoding='utf-8') as f:
+                        self._manifest = json.load(f)
+                except (OSError, ValueError):
+                    self._manifest = {}
+                self._mtime = mtime
+            return self._manifest
+
+    def url(self, name: str) -> Optional[str]:
+        """URL amb hash d'un fitxer del bundle, o None si no s'ha generat"""
+        filename = self._load().get(name)
+        return self.url_prefix + filename if filename else None
+
+    def fonts(self) -> List[str]:
+        """URLs de les fonts autoallotjades que convé precarregar"""
+        return [self.url_prefix + filename for filename in self._load().get('fonts', [])]
+
+    def urls(self) -> List[str]:
+        """Totes les URLs del bundle (per precarregar-les, p.ex. al service worker)"""
+        manifest = self._load()
+        names = [value for key, value in manifest.items() if key != 'fonts']
+        return [self.url_prefix + filename for filename in names + manifest.get('fonts', [])]
@@ -0,0 +1,296 @@
+"""
+Operacions d'administració de la cache de feeds: invalidar, refrescar i precarregar
+
+Les claus s'escriuen com a idioma:tipus:mes:dia i qualsevol part pot ser
+'*' (p.ex. 'es:events:10:*' o '*:events:2:29'); les parts que falten al
+final també compten com a '*'. Cada worker té la seva pròpia cache en
+memòria: amb CacheBroadcast les operacions s'escriuen en un fitxer
+compartit que tots els workers llegeixen, i així es mantenen coherents
+sense reiniciar-los.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: el lock només és dins del procés
+    fcntl = None
+
+# Tipus de feed que es desen a la cache
+FEED_TYPES = ('events',)
+OPERATIONS = ('invalidate', 'refresh', 'warm')
+
+WILDCARD = '*'
+
+
+class CacheKeyPattern:
+    """Patró idioma:tipus:mes:dia amb comodins"""
+
+    def __init__(self, language: str, feed_type: str, month: Optional[int], day: Optional[int]):
+        self.language = language
+        self.feed_type = feed_type
+        self.month = month
+        self.day = day
+
+    @classmethod
+    def parse(cls, text: str) -> 'CacheKeyPattern':
+        """
+        Raises:
+            ValueError: si el patró no té el format idioma:tipus:mes:dia o la data no existeix
+        """
+        parts = str(text).strip().split(':')
+        if len(parts) > 4 or not parts[0]:
+            raise ValueError(f'Invalid cache key: {text!r}')
+        parts += [WILDCARD] * (4 - len(parts))
+        language, feed_type, month, day = parts
+        if feed_type != WILDCARD and feed_type not in FEED_TYPES:
+            raise ValueError(f'Unknown feed type: {feed_type!r}')
+        month = None if month == WILDCARD else int(month)
+        day = None if day == WILDCARD else int(day)
+        if month is not None and not 1 <= month <= 12:
+            raise ValueError(f'Invalid month: {month}')
+        if day is not None and not 1 <= day <= 31:
+            raise ValueError(f'Invalid day: {day}')
+        if month is not None and day is not None:
+            datetime(2024, month, day)  # any de traspàs: accepta 02-29
+        return cls(language, feed_type, month, day)
+
+    def matches(self, key: Tuple) -> bool:
+        """Si una clau de la cache (idioma, tipus, mes, dia) encaixa amb el patró"""
+        language, feed_type, month, day = key
+        return ((self.language == WILDCARD or self.language == language)
+                and (self.feed_type == WILDCARD or self.feed_type == feed_type)
+                and (self.month is None or self.month == month)
+                and (self.day is None or self.day == day))
+
+    def expand(self, languages: Sequence[str]) -> List[Tuple]:
+        """Totes les claus concretes del patró (per precarregar les que no hi són)"""
+        langs = languages if self.language == WILDCARD else [self.language]
+        types = FEED_TYPES if self.feed_type == WILDCARD else [self.feed_type]
+        first = datetime(2024, 1, 1)
+        dates = [first + timedelta(days=offset) for offset in range(366)]
+        return [(language, feed_type, date.month, date.day)
+                for language in langs for feed_type in types for date in dates
+                if self.matches((language, feed_type, date.month, date.day))]
+
+    def __str__(self) -> str:
+        return ':'.join([self.language, self.feed_type,
+                         WILDCARD if self.month is None else str(self.month),
+                         WILDCARD if self.day is None else str(self.day)])
+
+
+def format_key(key: Tuple) -> str:
+    return ':'.join(str(part) for part in key)
+
+
+class CacheBroadcast:
+    """
+    Difusió d'operacions entre workers a través d'un fitxer compartit (una línia JSON per operació)
+
+    Cada worker recorda fins on ha llegit i només aplica les operacions
+    dels altres. El fitxer comença amb una capçalera {"generation": N}:
+    quan supera max_bytes es mou a `path`.1 i se'n crea un de nou amb la
+    generació següent. Un lector que veu una generació nova acaba de llegir
+    l'anterior des de `path`.1 abans de començar la nova, de manera que no
+    es perd cap operació pendent. Si entre dues lectures hi ha hagut més
+    d'una rotació, poll() retorna un 'invalidate' de totes les claus.
+    Escriptors i lectors de tots els processos se sincronitzen amb flock
+    sobre `path`.lock.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024, worker_id: Optional[str] = None):
+        self.path = path
+        self.previous_path = path + '.1'
+        self.lock_path = path + '.lock'
+        self.max_bytes = max_bytes
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self._lock = threading.Lock()
+        # Un worker nou ja té la cache buida: no cal aplicar l'historial
+        with self._file_lock(shared=True):
+            self._generation = self._read_generation(self.path) or 0
+            self._offset = self._size(self.path)
+
+    @staticmethod
+    def _size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _read_generation(path: str) -> Optional[int]:
+        """Generació de la capçalera (None si el fitxer no existeix, 0 si no en té)"""
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+        except OSError:
+            return None
+        except ValueError:
+            return 0
+        generation = header.get('generation') if isinstance(header, dict) else None
+        return generation if isinstance(generation, int) else 0
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """Lock entre processos (flock); sense fcntl només protegeix aquest procés"""
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_from(path: str, offset: int) -> bytes:
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                return f.read()
+        except OSError:
+            return b''
+
+    def publish(self, op: str, keys: Sequence[str]):
+        """Afegeix una operació al fitxer perquè la vegin els altres workers"""
+        line = json.dumps({'origin': self.worker_id, 'op': op, 'keys': list(keys),
+                           'time': time.time()}) + '\n'
+        with self._lock, self._file_lock():
+            generation = self._read_generation(self.path)
+            if generation is None or self._size(self.path) > self.max_bytes:
+                if generation is not None:
+                    # Els lectors endarrerits encara hi trobaran les operacions pendents
+                    os.replace(self.path, self.previous_path)
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps({'generation': (generation or 0) + 1}) + '\n')
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def poll(self) -> List[Dict]:
+        """Operacions publicades per altres workers des de l'última lectura"""
+        with self._lock, self._file_lock(shared=True):
+            generation = self._read_generation(self.path) or 0
+            data = b''
+            missed = False
+            if generation != self._generation:
+                # El fitxer s'ha rotat: primer el que quedava de la generació anterior
+                previous = self._read_generation(self.previous_path)
+                nothing_pending = self._generation == 0 and self._offset == 0
+                if previous == self._generation:
+                    data = self._read_from(self.previous_path, self._offset)
+                elif previous is not None and previous == self._generation + 1 and nothing_pending:
+                    data = self._read_from(self.previous_path, 0)
+                elif not (generation == self._generation + 1 and nothing_pending):
+                    # Més d'una rotació des de l'última lectura: no se sap què s'ha perdut
+                    missed = True
+                    if previous is not None and previous < generation:
+                        data = self._read_from(self.previous_path, 0)
+                self._generation, self._offset = generation, 0
+            current = self._read_from(self.path, self._offset)
+            # Una línia a mig escriure (p.ex. sense flock) es llegirà a la propera passada
+            complete = current[:current.rfind(b'\n') + 1]
+            self._offset += len(complete)
+            data += complete
+
+        messages = []
+        if missed:
+            # Invalidar-ho tot sempre és segur: els feeds es tornaran a demanar
+            messages.append({'origin': None, 'op': 'invalidate', 'keys': [WILDCARD]})
+        for line in data.splitlines():
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get('origin') != self.worker_id \
+                    and message.get('op') in OPERATIONS:
+                messages.append(message)
+        return messages
+
+
+class CacheAdmin:
+    """Invalida, refresca o precarrega feeds de la cache d'un WikipediaClient"""
+
+    def __init__(self, client, languages: Callable[[], List[str]],
+                 broadcast: Optional[CacheBroadcast] = None):
+        """
+        Args:
+            client: WikipediaClient amb la cache de feeds
+            languages: Idiomes de Wikipedia als quals s'expandeix '*' en precarregar
+            broadcast: Difusió a la resta de workers (None = només aquest procés)
+        """
+        self.client = client
+        self.languages = languages
+        self.broadcast = broadcast
+
+    @staticmethod
+    def parse(keys: Sequence[str]) -> List[CacheKeyPattern]:
+        """
+        Raises:
+            ValueError: si alguna clau no és vàlida
+        """
+        return [CacheKeyPattern.parse(key) for key in keys]
+
+    def resident_keys(self, patterns: Sequence[CacheKeyPattern]) -> List[Tuple]:
+        """Claus de la cache que encaixen amb algun patró"""
+        return [key for key in self.client.cache.keys()
+                if len(key) == 4 and any(pattern.matches(key) for pattern in patterns)]
+
+    def target_keys(self, op: str, patterns: Sequence[CacheKeyPattern]) -> List[Tuple]:
+        """Claus sobre les quals actuarà una operació"""
+        if op == 'warm':
+            languages = self.languages()
+            keys = dict.fromkeys(key for pattern in patterns for key in pattern.expand(languages))
+            return [key for key in keys if not self.client.is_cached(key[2], key[3], key[0])]
+        return self.resident_keys(patterns)
+
+    def run(self, op: str, keys: Sequence[Tuple]) -> List[str]:
+        """
+        Executa una operació sobre claus concretes
+
+        Returns:
+            Les claus que s'han pogut invalidar, refrescar o carregar
+        """
+        done = []
+        for key in keys:
+            language, _, month, day = key
+            try:
+                if op == 'invalidate':
+                    if not self.client.invalidate_feed(month, day, language):
+                        continue
+                else:
+                    self.client.refresh_feed(month, day, language)
+            except Exception:
+                # Wikipedia no respon: la clau es queda com estava
+                continue
+            done.append(format_key(key))
+        return done
+
+    def publish(self, op: str, patterns: Sequence[CacheKeyPattern]):
+        if self.broadcast is not None:
+            self.broadcast.publish(op, [str(pattern) for pattern in patterns])
+
+    def apply_broadcast(self) -> int:
+        """
+        Aplica les operacions dels altres workers
+
+        Un refresc remot aquí només invalida: el feed es tornarà a demanar
+        quan algú el necessiti, i no tots els workers alhora.
+        """
+        if self.broadcast is None:
+            return 0
+        messages = self.broadcast.poll()
+        for message in messages:
+            try:
+                patterns = self.parse(message.get('keys', []))
+            except ValueError:
+                continue
+            op = 'invalidate' if message['op'] == 'refresh' else message['op']
+            self.run(op, self.target_keys(op, patterns))
+        return len(messages)
@@ -0,0 +1,305 @@
+"""
+Feed d'un dia amb índexs precalculats per servir-lo ràpidament
+"""
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+
+from api.feed_cache import approximate_size
+
+YEAR_PATTERN = re.compile(r'^\s*(-?\d+)\s*(.*)$')
+# Sufixos que indiquen un any abans de Crist (ca/es/en), ja sense punts ni espais
+BCE_SUFFIXES = ('bc', 'bce', 'ac', 'ane')
+# Absència d'entrada als LRU (un destacat pot ser None)
+_MISSING = object()
+
+
+def numeric_year(value) -> Optional[int]:
+    """
+    Converteix l'any d'un event a enter (negatiu abans de Crist)
+
+    Accepta enters i textos com '44 BC', '44 a. C.' o '-44'. Retorna None
+    si l'any no es pot interpretar.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if not isinstance(value, str):
+        return None
+    match = YEAR_PATTERN.match(value)
+    if not match:
+        return None
+    year = int(match.group(1))
+    suffix = re.sub(r'[\s.]', '', match.group(2)).lower()
+    if year > 0 and suffix in BCE_SUFFIXES:
+        return -year
+    return year
+
+
+def event_id(year, text: str) -> str:
+    """
+    Identificador estable d'un event dins del seu dia (hash de l'any i el text),
+    perquè el client pugui demanar-ne els detalls sense reenviar el text
+    """
+    return hashlib.sha1(f'{year}|{text}'.encode()).hexdigest()[:12]
+
+
+def _page_weight(event: Dict) -> float:
+    """Més pàgines enllaçades, més pes"""
+    return 1.0 + len(event.get('pages', []))
+
+
+def _extract_weight(event: Dict) -> float:
+    """Més text als extractes de les pàgines, més pes (1 punt per cada 200 caràcters)"""
+    return 1.0 + sum(len(page.get('extract', '')) for page in event.get('pages', [])) / 200
+
+
+def _ignore_resize(delta: int):
+    """on_resize per defecte: un feed sense cache propietària no ho comunica a ningú"""
+
+
+# Modes de selecció ponderada: nom -> funció de pes (sempre > 0)
+WEIGHTINGS: Dict[str, Callable[[Dict], float]] = {
+    'pages': _page_weight,
+    'extract': _extract_weight,
+}
+
+
+class AliasTable:
+    """
+    Taula d'àlies (mètode de Vose): mostreig ponderat en O(1) després d'una
+    construcció O(n)
+    """
+
+    def __init__(self, weights: List[float]):
+        n = len(weights)
+        self.probability = [0.0] * n
+        self.alias = [0] * n
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        for i in small + large:
+            self.probability[i] = 1.0
+
+    def sample(self, rng: random.Random = random) -> int:
+        """Retorna un índex amb probabilitat proporcional al seu pes"""
+        i = rng.randrange(len(self.probability))
+        return i if rng.random() < self.probability[i] else self.alias[i]
+
+
+class DayFeed:
+    """
+    Events d'un dia tal com venen de Wikipedia, més una vista ordenada per
+    any per fer consultes de rang amb bisect (O(log n))
+
+    Les estructures que es construeixen sota demanda (taules de mostreig,
+    variants serialitzades, destacats) estan acotades i, si el propietari
+    assigna `on_resize`, li comuniquen els bytes que hi afegeixen o en
+    treuen, perquè la cache que mesura el feed en tingui el compte exacte.
+    """
+
+    MAX_SERIALIZED = 16  # variants serialitzades (camps x destacat) per feed
+    MAX_FEATURED = 8     # llavors de destacat per feed (idioma, data...)
+
+    def __init__(self, events: List[Dict]):
+        self.events = events
+        dated = [(numeric_year(event.get('year')), event) for event in events]
+        dated = sorted((item for item in dated if item[0] is not None), key=lambda item: item[0])
+        self.years: List[int] = [year for year, _ in dated]
+        self.by_year: List[Dict] = [event for _, event in dated]
+        # Estructures de mostreig ponderat; es construeixen la primera vegada
+        # que es fan servir i viuen tant com el feed (una per clau de WEIGHTINGS)
+        self._alias_tables: Dict[str, AliasTable] = {}
+        self._cumulative_weights: Dict[str, List[float]] = {}
+        self.ids: List[str] = [event_id(event.get('year', 'Unknown'), event.get('text', ''))
+                               for event in events]
+        self.by_id: Dict[str, Dict] = dict(zip(self.ids, events))
+        # LRU acotats (MAX_SERIALIZED, MAX_FEATURED); el feed es comparteix entre
+        # fils, i consultar-los (move_to_end) o desar-hi (popitem) va amb el lock
+        self._memo_lock = threading.Lock()
+        self._serialized: 'OrderedDict[Tuple, Tuple[bytes, str]]' = OrderedDict()
+        self._featured: 'OrderedDict[Tuple[str, Optional[str]], Optional[Dict]]' = OrderedDict()
+        self.on_resize: Callable[[int], None] = _ignore_resize
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def get(self, identifier: str) -> Optional[Dict]:
+        """Event amb aquest identificador (vegeu event_id), o None"""
+        return self.by_id.get(identifier)
+
+    def serialized(self, key: Tuple, build: Callable[[], object]) -> Tuple[bytes, str]:
+        """
+        Una vista del feed ja serialitzada en JSON, i el seu ETag
+
+        `build` només s'executa la primera vegada per cada clau: les variants
+        (per camps, destacat...) es codifiquen un cop i viuen tant com el feed.
+        """
+        cached = self._recall(self._serialized, key)
+        if cached is not _MISSING:
+            return cached
+        body = json.dumps(build(), ensure_ascii=False, separators=(',', ':')).encode()
+        cached = (body, hashlib.sha256(body).hexdigest()[:32])
+        self._memoize(self._serialized, key, cached, self.MAX_SERIALIZED)
+        return cached
+
+    def compact(self, fields: Optional[Tuple[str, ...]] = None) -> Tuple[bytes, str]:
+        """
+        Tot el dia en format columnar (years, texts, hasDetails, ids), ja
+        serialitzat, i el seu ETag
+
+        Args:
+            fields: Camps a incloure ('id', 'year', 'text', 'hasDetails'),
+                en ordre canònic; None = tots
+        """
+        return self.serialized(('compact', fields), lambda: self._columns(fields))
+
+    def _columns(self, fields: Optional[Tuple[str, ...]]) -> Dict:
+        def wanted(field: str) -> bool:
+            return fields is None or field in fields
+
+        result = {'count': len(self.events)}
+        if wanted('year'):
+            result['years'] = [event.get('year', 'Unknown') for event in self.events]
+        if wanted('text'):
+            result['texts'] = [event.get('text', '') for event in self.events]
+        if wanted('hasDetails'):
+            result['hasDetails'] = [len(event.get('pages', [])) > 0 for event in self.events]
+        if wanted('id'):
+            result['ids'] = self.ids
+        return result
+
+    def featured(self, seed: str, weighted: Optional[str] = None) -> Optional[Dict]:
+        """
+        Event destacat, sempre el mateix per a una llavor (p.ex. idioma i data)
+
+        Cada event rep una puntuació a partir del hash de (llavor, id) i es
+        tria la menor (rendezvous hashing ponderat: -ln(u) / pes). No depèn
+        de l'ordre del feed ni del procés, i si Wikipedia afegeix o treu
+        events només canvia el destacat si el nou guanya o s'ha tret l'escollit.
+        """
+        if weighted is not None and weighted not in WEIGHTINGS:
+            raise ValueError(f'Unknown weighting: {weighted}')
+        key = (seed, weighted)
+        cached = self._recall(self._featured, key)
+        if cached is not _MISSING:
+            return cached
+        best, best_score = None, math.inf
+        for identifier, event in zip(self.ids, self.events):
+            digest = hashlib.sha256(f'{seed}|{identifier}'.encode()).digest()
+            u = (int.from_bytes(digest[:8], 'big') + 1) / (2 ** 64 + 1)  # (0, 1)
+            weight = WEIGHTINGS[weighted](event) if weighted else 1.0
+            score = -math.log(u) / weight
+            if score < best_score:
+                best, best_score = event, score
+        self._memoize(self._featured, key, best, self.MAX_FEATURED)
+        return best
+
+    def _recall(self, memo: 'OrderedDict', key: Tuple):
+        """Valor desat a un LRU (i el marca com a recent), o _MISSING"""
+        with self._memo_lock:
+            value = memo.get(key, _MISSING)
+            if value is not _MISSING:
+                memo.move_to_end(key)
+            return value
+
+    def _memoize(self, memo: 'OrderedDict', key: Tuple, value, max_entries: int):
+        """Desa `value` a un LRU acotat i comunica la variació de bytes"""
+        with self._memo_lock:
+            if key in memo:
+                return
+            memo[key] = value
+            delta = self._memo_size(key, value)
+            while len(memo) > max_entries:
+                old_key, old_value = memo.popitem(last=False)
+                delta -= self._memo_size(old_key, old_value)
+        # Fora del lock: on_resize entra al lock de la cache propietària
+        self._resized(delta)
+
+    @staticmethod
+    def _memo_size(key: Tuple, value) -> int:
+        # Els events destacats ja es compten amb el feed: només la clau
+        if isinstance(value, tuple):
+            return approximate_size((key, value))
+        return approximate_size(key)
+
+    def _resized(self, delta: int):
+        if delta:
+            self.on_resize(delta)
+
+    def year_range(self, year_from: Optional[int] = None,
+                   year_to: Optional[int] = None) -> Tuple[int, int]:
+        """Índexs [inici, fi) de `by_year` amb any dins de [year_from, year_to]"""
+        lo = 0 if year_from is None else bisect_left(self.years, year_from)
+        hi = len(self.years) if year_to is None else bisect_right(self.years, year_to)
+        return lo, max(lo, hi)
+
+    def events_in_range(self, year_from: Optional[int] = None,
+                        year_to: Optional[int] = None) -> List[Dict]:
+        """Events amb any dins del rang, ordenats per any"""
+        lo, hi = self.year_range(year_from, year_to)
+        return self.by_year[lo:hi]
+
+    def random_event(self, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                     rng: random.Random = random,
+                     weighted: Optional[str] = None) -> Optional[Dict]:
+        """
+        Event aleatori, opcionalment dins d'un rang d'anys, sense copiar la llista
+
+        Args:
+            weighted: Mode de ponderació de WEIGHTINGS ('pages', 'extract')
+                o None per triar uniformement
+        """
+        if weighted is not None and weighted not in WEIGHTINGS:
+            raise ValueError(f'Unknown weighting: {weighted}')
+
+        if year_from is None and year_to is None:
+            if not self.events:
+                return None
+            if weighted is None:
+                return rng.choice(self.events)
+            return self.events[self._alias_table(weighted).sample(rng)]
+
+        lo, hi = self.year_range(year_from, year_to)
+        if lo >= hi:
+            return None
+        if weighted is None:
+            return self.by_year[rng.randrange(lo, hi)]
+        # Dins d'un rang: pes acumulat sobre la vista per any + bisect, O(log n)
+        cumulative = self._cumulative(weighted)
+        start = cumulative[lo - 1] if lo > 0 else 0.0
+        target = start + rng.random() * (cumulative[hi - 1] - start)
+        return self.by_year[min(bisect_right(cumulative, target, lo, hi), hi - 1)]
+
+    def _alias_table(self, weighted: str) -> AliasTable:
+        table = self._alias_tables.get(weighted)
+        if table is None:
+            table = AliasTable([WEIGHTINGS[weighted](event) for event in self.events])
+            if weighted not in self._alias_tables:
+                self._alias_tables[weighted] = table
+                self._resized(approximate_size(table))
+        return table
+
+    def _cumulative(self, weighted: str) -> List[float]:
+        cumulative = self._cumulative_weights.get(weighted)
+        if cumulative is None:
+            cumulative = list(accumulate(WEIGHTINGS[weighted](event) for event in self.by_year))
+            if weighted not in self._cumulative_weights:
+                self._cumulative_weights[weighted] = cumulative
+                self._resized(approximate_size(cumulative))
+        return cumulative
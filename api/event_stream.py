@@ -0,0 +1,126 @@
+"""
+Server-Sent Events per a les pantalles en mode presentació
+
+Cada connexió és un generador que només es bloqueja a sleep(): amb workers
+gevent (gunicorn -c gunicorn.conf.py app:app, vegeu el Procfile) cada
+connexió oberta és un greenlet adormit i un procés n'aguanta milers. El
+registre de connexions és de cada worker: el límit es compta per procés.
+
+El generador és de tipus pull: el missatge següent no es prepara fins que
+el servidor ha escrit l'anterior, de manera que un client lent no acumula
+res a memòria, només retarda el seu propi flux.
+"""
+from typing import Callable, Iterator, Optional
+import threading
+import time
+
+from api import metrics
+
+
+class StreamLimitExceeded(Exception):
+    """S'ha arribat al màxim de connexions obertes en aquest procés"""
+
+
+def format_event(data: str, event: Optional[str] = None, event_id: Optional[str] = None,
+                 retry_ms: Optional[int] = None) -> str:
+    """Missatge en format text/event-stream"""
+    lines = []
+    if retry_ms is not None:
+        lines.append(f'retry: {retry_ms}')
+    if event:
+        lines.append(f'event: {event}')
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.extend(f'data: {line}' for line in data.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+
+HEARTBEAT = ': ping\n\n'
+
+
+class _Stream:
+    """Iterable de resposta que allibera la plaça en tancar-se, encara que no s'hagi llegit mai"""
+
+    def __init__(self, registry: 'EventStreamRegistry', generator: Iterator[str]):
+        self._registry = registry
+        self._generator = generator
+        self._closed = False
+
+    def __iter__(self) -> Iterator[str]:
+        return self._generator
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._generator.close()
+            self._registry._release()
+
+
+class EventStreamRegistry:
+    """
+    Connexions SSE obertes en aquest procés, amb límit, heartbeat i durada màxima
+
+    La durada màxima fa que els clients (EventSource) es tornin a connectar
+    de tant en tant, cosa que reparteix les connexions entre processos.
+    """
+
+    def __init__(self, max_connections: int, heartbeat: float = 15.0,
+                 max_duration: float = 3600.0, retry_ms: int = 5000,
+                 sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_connections = max_connections
+        self.heartbeat = heartbeat
+        self.max_duration = max_duration
+        self.retry_ms = retry_ms
+        self.sleep = sleep
+        self.clock = clock
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def open(self, next_message: Callable[[], Optional[str]], interval: float) -> _Stream:
+        """
+        Reserva una plaça i retorna el flux de missatges
+
+        Args:
+            next_message: Retorna el missatge següent ja formatat (None = cap
+                aquesta vegada; p.ex. Wikipedia no respon)
+            interval: Segons entre missatges
+
+        Raises:
+            StreamLimitExceeded: si ja hi ha max_connections obertes
+        """
+        with self._lock:
+            if self._active >= self.max_connections:
+                raise StreamLimitExceeded()
+            self._active += 1
+            metrics.STREAM_CONNECTIONS.set(self._active)
+        return _Stream(self, self._run(next_message, interval))
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            metrics.STREAM_CONNECTIONS.set(self._active)
+
+    def _run(self, next_message: Callable[[], Optional[str]], interval: float) -> Iterator[str]:
+        end = self.clock() + self.max_duration
+        # El primer missatge diu al client quant ha d'esperar per reconnectar
+        yield format_event('', event='open', retry_ms=self.retry_ms)
+        while True:
+            message = next_message()
+            # Sense missatge (p.ex. Wikipedia no respon) almenys es manté viva la connexió
+            yield message if message is not None else HEARTBEAT
+            due = min(self.clock() + interval, end)
+            while True:
+                remaining = due - self.clock()
+                if remaining <= 0:
+                    break
+                self.sleep(min(self.heartbeat, remaining))
+                if due - self.clock() > 0:
+                    # Manté viva la connexió als proxies i detecta clients desconnectats
+                    yield HEARTBEAT
+            if self.clock() >= end:
+                return
@@ -0,0 +1,241 @@
+"""
+Cache en memòria dels feeds de Wikipedia
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import sys
+import threading
+import time
+
+from api import metrics
+
+
+def approximate_size(value: Any) -> int:
+    """
+    Bytes aproximats que ocupa un objecte i tot el que referencia
+
+    Recorre dicts, llistes, tuples, sets, strings i atributs d'objectes,
+    comptant cada objecte una sola vegada (p.ex. els events de DayFeed
+    apareixen a diverses estructures però només ocupen un cop).
+    """
+    seen = set()
+    total = 0
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+            stack.append(vars(obj))
+    return total
+
+
+class _Entry:
+    __slots__ = ('value', 'ttl', 'expires_at', 'created_at', 'size', 'hits', 'priority')
+
+    def __init__(self, value: Any, ttl: float, size: int, priority: float):
+        self.value = value
+        self.ttl = ttl
+        self.created_at = time.monotonic()
+        self.expires_at = self.created_at + ttl
+        self.size = size
+        self.hits = 0
+        self.priority = priority
+
+
+class FeedCache:
+    """
+    Cache amb TTL, nombre màxim d'entrades i, opcionalment, pressupost de memòria
+
+    Sense pressupost de bytes s'expulsa l'entrada menys usada recentment
+    (LRU). Amb pressupost, s'expulsa la de menor prioritat GDSF
+    (Greedy-Dual-Size-Frequency): prioritat = rellotge + encerts / mida, de
+    manera que les entrades grans i poc consultades surten primer i les
+    antigues van perdent prioritat a mesura que avança el rellotge.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, name: str = 'feeds', max_bytes: int = 0,
+                 sizeof: Callable[[Any], int] = approximate_size):
+        """
+        Args:
+            ttl: Segons de validesa de cada entrada (0 = cache desactivada)
+            max_entries: Nombre màxim d'entrades residents
+            name: Nom de la cache a les mètriques
+            max_bytes: Pressupost de memòria aproximat (0 = sense límit de bytes)
+            sizeof: Funció que estima els bytes d'un valor
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._clock = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna el valor si és a la cache i no ha caducat"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                metrics.CACHE_EVICTIONS.labels(cache=self.name, reason='expired').inc()
+                self._update_gauges()
+                entry = None
+            if entry is None:
+                metrics.CACHE_REQUESTS.labels(cache=self.name, result='miss').inc()
+                return None
+            entry.hits += 1
+            entry.priority = self._priority(entry.hits, entry.size)
+            self._entries.move_to_end(key)
+        metrics.CACHE_REQUESTS.labels(cache=self.name, result='hit').inc()
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Desa un valor i expulsa entrades si se supera algun dels límits
+
+        Args:
+            ttl: Segons de validesa d'aquesta entrada (None = el TTL de la cache)
+        """
+        if not self.enabled:
+            return
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, self.ttl if ttl is None else ttl, size,
+                                        self._priority(0, size))
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes and self._bytes > self.max_bytes and len(self._entries) > 1):
+                self._evict_one(keep=key)
+                metrics.CACHE_EVICTIONS.labels(cache=self.name, reason='capacity').inc()
+            self._update_gauges()
+
+    def resize(self, key: Hashable, value: Any, delta: int):
+        """
+        Ajusta la mida d'una entrada que ha crescut (o decrescut) després de
+        desar-la, i expulsa'n d'altres si ara se supera el pressupost
+
+        Args:
+            value: El valor que ha canviat; si la clau ja apunta a un altre
+                (p.ex. s'ha refrescat), no es fa res
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.value is not value:
+                return
+            entry.size += delta
+            self._bytes += delta
+            entry.priority = self._priority(entry.hits, entry.size)
+            while self.max_bytes and self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._evict_one(keep=key)
+                metrics.CACHE_EVICTIONS.labels(cache=self.name, reason='capacity').inc()
+            self._update_gauges()
+
+    def _priority(self, hits: int, size: int) -> float:
+        # El +1 fa que una entrada nova no quedi per sota de les ja consultades
+        return self._clock + (hits + 1) / max(size, 1)
+
+    def _evict_one(self, keep: Hashable):
+        """Expulsa una entrada (mai `keep`, la que s'acaba de desar)"""
+        if not self.max_bytes:
+            victim = next(iter(self._entries))
+        else:
+            victim = min((k for k in self._entries if k != keep),
+                         key=lambda k: self._entries[k].priority)
+            self._clock = self._entries[victim].priority
+        self._remove(victim)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _update_gauges(self):
+        metrics.CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
+        metrics.CACHE_BYTES.labels(cache=self.name).set(self._bytes)
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Com get, però sense comptar hit/miss ni alterar l'ordre LRU"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        return entry.value
+
+    def remaining_ttl(self, key: Hashable) -> float:
+        """Segons que li queden a l'entrada abans de caducar (0 si no hi és)"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return 0.0
+        return max(0.0, entry.expires_at - time.monotonic())
+
+    def keys(self) -> List[Hashable]:
+        """Claus residents (còpia, per recórrer-les sense el lock)"""
+        with self._lock:
+            return list(self._entries)
+
+    def delete(self, key: Hashable) -> bool:
+        """Esborra una entrada; retorna si hi era"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            metrics.CACHE_EVICTIONS.labels(cache=self.name, reason='invalidated').inc()
+            self._update_gauges()
+        return True
+
+    def stats(self) -> Dict:
+        """
+        Estat de la cache per dimensionar-la: límits, ocupació i cada entrada
+        resident (clau, bytes, edat, TTL assignat i restant, encerts), de més gran a més petita
+        """
+        now = time.monotonic()
+        with self._lock:
+            items: List[Dict] = [{
+                'key': ':'.join(str(part) for part in key) if isinstance(key, tuple) else str(key),
+                'bytes': entry.size,
+                'ageSeconds': round(now - entry.created_at, 1),
+                'assignedTtlSeconds': round(entry.ttl, 1),
+                'ttlSeconds': round(max(0.0, entry.expires_at - now), 1),
+                'hits': entry.hits
+            } for key, entry in self._entries.items()]
+            total = self._bytes
+        items.sort(key=lambda item: item['bytes'], reverse=True)
+        return {
+            'name': self.name,
+            'entries': len(items),
+            'bytes': total,
+            'maxEntries': self.max_entries,
+            'maxBytes': self.max_bytes,
+            'ttl': self.ttl,
+            'items': items
+        }
+
+    def clear(self):
+        """Buida la cache"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._update_gauges()
+
+    def __len__(self) -> int:
+        return len(self._entries)
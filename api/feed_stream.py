@@ -0,0 +1,168 @@
+"""
+Lectura incremental dels feeds onthisday de Wikipedia
+
+Un feed d'un dia pot ocupar diversos MB, la major part en camps que no
+fem servir (extract_html, originalimage, URLs mòbils...). En lloc de
+carregar tot el JSON amb response.json(), es llegeix a trossos i cada event
+es descodifica i es redueix als camps útils tan bon punt arriba. Així el
+pic de memòria queda limitat a un tros més l'event més gran, sigui quina
+sigui la mida del feed.
+"""
+from typing import Any, Dict, Iterable, Iterator, List
+import codecs
+import json
+
+# Camps de cada pàgina que llegeixen DayFeed, SearchIndex i get_event_details
+PAGE_FIELDS = ('title', 'description', 'extract', 'revision')
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+# Un error a menys d'aquests caràcters del final pot ser un token tallat
+# ('fals', '\\u00e'); més enrere el JSON ja és invàlid i no cal llegir més
+_MAX_PARTIAL_TOKEN = 5
+_NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+
+def project_page(page: Dict) -> Dict:
+    """Redueix una pàgina als camps que fa servir l'aplicació"""
+    result = {field: page[field] for field in PAGE_FIELDS if field in page}
+    thumbnail = page.get('thumbnail')
+    if thumbnail and thumbnail.get('source'):
+        result['thumbnail'] = {'source': thumbnail['source']}
+    url = page.get('content_urls', {}).get('desktop', {}).get('page')
+    if url:
+        result['content_urls'] = {'desktop': {'page': url}}
+    return result
+
+
+def project_event(event: Dict) -> Dict:
+    """Redueix un event a year, text i les pàgines reduïdes"""
+    return {
+        'year': event.get('year'),
+        'text': event.get('text', ''),
+        'pages': [project_page(page) for page in event.get('pages') or []]
+    }
+
+
+class _JsonStream:
+    """Text JSON que es va llegint de trossos de bytes a mesura que cal"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def _read_more(self) -> bool:
+        if self.exhausted:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                # Es descarta el que ja s'ha consumit abans d'afegir més text
+                self.buffer = self.buffer[self.pos:] + self._decoder.decode(chunk)
+                self.pos = 0
+                return True
+        self.buffer = self.buffer[self.pos:] + self._decoder.decode(b'', final=True)
+        self.pos = 0
+        self.exhausted = True
+        return False
+
+    def _skip_whitespace(self) -> bool:
+        """Salta espais; False si el flux s'acaba abans d'un caràcter significatiu"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return True
+            if not self._read_more():
+                return False
+
+    def next_char(self) -> str:
+        """Salta espais i retorna el següent caràcter significatiu (sense consumir-lo)"""
+        if not self._skip_whitespace():
+            raise ValueError('Unexpected end of JSON stream')
+        return self.buffer[self.pos]
+
+    def expect_end(self):
+        """Comprova que després del valor arrel només queden espais"""
+        if self._skip_whitespace():
+            raise ValueError(f'Extra data after JSON value at position {self.pos}')
+
+    def expect(self, char: str):
+        if self.next_char() != char:
+            raise ValueError(f'Expected {char!r} at position {self.pos}')
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Descodifica el següent valor JSON complet"""
+        self.next_char()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as error:
+                truncated = (error.msg.startswith('Unterminated string')
+                             or len(self.buffer) - error.pos <= _MAX_PARTIAL_TOKEN)
+                # Un error que no ve de tallar el valor no es corregeix llegint més
+                if not truncated or not self._read_more():
+                    raise
+                continue
+            # Un número al final del buffer pot continuar al tros següent,
+            # també si s'ha tallat a mig exponent ('1.5e' + '-7')
+            tail = self.buffer[end:]
+            if (not self.exhausted and all(c in _NUMBER_CHARS for c in tail)
+                    and self._read_more()):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_array(stream: _JsonStream) -> Iterator[Any]:
+    """Elements d'un array JSON, un a un"""
+    stream.expect('[')
+    if stream.next_char() == ']':
+        stream.pos += 1
+        return
+    while True:
+        yield stream.value()
+        if stream.next_char() == ']':
+            stream.pos += 1
+            return
+        stream.expect(',')
+
+
+def parse_feed(chunks: Iterable[bytes]) -> Dict:
+    """
+    Llegeix un feed onthisday a partir dels trossos del cos de la resposta
+
+    Les llistes d'events (events, births, deaths...) es llegeixen element a
+    element i es redueixen amb project_event; la resta de claus es conserven.
+
+    Raises:
+        ValueError: si el cos no és un objecte JSON vàlid (també si hi ha
+            alguna cosa més que espais després de l'objecte)
+    """
+    stream = _JsonStream(chunks)
+    result: Dict[str, Any] = {}
+    stream.expect('{')
+    if stream.next_char() == '}':
+        stream.pos += 1
+        stream.expect_end()
+        return result
+    while True:
+        key = stream.value()
+        stream.expect(':')
+        if stream.next_char() == '[':
+            items: List[Any] = []
+            for item in iter_array(stream):
+                items.append(project_event(item) if isinstance(item, dict) else item)
+            result[key] = items
+        else:
+            result[key] = stream.value()
+        if stream.next_char() == '}':
+            stream.pos += 1
+            stream.expect_end()
+            return result
+        stream.expect(',')
@@ -0,0 +1,78 @@
+"""
+Camps parcials (?fields=) i retall dels textos de les respostes d'efemèrides
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+# Camps de les respostes de /today, /featured i de les columnes de /feed
+SUMMARY_FIELDS = ('id', 'year', 'text', 'hasDetails')
+# Camps de les respostes de /details i /details:batch
+DETAILS_FIELDS = ('year', 'text', 'description', 'thumbnail', 'thumbnailSrcset', 'links', 'related')
+
+
+def parse_fields(value: Optional[str], allowed: Iterable[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Interpreta un paràmetre fields=a,b,c
+
+    Returns:
+        Els camps en l'ordre d'`allowed` (així "text,year" i "year,text" són la
+        mateixa variant), o None si no se'n demana cap (= tots)
+
+    Raises:
+        ValueError: si hi ha algun camp desconegut
+    """
+    requested = {field.strip() for field in (value or '').split(',') if field.strip()}
+    if not requested:
+        return None
+    allowed = tuple(allowed)
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in allowed if field in requested)
+
+
+def parse_max_length(value) -> Optional[int]:
+    """
+    Interpreta una longitud màxima de text (buida = sense límit)
+
+    Raises:
+        ValueError: si no és un enter positiu
+    """
+    if value in (None, ''):
+        return None
+    length = int(value)
+    if length <= 0:
+        raise ValueError('Maximum length must be positive')
+    return length
+
+
+def select_fields(data: Dict, fields: Optional[Tuple[str, ...]]) -> Dict:
+    """Només els camps demanats (tots si fields és None)"""
+    if fields is None:
+        return data
+    return {field: data[field] for field in fields if field in data}
+
+
+def truncate_text(text: str, max_length: Optional[int]) -> str:
+    """Retalla un text a max_length caràcters, pel darrer espai, amb '…'"""
+    if max_length is None or len(text) <= max_length:
+        return text
+    cut = text[:max_length - 1]
+    space = cut.rfind(' ')
+    if space > max_length // 2:
+        cut = cut[:space]
+    return cut.rstrip(' ,;:.') + '…'
+
+
+def trim_details(details: Dict, max_extract: Optional[int]) -> Dict:
+    """Retalla la descripció i els extractes de les pàgines relacionades"""
+    if max_extract is None:
+        return details
+    details = dict(details)
+    if 'description' in details:
+        details['description'] = truncate_text(details['description'], max_extract)
+    if 'related' in details:
+        details['related'] = [
+            dict(page, extract=truncate_text(page.get('extract', ''), max_extract))
+            for page in details['related']
+        ]
+    return details
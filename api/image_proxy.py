@@ -0,0 +1,229 @@
+"""
+Proxy de miniatures de Wikipedia amb redimensionat i cache a disc
+"""
+from io import BytesIO
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+import hashlib
+import os
+import tempfile
+import threading
+
+import requests
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from api import metrics
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - Pillow és a requirements.txt
+    Image = None
+
+
+class ImageNotFound(Exception):
+    """El token no és vàlid o no apunta a un host permès"""
+
+
+class InvalidImage(Exception):
+    """L'original descarregat no és una imatge llegible (p.ex. pàgina d'error o JPEG truncat)"""
+
+
+class ImageProxy:
+    """
+    Descarrega cada miniatura una sola vegada, en genera versions WebP a
+    diverses amplades i les desa en una cache a disc limitada per mida
+    (s'esborren primer els fitxers menys usats recentment).
+
+    El token de /img/<token> és la URL original signada amb SECRET_KEY:
+    qualsevol worker el pot resoldre sense estat compartit i url_for no
+    toca el disc. El contingut d'un token no canvia mai i es pot servir
+    com a immutable. Els fitxers de la cache es diuen pel SHA-256 de la URL.
+    """
+
+    SALT = 'image-proxy'
+    LOCK_STRIPES = 64
+    CHUNK_SIZE = 64 * 1024
+    mimetype = 'image/webp'
+
+    def __init__(self, cache_dir: str, max_bytes: int, widths: Iterable[int] = (160, 320),
+                 allowed_hosts: Iterable[str] = ('upload.wikimedia.org',),
+                 session: Optional[requests.Session] = None, limiter=None, quality: int = 80,
+                 secret_key: str = 'dev-secret-key-change-in-production',
+                 max_download_bytes: int = 10 * 1024 * 1024):
+        if Image is None:
+            raise RuntimeError('IMAGE_PROXY_ENABLED requereix Pillow (pip install Pillow)')
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.widths = tuple(sorted(widths))
+        self.allowed_hosts = frozenset(allowed_hosts)
+        self.session = session or requests.Session()
+        self.limiter = limiter
+        self.quality = quality
+        self.max_download_bytes = max_download_bytes
+        self._serializer = URLSafeSerializer(secret_key, salt=self.SALT)
+        # Locks per franges: nombre fix, independent de quantes imatges hi hagi
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def url_for(self, source_url: str) -> Optional[Dict[str, str]]:
+        """
+        Retorna les URLs del proxy per una miniatura (sense accedir al disc)
+
+        Returns:
+            {'src': URL per defecte, 'srcset': URLs per amplada} o None si
+            la URL no és d'un host permès
+        """
+        if not self._is_allowed(source_url):
+            return None
+
+        token = self._serializer.dumps(source_url)
+        return {
+            'src': f'/img/{token}?w={self.widths[-1]}',
+            'srcset': ', '.join(f'/img/{token}?w={w} {w}w' for w in self.widths)
+        }
+
+    def get(self, token: str, width: Optional[int] = None) -> str:
+        """
+        Retorna el camí del fitxer redimensionat, generant-lo si cal
+
+        Raises:
+            ImageNotFound: si la signatura del token no és vàlida
+            requests.RequestException: si falla la descàrrega de l'original
+            InvalidImage: si l'original no es pot llegir com a imatge o
+                supera max_download_bytes
+        """
+        source_url = self._decode(token)
+        image_hash = hashlib.sha256(source_url.encode()).hexdigest()[:24]
+        width = self._snap_width(width)
+        path = self._path(f'{image_hash}-{width}.webp')
+
+        if self._touch(path):
+            metrics.IMAGE_CACHE_REQUESTS.labels(result='hit').inc()
+            return path
+
+        with self._lock_for(image_hash):
+            # Un altre fil pot haver-lo generat mentre esperàvem
+            if self._touch(path):
+                metrics.IMAGE_CACHE_REQUESTS.labels(result='hit').inc()
+                return path
+            metrics.IMAGE_CACHE_REQUESTS.labels(result='miss').inc()
+            original = self._download(source_url)
+            for variant_width, data in self._render(original):
+                self._write_atomic(self._path(f'{image_hash}-{variant_width}.webp'), data)
+        self._enforce_budget(keep=path)
+        return path
+
+    def _snap_width(self, width: Optional[int]) -> int:
+        """Ajusta l'amplada demanada a la més petita disponible que la cobreixi"""
+        if width is None:
+            return self.widths[-1]
+        for candidate in self.widths:
+            if candidate >= width:
+                return candidate
+        return self.widths[-1]
+
+    def _is_allowed(self, source_url) -> bool:
+        parsed = urlparse(source_url if isinstance(source_url, str) else '')
+        return parsed.scheme == 'https' and parsed.hostname in self.allowed_hosts
+
+    def _decode(self, token: str) -> str:
+        try:
+            source_url = self._serializer.loads(token or '')
+        except BadSignature:
+            raise ImageNotFound(token)
+        # Els hosts permesos poden haver canviat des que es va signar
+        if not self._is_allowed(source_url):
+            raise ImageNotFound(token)
+        return source_url
+
+    def _download(self, url: str) -> bytes:
+        if self.limiter is None:
+            return self._read(url)
+        with self.limiter.slot():
+            return self._read(url)
+
+    def _read(self, url: str) -> bytes:
+        """
+        Descarrega l'original a trossos i s'atura tan bon punt passa de
+        max_download_bytes, abans que Pillow el vegi
+
+        Raises:
+            InvalidImage: si l'original és massa gran
+        """
+        with self.session.get(url, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            declared = response.headers.get('Content-Length')
+            if declared and declared.isdigit() and int(declared) > self.max_download_bytes:
+                raise InvalidImage(f'Image too large: {declared} bytes')
+            buffer = BytesIO()
+            for chunk in response.iter_content(self.CHUNK_SIZE):
+                buffer.write(chunk)
+                if buffer.tell() > self.max_download_bytes:
+                    raise InvalidImage(f'Image larger than {self.max_download_bytes} bytes')
+            return buffer.getvalue()
+
+    def _render(self, original: bytes) -> Iterable[Tuple[int, bytes]]:
+        """
+        Genera les versions WebP (sense ampliar mai la imatge original)
+
+        Raises:
+            InvalidImage: si Pillow no la pot llegir o convertir
+        """
+        variants = []
+        try:
+            with Image.open(BytesIO(original)) as image:
+                image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+                for width in self.widths:
+                    variant = image.copy()
+                    if variant.width > width:
+                        variant.thumbnail((width, variant.height * width // variant.width or 1))
+                    buffer = BytesIO()
+                    variant.save(buffer, 'WEBP', quality=self.quality, method=4)
+                    variants.append((width, buffer.getvalue()))
+        except (OSError, Image.DecompressionBombError) as e:
+            # UnidentifiedImageError (HTML, JSON...) i fitxers truncats són OSError
+            raise InvalidImage(str(e)) from e
+        return variants
+
+    def _enforce_budget(self, keep: Optional[str] = None):
+        """
+        Esborra els fitxers menys usats fins que la cache cap dins del límit
+        (excepte `keep`, el fitxer que s'està a punt de servir)
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.webp') and entry.path != keep:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                metrics.IMAGE_CACHE_EVICTIONS.inc()
+            except FileNotFoundError:
+                pass
+
+    def _touch(self, path: str) -> bool:
+        """Marca el fitxer com a usat ara (per l'LRU); False si no existeix"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _lock_for(self, image_hash: str) -> threading.Lock:
+        return self._locks[int(image_hash[:8], 16) % self.LOCK_STRIPES]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def _write_atomic(self, path: str, data: bytes):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,172 @@
+"""
+Mètriques Prometheus de l'aplicació
+
+Totes les mètriques viuen en un registre propi perquè /metrics només
+exposi les de l'aplicació. Els comptadors i histogrames de
+prometheus_client són thread-safe i barats d'actualitzar, de manera que
+la instrumentació es pot deixar activa en producció.
+
+Amb diversos workers (gunicorn), cada procés té els seus comptadors. Si
+PROMETHEUS_MULTIPROC_DIR està definit (gunicorn.conf.py ho fa), cada worker
+els escriu en fitxers d'aquest directori i /metrics els suma tots, de
+manera que cada scrape veu el servidor sencer i no un worker a l'atzar.
+"""
+from typing import Callable, List, Tuple
+import os
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+    CONTENT_TYPE_LATEST
+)
+
+REGISTRY = CollectorRegistry(auto_describe=True)
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+# Gauges llegits d'una funció (vegeu track)
+_TRACKED: List[Tuple[Gauge, Callable[[], float]]] = []
+
+# Buckets de latència (segons) i de mida (bytes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Peticions HTTP a Flask
+HTTP_REQUESTS = Counter(
+    'ephemerides_http_requests_total',
+    'Peticions HTTP servides, per ruta, mètode i codi d\'estat',
+    ['route', 'method', 'status'], registry=REGISTRY
+)
+HTTP_LATENCY = Histogram(
+    'ephemerides_http_request_duration_seconds',
+    'Latència de les peticions HTTP per ruta',
+    ['route', 'method', 'status'], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    'ephemerides_http_response_size_bytes',
+    'Mida del cos de les respostes HTTP per ruta',
+    ['route'], buckets=SIZE_BUCKETS, registry=REGISTRY
+)
+HTTP_IN_FLIGHT = Gauge(
+    'ephemerides_http_requests_in_flight',
+    'Peticions HTTP en curs',
+    multiprocess_mode='livesum', registry=REGISTRY
+)
+
+# Peticions a Wikipedia
+UPSTREAM_LATENCY = Histogram(
+    'ephemerides_upstream_request_duration_seconds',
+    'Latència de les peticions a Wikipedia per idioma i codi d\'estat',
+    ['language', 'status'], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+UPSTREAM_RESPONSE_SIZE = Histogram(
+    'ephemerides_upstream_response_size_bytes',
+    'Mida de les respostes de Wikipedia per idioma',
+    ['language'], buckets=SIZE_BUCKETS, registry=REGISTRY
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    'ephemerides_upstream_requests_in_flight',
+    'Peticions a Wikipedia en curs',
+    multiprocess_mode='livesum', registry=REGISTRY
+)
+UPSTREAM_QUEUE_DEPTH = Gauge(
+    'ephemerides_upstream_queue_depth',
+    'Peticions esperant capacitat per anar a Wikipedia',
+    multiprocess_mode='livesum', registry=REGISTRY
+)
+UPSTREAM_HEDGES = Counter(
+    'ephemerides_upstream_hedges_total',
+    'Peticions duplicades enviades pel hedging',
+    registry=REGISTRY
+)
+
+# Caches en memòria (cache = feeds, summaries)
+CACHE_REQUESTS = Counter(
+    'ephemerides_feed_cache_requests_total',
+    'Consultes a les caches en memòria (hit/miss)',
+    ['cache', 'result'], registry=REGISTRY
+)
+CACHE_EVICTIONS = Counter(
+    'ephemerides_feed_cache_evictions_total',
+    'Entrades expulsades de les caches en memòria, per motiu',
+    ['cache', 'reason'], registry=REGISTRY
+)
+CACHE_ENTRIES = Gauge(
+    'ephemerides_feed_cache_entries',
+    'Entrades residents a cada cache en memòria',
+    ['cache'], multiprocess_mode='livesum', registry=REGISTRY
+)
+CACHE_BYTES = Gauge(
+    'ephemerides_feed_cache_bytes',
+    'Memòria aproximada (bytes) que ocupen les entrades de cada cache',
+    ['cache'], multiprocess_mode='livesum', registry=REGISTRY
+)
+
+# TTL adaptatiu dels feeds
+FEED_TTL = Histogram(
+    'ephemerides_feed_cache_ttl_seconds',
+    'TTL triat per a cada feed desat a la cache',
+    buckets=(60, 300, 900, 1800, 3600, 7200, 14400, 28800, 43200, 86400, 172800),
+    registry=REGISTRY
+)
+FEED_REFRESHES = Counter(
+    'ephemerides_feed_refreshes_total',
+    'Feeds tornats a descarregar, segons si el contingut havia canviat',
+    ['result'], registry=REGISTRY
+)
+
+# Proxy de miniatures
+IMAGE_CACHE_REQUESTS = Counter(
+    'ephemerides_image_cache_requests_total',
+    'Consultes a la cache de miniatures redimensionades (hit/miss)',
+    ['result'], registry=REGISTRY
+)
+IMAGE_CACHE_EVICTIONS = Counter(
+    'ephemerides_image_cache_evictions_total',
+    'Fitxers esborrats de la cache de miniatures per mantenir-la dins del límit',
+    registry=REGISTRY
+)
+
+
+# Connexions SSE (/api/ephemeris/stream)
+STREAM_CONNECTIONS = Gauge(
+    'ephemerides_stream_connections',
+    'Connexions SSE obertes',
+    multiprocess_mode='livesum', registry=REGISTRY
+)
+
+
+# Logs
+LOG_RECORDS_DROPPED = Counter(
+    'ephemerides_log_records_dropped_total',
+    'Registres de log descartats (duplicats dins de la finestra o cua plena)',
+    ['reason'], registry=REGISTRY
+)
+
+
+def track(gauge: Gauge, read: Callable[[], float]):
+    """
+    Fa que `gauge` reflecteixi read()
+
+    En un sol procés es llegeix en el moment de servir /metrics. En mode
+    multiprocés /metrics només llegeix els fitxers dels workers, així que
+    cada worker ha de desar el valor periòdicament amb sample_tracked().
+    """
+    if MULTIPROCESS:
+        _TRACKED.append((gauge, read))
+    else:
+        gauge.set_function(read)
+
+
+def sample_tracked():
+    """Desa el valor actual dels gauges de track() (només en mode multiprocés)"""
+    for gauge, read in _TRACKED:
+        gauge.set(read())
+
+
+def render():
+    """Retorna (cos, content type) de l'exposició Prometheus"""
+    if MULTIPROCESS:
+        sample_tracked()
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
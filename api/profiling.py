@@ -0,0 +1,99 @@
+"""
+Temporitzadors per fases (Server-Timing) i profiler opcional per petició
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional, Tuple
+import cProfile
+import os
+import random
+import re
+import time
+
+from itsdangerous import BadSignature, TimestampSigner
+
+
+class ServerTiming:
+    """Acumula la durada de cada fase d'una petició per la capçalera Server-Timing"""
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        """Mesura la durada del bloc com la fase `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - start) * 1000))
+
+    def header_value(self, total_ms: Optional[float] = None) -> str:
+        """Valor de la capçalera, p.ex. 'fetch;dur=12.3, match;dur=0.1'"""
+        entries = [f'{name};dur={duration:.1f}' for name, duration in self.phases]
+        if total_ms is not None:
+            entries.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(entries)
+
+
+class RequestProfiler:
+    """
+    Profiler cProfile opt-in per petició
+
+    S'activa per una fracció de peticions (sample_rate) o quan la petició
+    porta un token signat a la capçalera. Només es desen a disc els perfils
+    de peticions lentes (o totes les forçades amb token).
+    """
+
+    SALT = 'request-profile'
+
+    def __init__(self, directory: str, secret_key: str, sample_rate: float = 0.0,
+                 slow_ms: float = 500, token_max_age: int = 86400):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.token_max_age = token_max_age
+        self._signer = TimestampSigner(secret_key, salt=self.SALT)
+
+    def make_token(self) -> str:
+        """Genera un token vàlid per forçar el profiling d'una petició"""
+        return self._signer.sign('profile').decode()
+
+    def is_valid_token(self, token: Optional[str]) -> bool:
+        if not token:
+            return False
+        try:
+            self._signer.unsign(token, max_age=self.token_max_age)
+            return True
+        except BadSignature:
+            return False
+
+    def start(self, forced: bool = False) -> Optional[cProfile.Profile]:
+        """Inicia el profiler si la petició ha estat seleccionada"""
+        if not forced and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Ja hi ha un altre profiler actiu en aquest procés
+            return None
+        return profiler
+
+    def finish(self, profiler: cProfile.Profile, route: str, duration_ms: float,
+               forced: bool = False) -> Optional[str]:
+        """
+        Atura el profiler i desa el perfil si la petició ha estat lenta
+
+        Returns:
+            Ruta del fitxer .prof desat, o None
+        """
+        profiler.disable()
+        if not forced and duration_ms < self.slow_ms:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        path = os.path.join(self.directory, f'{stamp}-{slug}-{duration_ms:.0f}ms.prof')
+        profiler.dump_stats(path)
+        return path
@@ -0,0 +1,124 @@
+"""
+Limitació de peticions a Wikipedia: token bucket + concurrència màxima
+"""
+from contextlib import contextmanager
+import math
+import threading
+import time
+from typing import Optional
+
+
+class UpstreamOverloadedError(Exception):
+    """La petició a Wikipedia no es pot fer dins del termini i es descarta"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Valor per la capçalera HTTP Retry-After (segons enters)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """
+    Token bucket amb reserves: cada petició reserva un token i espera fins
+    que li correspon. Si l'espera supera el termini, no es reserva res.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, deadline: float) -> float:
+        """
+        Reserva un token i retorna els segons que cal esperar per usar-lo
+
+        Raises:
+            UpstreamOverloadedError: si el token no estaria disponible abans del termini
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait_time = max(0.0, (1 - self._tokens) / self.rate)
+            if wait_time > 0 and now + wait_time > deadline:
+                raise UpstreamOverloadedError('Upstream rate limit exceeded', wait_time)
+            self._tokens -= 1
+            return wait_time
+
+    def refund(self):
+        """Retorna un token reservat que no s'ha arribat a fer servir"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def penalize(self, seconds: float):
+        """Buida el bucket perquè no es facin peticions durant `seconds` (p.ex. després d'un 429)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -self.rate * seconds)
+
+
+class UpstreamLimiter:
+    """Combina el token bucket amb un semàfor de peticions concurrents"""
+
+    def __init__(self, rate: float, burst: float, max_concurrency: int, queue_timeout: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+
+    @property
+    def waiting(self) -> int:
+        """Peticions en cua esperant token o slot"""
+        return self._waiting
+
+    @property
+    def in_flight(self) -> int:
+        """Peticions a Wikipedia en curs"""
+        return self._in_flight
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """
+        Espera un token i un slot de concurrència dins del termini
+
+        Raises:
+            UpstreamOverloadedError: si no s'aconsegueixen abans del termini
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._lock:
+            self._waiting += 1
+        try:
+            wait_time = self.bucket.reserve(deadline)
+            if wait_time > 0:
+                time.sleep(wait_time)
+            if not self._semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                # La petició no surt: el token reservat torna al bucket
+                self.bucket.refund()
+                raise UpstreamOverloadedError('Too many concurrent upstream requests', 1.0)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._semaphore.release()
@@ -0,0 +1,76 @@
+"""
+Traça compacta de les peticions reals per reproduir-les en proves de càrrega
+
+Cada petició a l'API es desa com una línia JSON curta (instant, ruta,
+idioma, dia demanat, elements d'un batch, estat i durada), sense IPs ni
+textos dels events. L'escriptura passa per un LogPipeline, com la resta de
+logs, de manera que no frena les peticions. benchmarks/replay.py llegeix
+aquestes traces i les torna a llançar contra el mock de Wikipedia.
+
+    {"t":1760870400.123,"r":"/api/ephemeris/details","l":"ca","d":"10-19","s":200,"ms":4.1}
+"""
+from typing import Dict, Iterable, List, Optional
+import json
+import logging
+
+TRACE_LOGGER = 'ephemerides.trace'
+
+# Rutes que es desen a la traça (la resta no depenen de Wikipedia ni de la cache)
+TRACED_ROUTES = (
+    '/api/ephemeris/today',
+    '/api/ephemeris/feed',
+    '/api/ephemeris/featured',
+    '/api/ephemeris/details',
+    '/api/ephemeris/details:batch',
+    '/api/ephemeris/search',
+    '/api/translations/<lang>',
+)
+
+
+class TraceFormatter(logging.Formatter):
+    """Només els camps de la petició, sense metadades del log"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(getattr(record, 'fields', None) or {}, separators=(',', ':'))
+
+
+def trace_entry(timestamp: float, route: str, language: Optional[str], date: str,
+                status: int, elapsed: float, items: Optional[int] = None) -> Dict:
+    """
+    Línia de traça d'una petició
+
+    Args:
+        timestamp: Instant de la petició (segons epoch)
+        route: Regla de Flask (p.ex. '/api/translations/<lang>')
+        language: Idioma de la UI demanat
+        date: Dia demanat, MM-DD
+        status: Codi HTTP de la resposta
+        elapsed: Durada en segons
+        items: Nombre d'events demanats (només details:batch)
+    """
+    entry = {'t': round(timestamp, 3), 'r': route, 'l': language, 'd': date,
+             's': status, 'ms': round(elapsed * 1000, 1)}
+    if items is not None:
+        entry['n'] = items
+    return entry
+
+
+def load_trace(paths: Iterable[str]) -> List[Dict]:
+    """
+    Llegeix una o més traces (p.ex. una per worker) i les ordena per instant
+
+    Les línies incompletes o d'altres rutes es descarten.
+    """
+    entries = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and entry.get('r') in TRACED_ROUTES \
+                        and isinstance(entry.get('t'), (int, float)):
+                    entries.append(entry)
+    entries.sort(key=lambda entry: entry['t'])
+    return entries
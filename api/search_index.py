@@ -0,0 +1,131 @@
+"""
+Índex invertit en memòria per cercar text als events ja carregats
+"""
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+import re
+import threading
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Paraules massa comunes per ser útils en una cerca (ja plegades, sense accents)
+STOPWORDS = frozenset('''
+    a al als amb de del dels el els en es i la les o per que un una uns unes
+    con las los por se y
+    an and as at by for from in is of on or the to was with
+'''.split())
+
+
+def fold(text: str) -> str:
+    """Minúscules i sense accents, perquè 'Revolución' i 'revolucion' coincideixin"""
+    # El punt volat del català (col·legi) no ha de partir paraules
+    text = text.replace('·', '').replace('ŀ', 'l')
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens plegats, sense paraules buides ni tokens d'un sol caràcter"""
+    return [token for token in TOKEN_PATTERN.findall(fold(text).replace('_', ' '))
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+class SearchIndex:
+    """
+    Índex invertit per idioma: terme -> {document: freqüència}
+
+    Es construeix de manera incremental: cada feed que es carrega substitueix
+    els documents que aquell mateix dia tenia a l'índex.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, Dict[int, int]]] = defaultdict(
+            lambda: defaultdict(dict))
+        self._docs: Dict[int, Tuple[Dict, Tuple[str, ...]]] = {}
+        self._feed_docs: Dict[Tuple[str, int, int], List[int]] = {}
+        self._next_id = 0
+
+    def add_feed(self, language: str, month: int, day: int, events: List[Dict]):
+        """Indexa (o reindexa) els events d'un dia"""
+        prepared = []
+        for event in events:
+            pages = event.get('pages', [])
+            content = ' '.join([event.get('text', '')] + [page.get('title', '') for page in pages])
+            prepared.append((Counter(tokenize(content)), {
+                'year': event.get('year', 'Unknown'),
+                'text': event.get('text', ''),
+                'month': month,
+                'day': day,
+                'hasDetails': len(pages) > 0
+            }))
+
+        with self._lock:
+            self._remove_feed(language, month, day)
+            postings = self._postings[language]
+            doc_ids = []
+            for terms, doc in prepared:
+                doc_id = self._next_id
+                self._next_id += 1
+                self._docs[doc_id] = (doc, tuple(terms))
+                for term, count in terms.items():
+                    postings[term][doc_id] = count
+                doc_ids.append(doc_id)
+            self._feed_docs[(language, month, day)] = doc_ids
+
+    def remove_feed(self, language: str, month: int, day: int):
+        """Treu de l'índex els events d'un dia"""
+        with self._lock:
+            self._remove_feed(language, month, day)
+
+    def _remove_feed(self, language: str, month: int, day: int):
+        postings = self._postings[language]
+        for doc_id in self._feed_docs.pop((language, month, day), []):
+            _, terms = self._docs.pop(doc_id)
+            for term in terms:
+                docs = postings.get(term)
+                if docs is not None:
+                    docs.pop(doc_id, None)
+                    if not docs:
+                        del postings[term]
+
+    def search(self, query: str, language: str, limit: int = 20) -> Tuple[int, List[Dict]]:
+        """
+        Cerca events que continguin tots els termes de la consulta
+
+        Returns:
+            (total de coincidències, resultats ordenats per freqüència dels termes)
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+
+        with self._lock:
+            postings = self._postings.get(language, {})
+            term_docs = [postings.get(term) for term in terms]
+            if not all(term_docs):
+                return 0, []
+            # Es parteix de la llista més curta per fer la intersecció més barata
+            term_docs.sort(key=len)
+            candidates = set(term_docs[0])
+            for docs in term_docs[1:]:
+                candidates.intersection_update(docs)
+            scored = sorted(
+                ((sum(docs[doc_id] for docs in term_docs), doc_id) for doc_id in candidates),
+                key=lambda item: (-item[0], item[1])
+            )
+            results = [dict(self._docs[doc_id][0]) for _, doc_id in scored[:limit]]
+        return len(scored), results
+
+    def clear(self):
+        """Buida l'índex"""
+        with self._lock:
+            self._postings.clear()
+            self._docs.clear()
+            self._feed_docs.clear()
+
+    def indexed_days(self, language: str) -> int:
+        """Nombre de dies indexats per un idioma"""
+        with self._lock:
+            return sum(1 for key in self._feed_docs if key[0] == language)
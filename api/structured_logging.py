@@ -0,0 +1,207 @@
+"""
+Logs estructurats (JSON) escrits des d'un fil de fons
+
+Els fils de les peticions només posen el registre en una cua acotada
+(QueueHandler); un QueueListener el formata i l'escriu. Si la sortida es
+bloqueja, la cua s'omple i els registres nous es descarten (i es
+compten) en lloc de frenar les peticions. Els errors repetits (p.ex. tots
+els de Wikipedia durant una caiguda) es deduplicen abans d'entrar a la cua.
+
+Amb gunicorn i workers gevent (Procfile) threading està parchejat i un
+threading.Thread seria un greenlet més del mateix fil: una escriptura
+bloquejada a stderr aturaria tot el procés. Per això l'escriptor és un fil
+natiu (l'original de threading) i la cua fa servir un lock natiu que les
+peticions només alliberen, sense bloquejar-se mai.
+"""
+from typing import Any, Dict, Optional, TextIO, Tuple, Union
+import _thread
+import collections
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+
+from api import metrics
+
+ACCESS_LOGGER = 'ephemerides.access'
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línia JSON per registre; els camps de extra={'fields': {...}} van al primer nivell"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeduplicateFilter(logging.Filter):
+    """
+    Deixa passar un sol registre igual (mateix logger, nivell i missatge) per finestra
+
+    Només s'aplica a partir de `level`. Quan passa la finestra, el registre
+    següent porta `suppressed` amb el nombre de repeticions descartades.
+    """
+
+    def __init__(self, window: float, level: int = logging.WARNING, max_keys: int = 1000):
+        super().__init__()
+        self.window = window
+        self.level = level
+        self.max_keys = max_keys
+        self._seen: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.window <= 0 or record.levelno < self.level:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.window:
+                seen[1] += 1
+                metrics.LOG_RECORDS_DROPPED.labels(reason='duplicate').inc()
+                return False
+            if seen is None and len(self._seen) >= self.max_keys:
+                # Missatges tots diferents: s'obliden els més antics
+                oldest = min(self._seen, key=lambda k: self._seen[k][0])
+                del self._seen[oldest]
+            record.suppressed = seen[1] if seen is not None else 0
+            self._seen[key] = [now, 0]
+        return True
+
+
+def original(module: str, name: str, default: Any) -> Any:
+    """Objecte original de la llibreria estàndard encara que gevent l'hagi parchejat"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return default
+    return monkey.get_original(module, name)
+
+
+class NativeQueue:
+    """
+    Cua acotada entre les peticions i un fil natiu
+
+    queue.Queue es construeix amb els locks de threading, que gevent
+    substitueix; aquesta només fa servir un lock natiu com a senyal. Posar
+    un registre no bloqueja mai; només espera el fil escriptor.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self._items = collections.deque()
+        self._wakeup = original('_thread', 'allocate_lock', _thread.allocate_lock)()
+        self._wakeup.acquire()
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def put_nowait(self, item, force: bool = False):
+        """
+        Args:
+            force: Posa l'element encara que la cua sigui plena
+
+        Raises:
+            queue.Full: si la cua ja té maxsize elements (i no és force)
+        """
+        if not force and self.maxsize > 0 and len(self._items) >= self.maxsize:
+            raise queue.Full
+        self._items.append(item)
+        try:
+            self._wakeup.release()
+        except RuntimeError:
+            pass  # ja hi havia un senyal pendent
+
+    def get(self, block: bool = True):
+        while True:
+            try:
+                return self._items.popleft()
+            except IndexError:
+                if not block:
+                    raise queue.Empty
+                self._wakeup.acquire()
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+
+class NativeQueueListener(logging.handlers.QueueListener):
+    """QueueListener que escriu des d'un fil natiu, també amb gevent"""
+
+    def start(self):
+        thread_class = original('threading', 'Thread', threading.Thread)
+        self._thread = thread_class(target=self._monitor, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def enqueue_sentinel(self):
+        # Amb la cua plena stop() no acabaria mai: la sentinella sempre hi cap
+        self.queue.put_nowait(self._sentinel, force=True)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que descarta el registre si la cua és plena i no formata res
+    al fil de la petició
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Només s'apliquen els arguments del missatge; la traça es formata al fil de fons
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_RECORDS_DROPPED.labels(reason='queue_full').inc()
+
+
+def sample_access(status: int, rate: float) -> bool:
+    """Les respostes amb error es registren sempre; les correctes, amb probabilitat `rate`"""
+    return status >= 400 or random.random() < rate
+
+
+class LogPipeline:
+    """Cua, handler i fil escriptor dels logs de l'aplicació"""
+
+    def __init__(self, stream: Optional[TextIO] = None, queue_size: int = 10000,
+                 dedup_window: float = 60.0, formatter: Optional[logging.Formatter] = None):
+        self.queue = NativeQueue(maxsize=queue_size)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(DeduplicateFilter(dedup_window))
+        output = logging.StreamHandler(stream)
+        output.setFormatter(formatter or JsonFormatter())
+        self.listener = NativeQueueListener(self.queue, output, respect_handler_level=True)
+
+    def attach(self, logger: logging.Logger, level: Union[int, str] = logging.INFO):
+        """Fa que `logger` escrigui només a través de la cua"""
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(self.handler)
+        logger.setLevel(level)
+        logger.propagate = False
+
+    def start(self) -> 'LogPipeline':
+        self.listener.start()
+        return self
+
+    def stop(self):
+        """Buida la cua i atura el fil escriptor"""
+        self.listener.stop()
@@ -1,18 +1,110 @@
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional
-import random
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+import hashlib
+import threading
+import time
+from api import metrics
+from api.adaptive_ttl import AdaptiveTTL
+from api.day_feed import DayFeed
+from api.feed_cache import FeedCache
+from api.feed_stream import CHUNK_SIZE, parse_feed
+from api.rate_limit import UpstreamLimiter, UpstreamOverloadedError
+from api.search_index import SearchIndex
 
 class WikipediaClient:
     """Client per obtenir efemèrides de Wikipedia"""
 
-    def __init__(self, base_url_template: str):
+    # Mostres mínimes abans de fer servir el p95 mòbil com a retard de hedging
+    HEDGE_MIN_SAMPLES = 20
+    # Errors consecutius a partir dels quals es considera Wikipedia caiguda
+    UPSTREAM_DOWN_AFTER = 5
+
+    def __init__(self, base_url_template: str, hedge_max_ratio: float = 0.0,
+                 hedge_delay: Optional[float] = None, hedge_pool_size: int = 16,
+                 rate_limit: float = 20.0, rate_burst: float = 40.0,
+                 max_concurrency: int = 8, queue_timeout: float = 2.0,
+                 cache_ttl: float = 3600, cache_max_entries: int = 1000,
+                 cache_max_bytes: int = 0, cache_min_ttl: Optional[float] = None,
+                 cache_max_ttl: Optional[float] = None,
+                 summary_url_template: Optional[str] = None, enrich_pool_size: int = 8,
+                 enrich_timeout: float = 2.0, summary_cache_max_entries: int = 5000):
+        """
+        Args:
+            base_url_template: Plantilla de la URL de l'API onthisday
+            hedge_max_ratio: Fracció màxima de peticions que poden enviar un
+                duplicat (0 = hedging desactivat)
+            hedge_delay: Segons a esperar abans d'enviar el duplicat
+                (None = p95 mòbil de les latències observades)
+            hedge_pool_size: Fils disponibles per a les peticions amb hedging
+            rate_limit: Peticions per segon permeses cap a Wikipedia
+            rate_burst: Ràfega màxima de peticions del token bucket
+            max_concurrency: Peticions simultànies màximes cap a Wikipedia
+            queue_timeout: Segons màxims en cua abans de descartar la petició
+            cache_ttl: Segons que es guarda cada feed en cache (0 = sense cache)
+            cache_max_entries: Nombre màxim de feeds en cache
+            cache_max_bytes: Memòria aproximada màxima dels feeds en cache
+                (0 = sense límit de bytes)
+            cache_min_ttl, cache_max_ttl: Límits del TTL adaptatiu de cada
+                feed (None = TTL fix de cache_ttl)
+            summary_url_template: Plantilla de l'API page/summary per enriquir
+                els detalls (None = enriquiment desactivat)
+            enrich_pool_size: Fils per descarregar resums en paral·lel
+            enrich_timeout: Segons màxims d'espera pels resums d'un event
+            summary_cache_max_entries: Nombre màxim de resums de pàgina en cache
+        """
         self.base_url_template = base_url_template
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'EphemeridesApp/1.0 (Educational Project)'
         })
 
+        # Cache de feeds per (idioma, tipus, mes, dia)
+        self.cache = FeedCache(cache_ttl, cache_max_entries, max_bytes=cache_max_bytes)
+        # TTL per feed segons si canvia entre baixades (comença a cache_ttl)
+        self.adaptive_ttl = AdaptiveTTL(cache_ttl, cache_min_ttl, cache_max_ttl) \
+            if cache_ttl > 0 and cache_min_ttl is not None and cache_max_ttl is not None else None
+
+        # Índex de cerca de text sobre tots els feeds carregats
+        self.search_index = SearchIndex()
+
+        # Límit de ritme i concurrència compartit per tot el procés
+        self.limiter = UpstreamLimiter(rate_limit, rate_burst, max_concurrency, queue_timeout)
+
+        # Estat de Wikipedia segons les últimes respostes
+        self._health_lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._last_success = None
+        self._last_failure = None
+
+        # Enriquiment dels detalls amb el resum de cada pàgina relacionada.
+        # La clau inclou la revisió: una pàgina editada es torna a demanar.
+        self.summary_url_template = summary_url_template
+        self.enrich_timeout = enrich_timeout
+        self.summary_cache = FeedCache(cache_ttl, summary_cache_max_entries, name='summaries')
+        self._summary_inflight: Dict[tuple, Future] = {}
+        self._summary_lock = threading.Lock()
+        self._enrich_executor = None
+        if summary_url_template:
+            self._enrich_executor = ThreadPoolExecutor(max_workers=enrich_pool_size,
+                                                       thread_name_prefix='wiki-enrich')
+
+        # Hedging: si la primera petició triga massa, se n'envia una segona
+        self.hedge_max_ratio = hedge_max_ratio
+        self.hedge_delay = hedge_delay
+        self._latencies = deque(maxlen=200)
+        self._hedge_lock = threading.Lock()
+        self._request_count = 0
+        self._hedge_count = 0
+        self._executor = None
+        if hedge_max_ratio > 0:
+            self._executor = ThreadPoolExecutor(max_workers=hedge_pool_size,
+                                                thread_name_prefix='wiki-hedge')
+
     def get_events(self, month: int, day: int, language: str = 'ca') -> List[Dict]:
         """
         Obté tots els events del dia especificat
@@ -20,6 +112,18 @@ class WikipediaClient:
         Returns:
             List de diccionaris amb: year, text, pages (links relacionats)
         """
+        return self.get_feed(month, day, language).events
+
+    def get_feed(self, month: int, day: int, language: str = 'ca') -> DayFeed:
+        """Obté el feed del dia (de la cache si hi és) amb els seus índexs"""
+        if self.cache.enabled:
+            feed = self.cache.get((language, 'events', month, day))
+            if feed is not None:
+                return feed
+        return self._load_feed(month, day, language)
+
+    def _load_feed(self, month: int, day: int, language: str) -> DayFeed:
+        """Descarrega els events del dia de Wikipedia i els desa a la cache"""
         url = self.base_url_template.format(
             lang=language,
             type='events',
@@ -28,24 +132,271 @@ class WikipediaClient:
         )
 
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            return data.get('events', [])
+            if self._executor is not None:
+                data, content_hash = self._fetch_hedged(url, language)
+            else:
+                data, content_hash = self._fetch(url, language)
         except requests.RequestException as e:
             raise Exception(f"Error fetching events from Wikipedia: {str(e)}")
 
-    def get_random_event(self, month: int, day: int, language: str = 'ca') -> Optional[Dict]:
-        """Retorna un event aleatori del dia especificat"""
-        events = self.get_events(month, day, language)
-        return random.choice(events) if events else None
+        events = data.get('events', [])
+        feed = DayFeed(events)
+        key = (language, 'events', month, day)
+        # Les variants i taules que el feed construeix després també compten al pressupost
+        feed.on_resize = partial(self.cache.resize, key, feed)
+        ttl = None
+        if self.adaptive_ttl is not None:
+            ttl = self.adaptive_ttl.observe(key, content_hash)
+        self.cache.set(key, feed, ttl)
+        self.search_index.add_feed(language, month, day, feed.events)
+        return feed
+
+    def _fetch(self, url: str, language: str,
+               queue_timeout: Optional[float] = None) -> Tuple[Dict, str]:
+        """
+        Fa una petició GET a Wikipedia i registra la seva latència
+
+        Returns:
+            (feed llegit amb parse_feed, sha256 dels bytes rebuts)
+
+        Raises:
+            UpstreamOverloadedError: si no hi ha capacitat dins del termini
+                o Wikipedia respon 429
+        """
+        with self.limiter.slot(queue_timeout):
+            start = time.monotonic()
+            try:
+                response = self.session.get(url, timeout=10, stream=True)
+            except requests.RequestException:
+                self._observe_upstream(language, None, start)
+                raise
+            with response:
+                self._observe_upstream(language, response, start)
+                response.raise_for_status()
+                # El cos es llegeix a trossos: no es guarda mai sencer a memòria.
+                # El hash per AdaptiveTTL es calcula sobre els mateixos trossos
+                size = 0
+                digest = hashlib.sha256()
+
+                def chunks():
+                    nonlocal size
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        size += len(chunk)
+                        digest.update(chunk)
+                        yield chunk
+
+                try:
+                    data = parse_feed(chunks())
+                except ValueError as e:
+                    raise requests.RequestException(f'Invalid JSON from Wikipedia: {e}')
+                metrics.UPSTREAM_RESPONSE_SIZE.labels(language=language).observe(size)
+        with self._hedge_lock:
+            self._latencies.append(time.monotonic() - start)
+        return data, digest.hexdigest()
+
+    def _observe_upstream(self, language: str, response: Optional[requests.Response], start: float):
+        """
+        Latència, estat de salut i, si Wikipedia respon 429, penalització del
+        token bucket (None = la petició ha fallat sense resposta)
+
+        Raises:
+            UpstreamOverloadedError: si la resposta és un 429
+        """
+        status = 'error' if response is None else response.status_code
+        metrics.UPSTREAM_LATENCY.labels(language=language, status=status).observe(
+            time.monotonic() - start)
+        self._record_upstream_result(response is not None and status < 500 and status != 429)
+        if status == 429:
+            retry_after = self._parse_retry_after(response.headers.get('Retry-After'))
+            self.limiter.bucket.penalize(retry_after)
+            raise UpstreamOverloadedError('Wikipedia rate limited the request', retry_after)
+
+    def _fetch_hedged(self, url: str, language: str) -> Tuple[Dict, str]:
+        """
+        Fa la petició i, si no respon dins del retard de hedging, n'envia un
+        duplicat. Es queda amb la primera resposta correcta i cancel·la l'altra.
+        """
+        with self._hedge_lock:
+            self._request_count += 1
+
+        primary = self._executor.submit(self._fetch, url, language)
+        delay = self.get_hedge_delay()
+        if delay is None:
+            return primary.result()
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._reserve_hedge():
+            return primary.result()
+
+        # El duplicat no fa cua: si no hi ha capacitat immediata, no s'envia
+        hedge = self._executor.submit(self._fetch, url, language, 0)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # La petició perdedora es descarta (o no arriba a començar)
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _record_upstream_result(self, ok: bool):
+        """Actualitza l'estat de Wikipedia amb el resultat d'una petició"""
+        with self._health_lock:
+            if ok:
+                self._consecutive_failures = 0
+                self._last_success = datetime.now()
+            else:
+                self._consecutive_failures += 1
+                self._last_failure = datetime.now()
+
+    def get_upstream_state(self) -> Dict:
+        """
+        Retorna l'estat de Wikipedia i de la cua de peticions
+
+        Returns:
+            Dict amb: state (ok, degraded, down), consecutiveFailures,
+            lastSuccess, lastFailure, queueDepth, inFlight
+        """
+        with self._health_lock:
+            failures = self._consecutive_failures
+            last_success = self._last_success
+            last_failure = self._last_failure
+        if failures >= self.UPSTREAM_DOWN_AFTER:
+            state = 'down'
+        elif failures > 0:
+            state = 'degraded'
+        else:
+            state = 'ok'
+        return {
+            'state': state,
+            'consecutiveFailures': failures,
+            'lastSuccess': last_success.isoformat() if last_success else None,
+            'lastFailure': last_failure.isoformat() if last_failure else None,
+            'queueDepth': self.limiter.waiting,
+            'inFlight': self.limiter.in_flight
+        }
+
+    def peek_feed(self, month: int, day: int, language: str) -> Optional[DayFeed]:
+        """Feed del dia si ja és a la cache (mai no fa cap petició a Wikipedia)"""
+        return self.cache.peek((language, 'events', month, day))
+
+    def invalidate_feed(self, month: int, day: int, language: str) -> bool:
+        """Treu un feed de la cache i de l'índex de cerca; retorna si era a la cache"""
+        self.search_index.remove_feed(language, month, day)
+        return self.cache.delete((language, 'events', month, day))
+
+    def refresh_feed(self, month: int, day: int, language: str) -> DayFeed:
+        """Torna a descarregar un feed encara que sigui a la cache"""
+        return self._load_feed(month, day, language)
+
+    def is_cached(self, month: int, day: int, language: str) -> bool:
+        """Indica si el feed del dia ja és a la cache (sense comptar-ho com a consulta)"""
+        return self.cache.remaining_ttl((language, 'events', month, day)) > 0
+
+    def prewarm(self, dates: List[datetime], languages: List[str],
+                refresh_within: float = 0) -> int:
+        """
+        Carrega a la cache els feeds dels dies i idiomes indicats
+
+        Args:
+            dates: Dies a carregar
+            languages: Idiomes de Wikipedia
+            refresh_within: Es refresquen també les entrades que caduquen
+                en menys d'aquests segons, perquè no quedin forats
+
+        Returns:
+            Nombre de feeds que han quedat a la cache
+        """
+        warmed = 0
+        for date in dates:
+            for language in languages:
+                key = (language, 'events', date.month, date.day)
+                if self.cache.remaining_ttl(key) > refresh_within:
+                    warmed += 1
+                    continue
+                try:
+                    self._load_feed(date.month, date.day, language)
+                    warmed += 1
+                except Exception:
+                    # Es tornarà a provar a la següent passada
+                    pass
+        return warmed
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> float:
+        """Interpreta la capçalera Retry-After (només segons; per defecte 1s)"""
+        try:
+            return max(1.0, float(value))
+        except (TypeError, ValueError):
+            return 1.0
+
+    def _reserve_hedge(self) -> bool:
+        """Reserva un hedge si no se supera el percentatge màxim de trànsit"""
+        with self._hedge_lock:
+            if self._hedge_count + 1 > self.hedge_max_ratio * self._request_count:
+                return False
+            self._hedge_count += 1
+        metrics.UPSTREAM_HEDGES.inc()
+        return True
+
+    def get_hedge_delay(self) -> Optional[float]:
+        """
+        Retorna el retard (segons) abans d'enviar un duplicat
+
+        Returns:
+            El retard configurat, el p95 mòbil de latència, o None si encara
+            no hi ha prou mostres per estimar-lo
+        """
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        with self._hedge_lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def get_hedge_stats(self) -> Dict:
+        """Retorna comptadors de peticions i hedges enviats"""
+        with self._hedge_lock:
+            return {'requests': self._request_count, 'hedges': self._hedge_count}
 
-    def get_event_details(self, event: Dict, language: str = 'ca') -> Dict:
+    def search_events(self, query: str, language: str, limit: int = 20):
+        """
+        Cerca events als feeds ja carregats (no fa cap petició a Wikipedia)
+
+        Returns:
+            (total de coincidències, llista de resultats amb year, text, month, day, hasDetails)
+        """
+        return self.search_index.search(query, language, limit)
+
+    def get_random_event(self, month: int, day: int, language: str = 'ca',
+                         year_from: Optional[int] = None,
+                         year_to: Optional[int] = None,
+                         weighted: Optional[str] = None) -> Optional[Dict]:
+        """
+        Retorna un event aleatori del dia especificat
+
+        Args:
+            year_from, year_to: Rang d'anys opcional (inclusiu; negatius = aC)
+            weighted: 'pages' o 'extract' per afavorir events ben documentats
+        """
+        feed = self.get_feed(month, day, language)
+        return feed.random_event(year_from, year_to, weighted=weighted)
+
+    def get_event_details(self, event: Dict, language: str = 'ca', enrich: bool = True) -> Dict:
         """
         Enriqueix un event amb més informació dels seus links relacionats
 
+        Args:
+            enrich: False per no demanar els resums (quan el client no vol related)
+
         Returns:
-            Dict amb: year, text, description (extret de pages), links
+            Dict amb: year, text, description (extret de pages), links i,
+            si l'enriquiment està activat, related (resum de cada pàgina)
         """
         result = {
             'year': event.get('year', 'Unknown'),
@@ -60,9 +411,120 @@ class WikipediaClient:
             result['description'] = main_page.get('extract', '')
             result['thumbnail'] = self._extract_thumbnail(main_page)
             result['links'] = self._extract_links(pages)
+            if enrich and self._enrich_executor is not None:
+                result['related'] = self.get_page_summaries(pages, language)
+                if not result['description'] and result['related']:
+                    result['description'] = result['related'][0].get('extract', '')
 
         return result
 
+    def get_events_details(self, events: List[Dict], language: str = 'ca',
+                           enrich: bool = True) -> List[Dict]:
+        """
+        Detalls de diversos events (vegeu get_event_details)
+
+        Amb l'enriquiment activat, primer es llancen els resums de totes les
+        pàgines alhora: l'espera total és d'un sol enrich_timeout i no un per event.
+        """
+        if enrich and self._enrich_executor is not None:
+            for event in events:
+                for page in event.get('pages', []):
+                    self._summary_future(page, language)
+        return [self.get_event_details(event, language, enrich) for event in events]
+
+    def get_page_summaries(self, pages: List[Dict], language: str) -> List[Dict]:
+        """
+        Resums de les pàgines relacionades, descarregats en paral·lel
+
+        És best-effort: les pàgines que fallen o no responen dins de
+        enrich_timeout es queden amb les dades que ja porta el feed.
+
+        Returns:
+            Llista (en l'ordre de pages) de dicts amb: title, description,
+            extract, thumbnail, url
+        """
+        futures = [self._summary_future(page, language) for page in pages]
+        wait([f for f in futures if f is not None], timeout=self.enrich_timeout)
+
+        summaries = []
+        for page, future in zip(pages, futures):
+            summary = None
+            if future is not None and future.done() and future.exception() is None:
+                summary = future.result()
+            summaries.append(summary or self._summary_from_page(page))
+        return summaries
+
+    def _summary_future(self, page: Dict, language: str) -> Optional[Future]:
+        """
+        Future amb el resum d'una pàgina, compartit entre peticions
+
+        Les pàgines comunes (països, persones) es demanen un sol cop encara
+        que apareguin a molts events o dies alhora.
+        """
+        title = page.get('title')
+        if not title:
+            return None
+        key = (language, title, page.get('revision'))
+        cached = self.summary_cache.get(key) if self.summary_cache.enabled else None
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+
+        created = False
+        with self._summary_lock:
+            future = self._summary_inflight.get(key)
+            if future is None:
+                future = self._enrich_executor.submit(self._fetch_summary, key)
+                self._summary_inflight[key] = future
+                created = True
+        # Fora del lock: si ja ha acabat, el callback s'executa en aquest fil
+        if created:
+            future.add_done_callback(lambda _: self._forget_inflight(key))
+        return future
+
+    def _forget_inflight(self, key: tuple):
+        with self._summary_lock:
+            self._summary_inflight.pop(key, None)
+
+    def _fetch_summary(self, key: tuple) -> Dict:
+        """
+        Descarrega el resum d'una pàgina i el desa a la cache (amb les mateixes
+        mètriques, estat de salut i gestió del 429 que _fetch)
+        """
+        language, title, _ = key
+        url = self.summary_url_template.format(lang=language, title=quote(title, safe=''))
+        with self.limiter.slot():
+            start = time.monotonic()
+            try:
+                response = self.session.get(url, timeout=10)
+            except requests.RequestException:
+                self._observe_upstream(language, None, start)
+                raise
+            self._observe_upstream(language, response, start)
+        response.raise_for_status()
+        metrics.UPSTREAM_RESPONSE_SIZE.labels(language=language).observe(len(response.content))
+        data = response.json()
+        summary = {
+            'title': data.get('title') or title,
+            'description': data.get('description', ''),
+            'extract': data.get('extract', ''),
+            'thumbnail': self._extract_thumbnail(data),
+            'url': data.get('content_urls', {}).get('desktop', {}).get('page', '')
+        }
+        self.summary_cache.set(key, summary)
+        return summary
+
+    def _summary_from_page(self, page: Dict) -> Dict:
+        """Resum a partir de les dades que ja porta el feed"""
+        return {
+            'title': page.get('title', ''),
+            'description': page.get('description', ''),
+            'extract': page.get('extract', ''),
+            'thumbnail': self._extract_thumbnail(page),
+            'url': page.get('content_urls', {}).get('desktop', {}).get('page', '')
+        }
+
     def _extract_thumbnail(self, page: Dict) -> str:
         """Extreu la URL del thumbnail d'una pàgina"""
         thumbnail = page.get('thumbnail', {})
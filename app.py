@@ -1,14 +1,120 @@
-from flask import Flask, render_template, jsonify, request
-from datetime import datetime
+from flask import Flask, render_template, jsonify, request, g, send_file
+from flask.cli import AppGroup
+from datetime import datetime, timedelta
+from api import metrics
+from api.assets import AssetManifest
+from api.cache_admin import OPERATIONS, CacheAdmin, CacheBroadcast, format_key
+from api.day_feed import WEIGHTINGS, event_id
+from api.event_stream import EventStreamRegistry, StreamLimitExceeded, format_event
+from api.fieldsets import (
+    DETAILS_FIELDS, SUMMARY_FIELDS, parse_fields, parse_max_length, select_fields, trim_details
+)
+from api.image_proxy import ImageNotFound, ImageProxy, InvalidImage
 from api.wikipedia_client import WikipediaClient
+from api.profiling import RequestProfiler, ServerTiming
+from api.rate_limit import UpstreamOverloadedError
+from api.request_trace import TRACE_LOGGER, TRACED_ROUTES, TraceFormatter, trace_entry
+from api.structured_logging import ACCESS_LOGGER, LogPipeline, sample_access
 from config import Config
+from functools import lru_cache, wraps
+import atexit
+import click
+import hashlib
+import hmac
+import json
+import logging
 import os
+import requests
+import threading
+import time
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Logs JSON a través d'una cua: les peticions no esperen mai l'escriptura
+log_pipeline = LogPipeline(queue_size=app.config['LOG_QUEUE_SIZE'],
+                           dedup_window=app.config['LOG_DEDUP_WINDOW']).start()
+log_pipeline.attach(app.logger, app.config['LOG_LEVEL'])
+access_logger = logging.getLogger(ACCESS_LOGGER)
+log_pipeline.attach(access_logger)
+# El log d'accés del servidor de desenvolupament escriu al fil de la petició
+logging.getLogger('werkzeug').setLevel(logging.WARNING)
+atexit.register(log_pipeline.stop)
+
+# Traça compacta de les peticions per reproduir-les en proves de càrrega
+trace_logger = logging.getLogger(TRACE_LOGGER)
+if app.config['TRACE_FILE']:
+    trace_pipeline = LogPipeline(
+        stream=open(app.config['TRACE_FILE'].format(pid=os.getpid()), 'a', encoding='utf-8'),
+        queue_size=app.config['LOG_QUEUE_SIZE'], dedup_window=0,
+        formatter=TraceFormatter()).start()
+    trace_pipeline.attach(trace_logger)
+    atexit.register(trace_pipeline.stop)
+
 # Inicialitzar client Wikipedia
-wiki_client = WikipediaClient(app.config['WIKIPEDIA_API_BASE'])
+wiki_client = WikipediaClient(
+    app.config['WIKIPEDIA_API_BASE'],
+    hedge_max_ratio=app.config['WIKIPEDIA_HEDGE_MAX_RATIO'],
+    hedge_delay=app.config['WIKIPEDIA_HEDGE_DELAY'],
+    rate_limit=app.config['UPSTREAM_RATE_LIMIT'],
+    rate_burst=app.config['UPSTREAM_RATE_BURST'],
+    max_concurrency=app.config['UPSTREAM_MAX_CONCURRENCY'],
+    queue_timeout=app.config['UPSTREAM_QUEUE_TIMEOUT'],
+    cache_ttl=app.config['CACHE_TIMEOUT'],
+    cache_max_entries=app.config['CACHE_MAX_ENTRIES'],
+    cache_max_bytes=app.config['CACHE_MAX_BYTES'],
+    cache_min_ttl=app.config['CACHE_MIN_TTL'],
+    cache_max_ttl=app.config['CACHE_MAX_TTL'],
+    summary_url_template=app.config['WIKIPEDIA_SUMMARY_BASE']
+    if app.config['ENRICHMENT_ENABLED'] else None,
+    enrich_pool_size=app.config['ENRICHMENT_POOL_SIZE'],
+    enrich_timeout=app.config['ENRICHMENT_TIMEOUT'],
+    summary_cache_max_entries=app.config['SUMMARY_CACHE_MAX_ENTRIES']
+)
+
+# Gauges que es llegeixen en el moment de servir /metrics
+metrics.track(metrics.UPSTREAM_IN_FLIGHT, lambda: wiki_client.limiter.in_flight)
+metrics.track(metrics.UPSTREAM_QUEUE_DEPTH, lambda: wiki_client.limiter.waiting)
+
+# Proxy de miniatures (comparteix la sessió, amb el User-Agent de l'aplicació que
+# demana Wikimedia, i el limitador de peticions)
+image_proxy = ImageProxy(
+    app.config['IMAGE_CACHE_DIR'],
+    app.config['IMAGE_CACHE_MAX_BYTES'],
+    widths=app.config['IMAGE_PROXY_WIDTHS'],
+    allowed_hosts=app.config['IMAGE_PROXY_HOSTS'],
+    session=wiki_client.session,
+    limiter=wiki_client.limiter,
+    secret_key=app.config['SECRET_KEY'],
+    max_download_bytes=app.config['IMAGE_PROXY_MAX_DOWNLOAD_BYTES']
+) if app.config['IMAGE_PROXY_ENABLED'] else None
+
+# Bundles amb hash generats per scripts/build_assets.py (si n'hi ha)
+asset_manifest = AssetManifest(os.path.join(app.static_folder, 'dist', 'manifest.json'))
+
+# Invalidació, refresc i precàrrega de feeds, compartits entre workers si hi ha fitxer de difusió
+cache_admin = CacheAdmin(
+    wiki_client,
+    lambda: get_wikipedia_languages(),
+    broadcast=CacheBroadcast(app.config['CACHE_BROADCAST_FILE'])
+    if app.config['CACHE_BROADCAST_FILE'] else None
+)
+
+# Connexions SSE de les pantalles en mode presentació
+event_streams = EventStreamRegistry(
+    app.config['STREAM_MAX_CONNECTIONS'],
+    heartbeat=app.config['STREAM_HEARTBEAT'],
+    max_duration=app.config['STREAM_MAX_DURATION'],
+    retry_ms=app.config['STREAM_RETRY_MS']
+)
+
+# Profiler opt-in per peticions lentes
+request_profiler = RequestProfiler(
+    app.config['PROFILE_DIR'],
+    app.config['SECRET_KEY'],
+    sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+    slow_ms=app.config['PROFILE_SLOW_MS']
+)
 
 
 def get_mapped_language(language: str) -> str:
@@ -23,87 +129,870 @@ def get_mapped_language(language: str) -> str:
     """
     return app.config['WIKIPEDIA_LANGUAGE_MAP'].get(language, language)
 
+
+def get_wikipedia_languages() -> list:
+    """Idiomes de Wikipedia necessaris per servir tots els idiomes suportats"""
+    return sorted({get_mapped_language(lang) for lang in app.config['SUPPORTED_LANGUAGES']})
+
+
+def get_warm_dates() -> list:
+    """Dies que es mantenen precarregats: avui i demà"""
+    today = datetime.now()
+    return [today, today + timedelta(days=1)]
+
+
+def get_all_year_dates() -> list:
+    """Els 366 dies de l'any (es fa servir un any de traspàs)"""
+    first = datetime(2024, 1, 1)
+    return [first + timedelta(days=offset) for offset in range(366)]
+
+
+def prewarm_loop():
+    """Manté a la cache els feeds d'avui i demà per tots els idiomes"""
+    interval = app.config['PREWARM_INTERVAL']
+    if app.config['PREWARM_ALL_DAYS']:
+        # Una passada inicial perquè la cerca cobreixi tot l'any
+        wiki_client.prewarm(get_all_year_dates(), get_wikipedia_languages())
+    while True:
+        wiki_client.prewarm(get_warm_dates(), get_wikipedia_languages(),
+                            refresh_within=interval * 2)
+        if background_stop.wait(interval):
+            return
+
+
+def start_prewarm() -> threading.Thread:
+    """Arrenca la precàrrega en un fil de fons"""
+    thread = threading.Thread(target=prewarm_loop, name='feed-prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+def cache_broadcast_loop():
+    """Aplica periòdicament les operacions de cache publicades per altres workers"""
+    while True:
+        try:
+            cache_admin.apply_broadcast()
+        except Exception as e:
+            app.logger.error(f"Error applying cache broadcast: {str(e)}")
+        if background_stop.wait(app.config['CACHE_BROADCAST_INTERVAL']):
+            return
+
+
+def start_cache_broadcast() -> threading.Thread:
+    """Arrenca la lectura del fitxer de difusió en un fil de fons"""
+    thread = threading.Thread(target=cache_broadcast_loop, name='cache-broadcast', daemon=True)
+    thread.start()
+    return thread
+
+
+def metrics_sampler_loop():
+    """Desa periòdicament els gauges calculats perquè /metrics els sumi entre workers"""
+    while True:
+        metrics.sample_tracked()
+        if background_stop.wait(app.config['METRICS_SAMPLE_INTERVAL']):
+            return
+
+
+def start_metrics_sampler() -> threading.Thread:
+    """Arrenca la desada periòdica de gauges en un fil de fons"""
+    thread = threading.Thread(target=metrics_sampler_loop, name='metrics-sampler', daemon=True)
+    thread.start()
+    return thread
+
+
+# Procés que ja té els fils de fons en marxa (després d'un fork cal tornar-los a arrencar)
+background_pid = None
+background_lock = threading.Lock()
+background_stop = threading.Event()
+
+
+def start_background_workers() -> list:
+    """
+    Arrenca la precàrrega, la difusió de cache i (en mode multiprocés) la
+    desada de gauges un sol cop per procés
+
+    Es crida des del hook post_worker_init de gunicorn (gunicorn.conf.py) i,
+    per a qualsevol altre servidor WSGI, a la primera petició de cada procés.
+    El procés pare del reloader de Werkzeug no serveix peticions i, per tant,
+    no n'arrenca cap.
+
+    Returns:
+        Els fils arrencats (buit si aquest procés ja els tenia)
+    """
+    global background_pid
+    with background_lock:
+        if background_pid == os.getpid():
+            return []
+        background_pid = os.getpid()
+    threads = []
+    if app.config['PREWARM_ENABLED']:
+        threads.append(start_prewarm())
+    if cache_admin.broadcast is not None:
+        threads.append(start_cache_broadcast())
+    if metrics.MULTIPROCESS:
+        threads.append(start_metrics_sampler())
+    return threads
+
+
+def overloaded_response(error: UpstreamOverloadedError):
+    """Resposta ràpida 503 quan la petició a Wikipedia s'ha descartat per càrrega"""
+    response = jsonify({'error': 'Service temporarily overloaded'})
+    response.headers['Retry-After'] = error.retry_after_header
+    return response, 503
+
+
+def require_admin(view):
+    """
+    Protegeix un endpoint d'administració amb ADMIN_TOKEN (Authorization: Bearer)
+
+    Sense ADMIN_TOKEN configurat els endpoints responen 404, com si no existissin.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = app.config.get('ADMIN_TOKEN')
+        if not token:
+            return jsonify({'error': 'Not found'}), 404
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            return jsonify({'error': 'Unauthorized'}), 401
+        if not hmac.compare_digest(header[len('Bearer '):].encode(), token.encode()):
+            return jsonify({'error': 'Forbidden'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def parse_month_day(value) -> tuple:
+    """
+    Interpreta una data MM-DD (la del client, que pot anar per davant o per
+    darrere del servidor); buida = avui al servidor
+
+    Returns:
+        (month, day)
+
+    Raises:
+        ValueError: si el format o la data no són vàlids
+    """
+    if not value:
+        today = datetime.now()
+        return today.month, today.day
+    date = datetime.strptime(f'2024-{value}', '%Y-%m-%d')  # any de traspàs: accepta 02-29
+    return date.month, date.day
+
+
+def seconds_until_midnight(now: datetime = None) -> int:
+    """Segons que falten per a la mitjanit local del servidor (mínim 1)"""
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(1, int((midnight - now).total_seconds()))
+
+
+def parse_year_range():
+    """
+    Llegeix els filtres year_from / year_to de la query
+
+    Returns:
+        (year_from, year_to), cadascun enter o None
+
+    Raises:
+        ValueError: si algun valor no és un enter
+    """
+    year_from = request.args.get('year_from')
+    year_to = request.args.get('year_to')
+    return (int(year_from) if year_from not in (None, '') else None,
+            int(year_to) if year_to not in (None, '') else None)
+
+
+def proxy_thumbnail(details: dict) -> dict:
+    """
+    Substitueix les miniatures de Wikimedia (la principal i les de les
+    pàgines relacionades) per les URLs del proxy (src + srcset)
+    """
+    if image_proxy is None:
+        return details
+    details = dict(details)
+    if 'related' in details:
+        details['related'] = [proxy_thumbnail(page) for page in details['related']]
+    proxied = image_proxy.url_for(details.get('thumbnail') or '')
+    if proxied is not None:
+        details['thumbnail'] = proxied['src']
+        details['thumbnailSrcset'] = proxied['srcset']
+    return details
+
+
+def parse_details_options() -> tuple:
+    """
+    Llegeix fields i max_extract de la query dels endpoints de detalls
+
+    Returns:
+        (fields, max_extract): camps demanats (None = tots) i longitud
+        màxima dels extractes (None = sense límit)
+
+    Raises:
+        ValueError: si algun camp o la longitud no són vàlids (el missatge
+            és l'error que es retorna al client)
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'), DETAILS_FIELDS)
+    except ValueError as e:
+        raise ValueError('Invalid fields') from e
+    try:
+        max_extract = parse_max_length(request.args.get('max_extract'))
+    except ValueError as e:
+        raise ValueError('Invalid max_extract') from e
+    return fields, max_extract
+
+
+def render_details(details: dict, fields, max_extract) -> dict:
+    """
+    Detalls tal com els rep el client: retallats, amb miniatures del proxy i
+    només els camps demanats
+    """
+    details = trim_details(details, max_extract)
+    if fields is None or {'thumbnail', 'thumbnailSrcset', 'related'}.intersection(fields):
+        details = proxy_thumbnail(details)
+    return select_fields(details, fields)
+
+
+@lru_cache(maxsize=None)
+def load_translations(language: str) -> dict:
+    """
+    Llegeix (un sol cop per procés) les traduccions d'un idioma
+
+    Raises:
+        FileNotFoundError: si no hi ha fitxer de traduccions
+    """
+    translations_path = os.path.join('translations', f'{language}.json')
+    with open(translations_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def translate(translations: dict, key: str) -> str:
+    """Traducció d'una clau amb punts ('actions.nextEvent'), com I18n.t() al client"""
+    value = translations
+    for part in key.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value if isinstance(value, str) else key
+
+
+def format_long_date(date: datetime, translations: dict) -> str:
+    """Data llarga ('dilluns, 19 d’octubre de 2026') amb els noms de les traduccions"""
+    names = translations['date']
+    return names['format'].format(
+        weekday=names['weekdays'][date.weekday()],
+        day=date.day,
+        month=names['months'][date.month - 1],
+        year=date.year
+    )
+
+
+def event_identifier(item) -> str:
+    """
+    Identificador d'event d'un element de la petició: l'id directament
+    (string o {id}) o calculat a partir de {year, text}; None si no n'hi ha
+    o si l'id no és un string ni un enter
+    """
+    if isinstance(item, str):
+        return item or None
+    if not isinstance(item, dict):
+        return None
+    if item.get('id'):
+        identifier = item['id']
+        if isinstance(identifier, bool) or not isinstance(identifier, (str, int)):
+            return None
+        return str(identifier)
+    if item.get('year') and item.get('text'):
+        return event_id(item['year'], item['text'])
+    return None
+
+
+def ephemeris_summary(event: dict) -> dict:
+    """Versió simplificada d'un event (sense details) tal com la rep el client"""
+    year = event.get('year', 'Unknown')
+    text = event.get('text', '')
+    return {
+        'id': event_id(year, text),
+        'year': year,
+        'text': text,
+        'hasDetails': len(event.get('pages', [])) > 0
+    }
+
+
+def get_initial_state(language: str) -> dict:
+    """
+    Estat inicial de la pàgina: idioma, traduccions, data i, si el feed
+    d'avui ja és a la cache, una efemèride (mai no es fa esperar la pàgina
+    per Wikipedia; sense cache el client la demana com abans)
+    """
+    today = datetime.now()
+    translations = load_translations(language)
+    feed = wiki_client.peek_feed(today.month, today.day, get_mapped_language(language))
+    event = feed.random_event() if feed is not None else None
+    return {
+        'lang': language,
+        'translations': translations,
+        'date': today.strftime('%Y-%m-%d'),
+        'dateText': format_long_date(today, translations),
+        'ephemeris': ephemeris_summary(event) if event else None
+    }
+
+
+def get_precache_urls() -> list:
+    """URLs que el service worker desa en instal·lar-se"""
+    assets = asset_manifest.urls() or [
+        '/static/css/vintage.css', '/static/css/responsive.css', '/static/js/i18n.js',
+        '/static/js/api-client.js', '/static/js/animations.js', '/static/js/app.js'
+    ]
+    translations = [f'/api/translations/{lang}' for lang in app.config['SUPPORTED_LANGUAGES']]
+    return ['/'] + assets + translations
+
+
+@app.context_processor
+def inject_asset_helpers():
+    """Helpers de plantilla per enllaçar els bundles amb hash"""
+    return {'asset_url': asset_manifest.url, 'asset_fonts': asset_manifest.fonts}
+
+
+def timing_phase(name: str):
+    """Context manager que mesura una fase de la petició per Server-Timing"""
+    return g.server_timing.phase(name)
+
+
+@app.before_request
+def ensure_background_workers():
+    """Arrenca els fils de fons si aquest procés encara no els té"""
+    if background_pid != os.getpid():
+        start_background_workers()
+
+
+@app.before_request
+def start_request_metrics():
+    """Marca l'inici de la petició per mesurar-ne la latència"""
+    g.request_start = time.perf_counter()
+    metrics.HTTP_IN_FLIGHT.inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Registra comptador, latència i mida de la resposta per ruta"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = response.status_code
+        elapsed = time.perf_counter() - start
+        metrics.HTTP_REQUESTS.labels(route=route, method=request.method, status=status).inc()
+        metrics.HTTP_LATENCY.labels(route=route, method=request.method,
+                                    status=status).observe(elapsed)
+        if response.content_length is not None:
+            metrics.HTTP_RESPONSE_SIZE.labels(route=route).observe(response.content_length)
+        log_access(route, response, elapsed)
+        record_trace(route, response, elapsed)
+    return response
+
+
+def log_access(route: str, response, elapsed: float):
+    """Registre d'accés estructurat (mostrejat per a les respostes correctes)"""
+    if not sample_access(response.status_code, app.config['ACCESS_LOG_SAMPLE_RATE']):
+        return
+    access_logger.info('request', extra={'fields': {
+        'method': request.method,
+        'path': request.path,
+        'route': route,
+        'status': response.status_code,
+        'durationMs': round(elapsed * 1000, 2),
+        'bytes': response.content_length,
+        'lang': request.args.get('lang'),
+    }})
+
+
+def record_trace(route: str, response, elapsed: float):
+    """Afegeix la petició a la traça (si TRACE_FILE està configurat)"""
+    if not app.config['TRACE_FILE'] or route not in TRACED_ROUTES:
+        return
+    body = request.get_json(silent=True) if request.is_json else None
+    params = body if isinstance(body, dict) else request.args
+    if route == '/api/translations/<lang>':
+        language = request.view_args.get('lang')
+    else:
+        language = params.get('lang', app.config['DEFAULT_LANGUAGE'])
+    date = params.get('date') or datetime.now().strftime('%m-%d')
+    items = params.get('items')
+    trace_logger.info('request', extra={'fields': trace_entry(
+        time.time() - elapsed, route, language, str(date), response.status_code, elapsed,
+        len(items) if isinstance(items, list) else None)})
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    """Decrementa el gauge de peticions en curs (també si hi ha hagut error)"""
+    metrics.HTTP_IN_FLIGHT.dec()
+
+
+@app.before_request
+def start_request_timing():
+    """Prepara els temporitzadors de fases i, si toca, el profiler"""
+    g.server_timing = ServerTiming()
+    g.profile_forced = request_profiler.is_valid_token(
+        request.headers.get(app.config['PROFILE_HEADER']))
+    g.profiler = request_profiler.start(forced=g.profile_forced)
+
+
+@app.after_request
+def cache_static_bundles(response):
+    """Els fitxers de static/dist porten el hash al nom: es poden guardar per sempre"""
+    if request.path.startswith('/static/dist/') and response.status_code == 200:
+        if request.path == '/static/dist/manifest.json':
+            # Nom fix i contingut nou a cada build
+            response.headers['Cache-Control'] = 'no-cache'
+        else:
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@app.after_request
+def finish_request_timing(response):
+    """Afegeix la capçalera Server-Timing i desa el perfil si la petició ha estat lenta"""
+    server_timing = g.get('server_timing')
+    start = g.get('request_start')
+    total_ms = (time.perf_counter() - start) * 1000 if start is not None else None
+    if server_timing is not None and server_timing.phases:
+        response.headers['Server-Timing'] = server_timing.header_value(total_ms)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None and total_ms is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        path = request_profiler.finish(profiler, route, total_ms, forced=g.profile_forced)
+        if path:
+            app.logger.info(f"Profile saved: {path}")
+    return response
+
+
 @app.route('/')
 def index():
-    """Servir la pàgina principal"""
-    return render_template('index.html')
+    """
+    Servir la pàgina principal, ja renderitzada amb l'efemèride, la data i
+    les traduccions (query param opcional: lang)
+    """
+    language = request.args.get('lang', app.config['DEFAULT_LANGUAGE'])
+    if language not in app.config['SUPPORTED_LANGUAGES']:
+        language = app.config['DEFAULT_LANGUAGE']
+
+    with timing_phase('state'):
+        state = get_initial_state(language)
+
+    with timing_phase('render'):
+        return render_template('index.html', initial_state=state,
+                               t=lambda key: translate(state['translations'], key))
+
+@app.route('/sw.js', methods=['GET'])
+def service_worker():
+    """
+    Service worker, servit des de l'arrel perquè controli tota l'aplicació.
+    La llista de precàrrega surt del manifest d'estàtics; la versió canvia
+    quan canvia algun fitxer i això fa que el navegador l'actualitzi.
+    """
+    urls = get_precache_urls()
+    digest = hashlib.sha256('\n'.join(urls).encode())
+    for url in urls:
+        if url.startswith('/static/') and not url.startswith('/static/dist/'):
+            # Sense build els noms no porten hash: compta el contingut
+            with open(os.path.join(app.static_folder, url[len('/static/'):]), 'rb') as f:
+                digest.update(f.read())
+    for language in app.config['SUPPORTED_LANGUAGES']:
+        # Les traduccions tampoc porten hash a la URL
+        with open(os.path.join('translations', f'{language}.json'), 'rb') as f:
+            digest.update(f.read())
+
+    response = app.response_class(
+        render_template('sw.js', version=digest.hexdigest()[:12], precache_urls=urls),
+        mimetype='application/javascript'
+    )
+    # El navegador ha de comprovar sempre si hi ha una versió nova
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/ephemeris/today', methods=['GET'])
 def get_today_ephemeris():
     """
     Retorna una efemèride aleatòria del dia actual
-    Query params: lang (ca, es, en)
+    Query params: lang (ca, es, en), date (opcional, MM-DD; per defecte avui),
+                  year_from, year_to (opcionals, negatius = aC),
+                  weighted (opcional: pages, extract),
+                  fields (opcional: id, year, text, hasDetails)
     """
     language = request.args.get('lang', app.config['DEFAULT_LANGUAGE'])
 
     if language not in app.config['SUPPORTED_LANGUAGES']:
         return jsonify({'error': 'Unsupported language'}), 400
 
+    try:
+        fields = parse_fields(request.args.get('fields'), SUMMARY_FIELDS)
+    except ValueError:
+        return jsonify({'error': 'Invalid fields'}), 400
+
+    try:
+        year_from, year_to = parse_year_range()
+    except ValueError:
+        return jsonify({'error': 'Invalid year range'}), 400
+
+    weighted = request.args.get('weighted') or None
+    if weighted is not None and weighted not in WEIGHTINGS:
+        return jsonify({'error': 'Invalid weighting'}), 400
+
+    try:
+        month, day = parse_month_day(request.args.get('date'))
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+
     # Map language to Wikipedia API language
     wiki_lang = get_mapped_language(language)
 
-    today = datetime.now()
-    month, day = today.month, today.day
-
     try:
         # Obtenir event aleatori
-        event = wiki_client.get_random_event(month, day, wiki_lang)
+        with timing_phase('fetch'):
+            event = wiki_client.get_random_event(month, day, wiki_lang, year_from, year_to,
+                                                 weighted=weighted)
 
         if not event:
             return jsonify({'error': 'No events found for today'}), 404
 
         # Retornar versió simplificada (sense details)
-        return jsonify({
-            'year': event.get('year', 'Unknown'),
-            'text': event.get('text', ''),
-            'hasDetails': len(event.get('pages', [])) > 0
-        })
+        with timing_phase('encode'):
+            return jsonify(select_fields(ephemeris_summary(event), fields))
 
+    except UpstreamOverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
         app.logger.error(f"Error getting ephemeris: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/ephemeris/feed', methods=['GET'])
+def get_ephemeris_feed():
+    """
+    Retorna tots els events d'un dia en format columnar compacte perquè el
+    client triï l'efemèride aleatòria sense tornar al servidor
+    Query params: lang (ca, es, en), date (opcional, MM-DD; per defecte avui),
+                  fields (opcional: id, year, text, hasDetails)
+    """
+    language = request.args.get('lang', app.config['DEFAULT_LANGUAGE'])
+
+    if language not in app.config['SUPPORTED_LANGUAGES']:
+        return jsonify({'error': 'Unsupported language'}), 400
+
+    try:
+        fields = parse_fields(request.args.get('fields'), SUMMARY_FIELDS)
+    except ValueError:
+        return jsonify({'error': 'Invalid fields'}), 400
+
+    try:
+        month, day = parse_month_day(request.args.get('date'))
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+
+    try:
+        with timing_phase('fetch'):
+            feed = wiki_client.get_feed(month, day, get_mapped_language(language))
+    except UpstreamOverloadedError as e:
+        return overloaded_response(e)
+    except Exception as e:
+        app.logger.error(f"Error getting feed: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+    # El cos ja serialitzat i l'ETag es calculen una sola vegada per feed i camps
+    with timing_phase('encode'):
+        body, etag = feed.compact(fields)
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={app.config['FEED_MAX_AGE']}"
+    return response.make_conditional(request)
+
+@app.route('/api/ephemeris/featured', methods=['GET'])
+def get_featured_ephemeris():
+    """
+    Retorna l'efemèride destacada del dia: la mateixa per a tothom fins a
+    mitjanit, perquè una CDN o un proxy invers la pugui servir de cache
+    Query params: lang (ca, es, en), date (opcional, MM-DD; per defecte avui),
+                  weighted (opcional: pages, extract),
+                  fields (opcional: id, year, text, hasDetails)
+    """
+    language = request.args.get('lang', app.config['DEFAULT_LANGUAGE'])
+
+    if language not in app.config['SUPPORTED_LANGUAGES']:
+        return jsonify({'error': 'Unsupported language'}), 400
+
+    weighted = request.args.get('weighted') or None
+    if weighted is not None and weighted not in WEIGHTINGS:
+        return jsonify({'error': 'Invalid weighting'}), 400
+
+    try:
+        fields = parse_fields(request.args.get('fields'), SUMMARY_FIELDS)
+    except ValueError:
+        return jsonify({'error': 'Invalid fields'}), 400
+
+    try:
+        month, day = parse_month_day(request.args.get('date'))
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+
+    wiki_lang = get_mapped_language(language)
+    try:
+        with timing_phase('fetch'):
+            feed = wiki_client.get_feed(month, day, wiki_lang)
+    except UpstreamOverloadedError as e:
+        return overloaded_response(e)
+    except Exception as e:
+        app.logger.error(f"Error getting featured ephemeris: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+    # Llavor amb l'idioma de Wikipedia: els idiomes que comparteixen feed
+    # (ca -> es) tenen el mateix destacat
+    seed = f"{app.config['FEATURED_SEED']}|{wiki_lang}|{month:02d}-{day:02d}"
+    event = feed.featured(seed, weighted)
+    if not event:
+        return jsonify({'error': 'No events found for today'}), 404
+
+    # Cada combinació de camps es serialitza un sol cop per feed
+    with timing_phase('encode'):
+        body, etag = feed.serialized(('featured', seed, weighted, fields),
+                                     lambda: select_fields(ephemeris_summary(event), fields))
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # La CDN la guarda fins a mitjanit; el navegador revalida amb l'ETag
+    response.headers['Cache-Control'] = f'public, max-age=0, s-maxage={seconds_until_midnight()}'
+    return response.make_conditional(request)
+
+@app.route('/api/ephemeris/stream', methods=['GET'])
+def stream_ephemeris():
+    """
+    Flux SSE amb una efemèride aleatòria del dia (de la cache) cada `interval` segons
+    Query params: lang (ca, es, en), interval (opcional, segons),
+                  fields (opcional: id, year, text, hasDetails)
+    """
+    language = request.args.get('lang', app.config['DEFAULT_LANGUAGE'])
+
+    if language not in app.config['SUPPORTED_LANGUAGES']:
+        return jsonify({'error': 'Unsupported language'}), 400
+
+    try:
+        fields = parse_fields(request.args.get('fields'), SUMMARY_FIELDS)
+    except ValueError:
+        return jsonify({'error': 'Invalid fields'}), 400
+
+    try:
+        interval = int(request.args.get('interval') or app.config['STREAM_DEFAULT_INTERVAL'])
+    except ValueError:
+        return jsonify({'error': 'Invalid interval'}), 400
+    if not app.config['STREAM_MIN_INTERVAL'] <= interval <= app.config['STREAM_MAX_INTERVAL']:
+        return jsonify({'error': 'Invalid interval'}), 400
+
+    wiki_lang = get_mapped_language(language)
+
+    def next_message():
+        # La data es calcula a cada missatge: les pantalles passen la mitjanit connectades
+        today = datetime.now()
+        try:
+            event = wiki_client.get_random_event(today.month, today.day, wiki_lang)
+        except Exception as e:
+            app.logger.warning(f"Error getting stream ephemeris: {str(e)}")
+            return None
+        if not event:
+            return None
+        summary = ephemeris_summary(event)
+        return format_event(json.dumps(select_fields(summary, fields), ensure_ascii=False),
+                            event='ephemeris', event_id=summary['id'])
+
+    try:
+        stream = event_streams.open(next_message, interval)
+    except StreamLimitExceeded:
+        response = jsonify({'error': 'Too many open streams'})
+        response.headers['Retry-After'] = str(app.config['STREAM_RETRY_MS'] // 1000)
+        return response, 503
+
+    response = app.response_class(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Que nginx i similars no acumulin els missatges abans d'enviar-los
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/ephemeris/details', methods=['POST'])
 def get_ephemeris_details():
     """
     Retorna detalls ampliats d'una efemèride
-    Body: { year, text, lang }
+    Body: { id | (year, text), lang, date (opcional, MM-DD) }
+    Query params: fields (opcional: year, text, description, thumbnail,
+                  thumbnailSrcset, links, related), max_extract (opcional)
     """
+    try:
+        fields, max_extract = parse_details_options()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     data = request.get_json()
     language = data.get('lang', app.config['DEFAULT_LANGUAGE'])
-    year = data.get('year')
-    text = data.get('text')
+    identifier = event_identifier(data)
 
-    if not year or not text:
+    if not identifier:
         return jsonify({'error': 'Missing required fields'}), 400
 
+    try:
+        month, day = parse_month_day(data.get('date'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid date'}), 400
+
     # Map language to Wikipedia API language
     wiki_lang = get_mapped_language(language)
 
-    today = datetime.now()
-    month, day = today.month, today.day
-
     try:
-        # Obtenir tots els events i trobar el que coincideix
-        events = wiki_client.get_events(month, day, wiki_lang)
+        # Obtenir el feed del dia i trobar l'event pel seu identificador
+        with timing_phase('fetch'):
+            feed = wiki_client.get_feed(month, day, wiki_lang)
 
-        matching_event = None
-        for event in events:
-            if event.get('year') == year and event.get('text') == text:
-                matching_event = event
-                break
+        with timing_phase('match'):
+            matching_event = feed.get(identifier)
 
         if not matching_event:
             return jsonify({'error': 'Event not found'}), 404
 
         # Obtenir detalls ampliats
-        details = wiki_client.get_event_details(matching_event, wiki_lang)
-        return jsonify(details)
+        # Sense related no cal demanar els resums de les pàgines
+        with timing_phase('details'):
+            details = wiki_client.get_event_details(
+                matching_event, wiki_lang, enrich=fields is None or 'related' in fields)
+            details = render_details(details, fields, max_extract)
+        with timing_phase('encode'):
+            return jsonify(details)
 
+    except UpstreamOverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
         app.logger.error(f"Error getting details: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/ephemeris/details:batch', methods=['POST'])
+def get_ephemeris_details_batch():
+    """
+    Retorna els detalls de diversos events d'un mateix dia en una sola petició
+    Body: { items: [id | {id} | {year, text}, ...], lang, date (opcional, MM-DD) }
+    Query params: fields, max_extract (com a /api/ephemeris/details)
+
+    Cada element del resultat és {id, details} o {id, error, status}, en
+    l'ordre de la petició: un event no trobat no fa fallar la resta.
+    """
+    try:
+        fields, max_extract = parse_details_options()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('items'), list):
+        return jsonify({'error': 'Missing required fields'}), 400
+    items = data['items']
+    if len(items) > app.config['DETAILS_BATCH_MAX_ITEMS']:
+        return jsonify({'error': 'Too many items'}), 400
+
+    language = data.get('lang', app.config['DEFAULT_LANGUAGE'])
+    # L'idioma acaba a la URL de Wikipedia i a les claus de cache: només els suportats
+    if not isinstance(language, str) or language not in app.config['SUPPORTED_LANGUAGES']:
+        return jsonify({'error': 'Unsupported language'}), 400
+    try:
+        month, day = parse_month_day(data.get('date'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid date'}), 400
+
+    wiki_lang = get_mapped_language(language)
+
+    try:
+        # Un sol accés al feed per a tota la petició
+        with timing_phase('fetch'):
+            feed = wiki_client.get_feed(month, day, wiki_lang)
+
+        with timing_phase('match'):
+            identifiers = [event_identifier(item) for item in items]
+            # Els ids repetits es resolen una sola vegada
+            found = {}
+            for identifier in identifiers:
+                event = feed.get(identifier) if identifier else None
+                if event is not None:
+                    found[identifier] = event
+
+        with timing_phase('details'):
+            details = wiki_client.get_events_details(
+                list(found.values()), wiki_lang, enrich=fields is None or 'related' in fields)
+            details_by_id = {identifier: render_details(result, fields, max_extract)
+                             for identifier, result in zip(found, details)}
+
+        results = []
+        for identifier in identifiers:
+            if not identifier:
+                results.append({'id': None, 'error': 'Missing required fields', 'status': 400})
+            elif identifier not in details_by_id:
+                results.append({'id': identifier, 'error': 'Event not found', 'status': 404})
+            else:
+                results.append({'id': identifier, 'details': details_by_id[identifier]})
+        with timing_phase('encode'):
+            return jsonify({'results': results})
+
+    except UpstreamOverloadedError as e:
+        return overloaded_response(e)
+    except Exception as e:
+        app.logger.error(f"Error getting batch details: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/ephemeris/search', methods=['GET'])
+def search_ephemeris():
+    """
+    Cerca efemèrides per text entre tots els dies ja carregats
+    Query params: q (text a cercar), lang (ca, es, en), limit (per defecte 20)
+    """
+    language = request.args.get('lang', app.config['DEFAULT_LANGUAGE'])
+    query = request.args.get('q', '').strip()
+
+    if language not in app.config['SUPPORTED_LANGUAGES']:
+        return jsonify({'error': 'Unsupported language'}), 400
+    if not query:
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    try:
+        limit = min(int(request.args.get('limit', 20)), app.config['SEARCH_MAX_RESULTS'])
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    wiki_lang = get_mapped_language(language)
+    total, results = wiki_client.search_events(query, wiki_lang, max(limit, 1))
+    return jsonify({
+        'query': query,
+        'total': total,
+        'indexedDays': wiki_client.search_index.indexed_days(wiki_lang),
+        'results': results
+    })
+
+@app.route('/img/<token>', methods=['GET'])
+def proxied_image(token):
+    """
+    Miniatura redimensionada i recodificada en WebP
+    Query params: w (amplada desitjada; s'ajusta a la més propera disponible)
+    """
+    if image_proxy is None:
+        return jsonify({'error': 'Image not found'}), 404
+    width = request.args.get('w', type=int)
+
+    try:
+        path = image_proxy.get(token, width)
+    except ImageNotFound:
+        return jsonify({'error': 'Image not found'}), 404
+    except UpstreamOverloadedError as e:
+        return overloaded_response(e)
+    except requests.RequestException as e:
+        app.logger.error(f"Error fetching image: {str(e)}")
+        return jsonify({'error': 'Upstream image unavailable'}), 502
+    except InvalidImage as e:
+        app.logger.error(f"Invalid upstream image: {str(e)}")
+        return jsonify({'error': 'Upstream image unavailable'}), 502
+
+    # El token identifica la URL original: el contingut no canvia mai
+    response = send_file(path, mimetype=image_proxy.mimetype, conditional=True, etag=True)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 @app.route('/api/translations/<lang>', methods=['GET'])
 def get_translations(lang):
     """Retorna les traduccions per l'idioma especificat"""
@@ -111,11 +1000,7 @@ def get_translations(lang):
         return jsonify({'error': 'Unsupported language'}), 400
 
     try:
-        translations_path = os.path.join('translations', f'{lang}.json')
-        with open(translations_path, 'r', encoding='utf-8') as f:
-            import json
-            translations = json.load(f)
-        return jsonify(translations)
+        return jsonify(load_translations(lang))
     except FileNotFoundError:
         return jsonify({'error': 'Translations not found'}), 404
     except Exception as e:
@@ -127,6 +1012,116 @@ def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'ok', 'timestamp': datetime.now().isoformat()})
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness: 200 quan els feeds mínims (avui, per defecte) de tots els
+    idiomes són a la cache; 503 mentre el worker encara s'està escalfant
+    """
+    languages = get_wikipedia_languages()
+    feeds = {}
+    ready = True
+    for offset, date in enumerate(get_warm_dates()):
+        cached = {lang: wiki_client.is_cached(date.month, date.day, lang) for lang in languages}
+        feeds[date.strftime('%m-%d')] = cached
+        if offset < app.config['READINESS_MIN_DAYS'] and not all(cached.values()):
+            ready = False
+
+    body = {
+        'status': 'ready' if ready else 'warming',
+        'feeds': feeds,
+        'upstream': wiki_client.get_upstream_state(),
+        'timestamp': datetime.now().isoformat()
+    }
+    return jsonify(body), 200 if ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Exposa les mètriques en format Prometheus"""
+    body, content_type = metrics.render()
+    return body, 200, {'Content-Type': content_type}
+
+@app.route('/admin/cache', methods=['GET'])
+@require_admin
+def admin_cache():
+    """Ocupació de les caches en memòria i les seves entrades (per dimensionar-les)"""
+    return jsonify({
+        'caches': [wiki_client.cache.stats(), wiki_client.summary_cache.stats()],
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/admin/cache/<operation>', methods=['POST'])
+@require_admin
+def admin_cache_operation(operation):
+    """
+    Invalida, refresca o precarrega feeds concrets en aquest worker i ho
+    publica perquè ho facin els altres
+    Body: { keys: ['idioma:tipus:mes:dia', ...] } (qualsevol part pot ser '*')
+    """
+    if operation not in OPERATIONS:
+        return jsonify({'error': 'Not found'}), 404
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('keys'), list) or not data['keys']:
+        return jsonify({'error': 'Missing required fields'}), 400
+    try:
+        patterns = cache_admin.parse(data['keys'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    keys = cache_admin.target_keys(operation, patterns)
+    cache_admin.publish(operation, patterns)
+    if operation != 'invalidate' and len(keys) > app.config['ADMIN_SYNC_MAX_KEYS']:
+        # Moltes baixades: en segon pla, respectant el límit de peticions a Wikipedia
+        threading.Thread(target=cache_admin.run, args=(operation, keys),
+                         name=f'cache-{operation}', daemon=True).start()
+        return jsonify({'operation': operation, 'status': 'accepted',
+                        'keys': [format_key(key) for key in keys]}), 202
+    done = cache_admin.run(operation, keys)
+    return jsonify({'operation': operation, 'status': 'done', 'keys': done})
+
+cache_cli = AppGroup('cache', help="Operacions sobre la cache de feeds de tots els workers")
+
+
+def publish_cache_operation(operation: str, keys: tuple):
+    """Publica una operació al fitxer de difusió (la CLI no té la cache dels workers)"""
+    if cache_admin.broadcast is None:
+        raise click.ClickException('CACHE_BROADCAST_FILE is not configured')
+    try:
+        patterns = cache_admin.parse(keys)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    cache_admin.publish(operation, patterns)
+    click.echo(f"{operation}: {', '.join(str(pattern) for pattern in patterns)}")
+
+
+@cache_cli.command('invalidate')
+@click.argument('keys', nargs=-1, required=True)
+def cache_invalidate(keys):
+    """Treu de la cache els feeds KEYS (idioma:tipus:mes:dia, amb '*')"""
+    publish_cache_operation('invalidate', keys)
+
+
+@cache_cli.command('refresh')
+@click.argument('keys', nargs=-1, required=True)
+def cache_refresh(keys):
+    """Marca per tornar a descarregar els feeds KEYS que són a la cache"""
+    publish_cache_operation('refresh', keys)
+
+
+@cache_cli.command('warm')
+@click.argument('keys', nargs=-1, required=True)
+def cache_warm(keys):
+    """Carrega a la cache els feeds KEYS que encara no hi són"""
+    publish_cache_operation('warm', keys)
+
+
+app.cli.add_command(cache_cli)
+
+@app.cli.command('profile-token')
+def print_profile_token():
+    """Mostra un token per forçar el profiling d'una petició (capçalera PROFILE_HEADER)"""
+    click.echo(request_profiler.make_token())
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=app.config['DEBUG'])
@@ -0,0 +1,52 @@
+"""
+Fixtures per als microbenchmarks (pytest-benchmark)
+"""
+import os
+import pytest
+from datetime import datetime
+
+os.environ.setdefault('PREWARM_ENABLED', '0')
+from api.rate_limit import UpstreamLimiter
+from api.wikipedia_client import WikipediaClient
+from benchmarks.mock_upstream import MockUpstream
+import app as app_module
+
+
+@pytest.fixture(scope='session')
+def upstream():
+    """Mock local de Wikipedia compartit per tota la sessió"""
+    server = MockUpstream(events=150).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def bench_app(upstream, monkeypatch):
+    """Aplicació Flask apuntant al mock, amb la cache buida i sense límit de ritme"""
+    wiki_client = app_module.wiki_client
+    monkeypatch.setattr(wiki_client, 'base_url_template', upstream.base_url_template)
+    monkeypatch.setattr(wiki_client, 'limiter',
+                        UpstreamLimiter(rate=1e6, burst=1e6, max_concurrency=64, queue_timeout=30))
+    wiki_client.cache.clear()
+    app_module.app.config['TESTING'] = True
+    yield app_module.app
+    wiki_client.cache.clear()
+
+
+@pytest.fixture
+def bench_client(bench_app):
+    return bench_app.test_client()
+
+
+@pytest.fixture
+def today_event(bench_client):
+    """Un event del feed d'avui (i la cache ja calenta)"""
+    return bench_client.get('/api/ephemeris/today?lang=en').get_json()
+
+
+@pytest.fixture
+def feed_events(upstream):
+    """Events d'un dia llegits directament del mock"""
+    client = WikipediaClient(upstream.base_url_template)
+    today = datetime.now()
+    return client.get_events(today.month, today.day, 'en')
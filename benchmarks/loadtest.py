@@ -0,0 +1,245 @@
+"""
+Load test reproduïble de l'API contra el mock local de Wikipedia
+
+Arrenca el mock (benchmarks/mock_upstream.py) i l'aplicació Flask en el
+mateix procés, llança peticions concurrents a cada escenari, en fred
+(cache desactivada: cada petició va a Wikipedia) i en calent, i compara
+throughput i percentils amb un baseline desat:
+
+    python -m benchmarks.loadtest --update-baseline   # desa un baseline d'aquesta màquina
+    python -m benchmarks.loadtest                     # compara amb el baseline
+
+Els números absoluts depenen del maquinari, així que el baseline no es
+versiona: es desa a .benchmarks/ i només es compara amb execucions de la
+mateixa màquina (si el host no coincideix, no es compara).
+
+Surt amb codi 1 si alguna mètrica empitjora més que la tolerància.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.mock_upstream import MockUpstream
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, '.benchmarks', 'loadtest-baseline.json')
+
+
+def host_id() -> Dict:
+    """Identifica la màquina on s'ha mesurat (els baselines no són portables)"""
+    return {'node': platform.node(), 'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentil pel mètode del rang més proper (valors ja ordenats)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """Resumeix una tanda de peticions: throughput i percentils en ms"""
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput': round(len(values) / elapsed, 1) if elapsed > 0 else 0.0,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+    }
+
+
+def run_load(send: Callable[[requests.Session], requests.Response], total: int,
+             concurrency: int) -> Dict:
+    """Envia `total` peticions amb `concurrency` fils i en mesura la latència"""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(_):
+        nonlocal errors
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            ok = send(session).ok
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+class LocalApp:
+    """L'aplicació Flask servida per werkzeug en un fil, apuntant al mock"""
+
+    def __init__(self, upstream: MockUpstream):
+        os.environ.setdefault('PREWARM_ENABLED', '0')
+        import app as app_module
+        from api.rate_limit import UpstreamLimiter
+
+        self.module = app_module
+        self.client = app_module.wiki_client
+        self.client.base_url_template = upstream.base_url_template
+        # El benchmark mesura l'aplicació, no el limitador de Wikipedia
+        self.client.limiter = UpstreamLimiter(rate=1e6, burst=1e6, max_concurrency=256,
+                                              queue_timeout=30)
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self._server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+        self.base_url = f'http://127.0.0.1:{self._server.server_port}'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self) -> 'LocalApp':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def set_cold(self, cold: bool, ttl: float):
+        """En fred es desactiva la cache perquè cada petició vagi a Wikipedia"""
+        self.client.cache.clear()
+        self.client.cache.ttl = 0 if cold else ttl
+
+
+def build_scenarios(base_url: str, lang: str) -> Dict[str, Callable]:
+    """Escenaris a mesurar: funcions que envien una petició amb una sessió"""
+    event = requests.get(f'{base_url}/api/ephemeris/today?lang={lang}', timeout=10).json()
+    details_body = {'year': event['year'], 'text': event['text'], 'lang': lang}
+
+    return {
+        'today': lambda s: s.get(f'{base_url}/api/ephemeris/today?lang={lang}', timeout=30),
+        'feed': lambda s: s.get(f'{base_url}/api/ephemeris/feed?lang={lang}', timeout=30),
+        'details': lambda s: s.post(f'{base_url}/api/ephemeris/details', json=details_body,
+                                    timeout=30),
+        'translations': lambda s: s.get(f'{base_url}/api/translations/{lang}', timeout=30),
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Retorna la llista de regressions respecte al baseline"""
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            # Marge absolut d'1 ms perquè el soroll no faci fallar latències minúscules
+            limit = reference[metric] * (1 + tolerance) + 1.0
+            if current[metric] > limit:
+                regressions.append(f'{name} {metric}: {current[metric]} > {limit:.2f}')
+        minimum = reference['throughput'] * (1 - tolerance)
+        if current['throughput'] < minimum:
+            regressions.append(f"{name} throughput: {current['throughput']} < {minimum:.1f}")
+        if current['errors'] > reference['errors']:
+            regressions.append(f"{name} errors: {current['errors']} > {reference['errors']}")
+    return regressions
+
+
+def missing_from_baseline(results: Dict, baseline: Dict) -> List[str]:
+    """Escenaris mesurats que el baseline no té (compare no els pot avaluar)"""
+    return [name for name in results if not baseline.get(name)]
+
+
+def print_table(results: Dict):
+    print(f"{'scenario':<22}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:<22}{r['throughput']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['errors']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Load test contra el mock de Wikipedia')
+    parser.add_argument('--requests', type=int, default=300, help='Peticions per escenari')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--lang', default='en')
+    parser.add_argument('--events', type=int, default=150, help='Events per dia al mock')
+    parser.add_argument('--latency', default='lognormal:20,0.5', help='Latència del mock')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Empitjorament relatiu permès (0.25 = 25%%)')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--json', help='Desa els resultats en aquest fitxer')
+    args = parser.parse_args(argv)
+
+    upstream = MockUpstream(events=args.events, latency=args.latency,
+                            error_rate=args.error_rate).start()
+    local_app = LocalApp(upstream).start()
+    ttl = local_app.module.app.config['CACHE_TIMEOUT']
+    scenarios = build_scenarios(local_app.base_url, args.lang)
+
+    results = {}
+    try:
+        for mode in ('cold', 'warm'):
+            local_app.set_cold(mode == 'cold', ttl)
+            for name, send in scenarios.items():
+                send(requests)  # escalfa connexions i, en calent, la cache
+                results[f'{name}:{mode}'] = run_load(send, args.requests, args.concurrency)
+    finally:
+        local_app.stop()
+        upstream.stop()
+
+    print_table(results)
+    settings = {k: getattr(args, k) for k in ('requests', 'concurrency', 'lang', 'events',
+                                              'latency', 'error_rate')}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': settings, 'results': results}, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'host': host_id(), 'settings': settings, 'results': results}, f, indent=2)
+            f.write('\n')
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline found; run with --update-baseline first')
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('host') != host_id():
+        print('Baseline was recorded on another machine:', baseline.get('host'))
+        print('Not comparing; run with --update-baseline on this machine first')
+        return 0
+    if baseline.get('settings') != settings:
+        print('WARNING: baseline was recorded with different settings:', baseline.get('settings'))
+    missing = missing_from_baseline(results, baseline['results'])
+    if missing:
+        print(f"WARNING: not in baseline, not compared: {', '.join(missing)} "
+              f"(run with --update-baseline)")
+    regressions = compare(results, baseline['results'], args.tolerance)
+    if regressions:
+        print('\nPERFORMANCE REGRESSIONS:')
+        for line in regressions:
+            print(f'  - {line}')
+        return 1
+    print('\nNo regressions against baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
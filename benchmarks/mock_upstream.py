@@ -0,0 +1,237 @@
+"""
+Servidor local que imita l'API onthisday de Wikipedia per benchmarks
+
+Serveix `/{lang}/feed/onthisday/{type}/{MM}/{DD}` amb un feed sintètic i
+determinista (i `/{lang}/page/summary/{title}` amb el resum de cada
+pàgina), amb mida de payload, distribució de latència i taxa d'errors
+configurables. Es pot fer servir des de Python (MockUpstream) o com a
+script:
+
+    python -m benchmarks.mock_upstream --port 8081 --events 200 \\
+        --latency lognormal:40,0.6 --error-rate 0.01
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+
+FEED_PATH = re.compile(
+    r'^/(?P<lang>[a-z-]+)/feed/onthisday/(?P<type>\w+)/(?P<month>\d{2})/(?P<day>\d{2})$')
+SUMMARY_PATH = re.compile(r'^/(?P<lang>[a-z-]+)/page/summary/(?P<title>[^/?]+)$')
+THUMBNAIL_BASE = 'https://upload.wikimedia.org/wikipedia/commons/thumb'
+
+WORDS = (
+    'guerra pau tractat rei reina imperi república revolució batalla ciutat '
+    'fundació descobriment ciència música història independència constitució '
+    'España Catalunya França Roma Àustria Japó València Barcelona París Londres '
+    'war peace treaty king queen empire republic revolution battle city '
+    'founded discovery science music history independence constitution'
+).split()
+
+
+def parse_latency(spec: str):
+    """
+    Converteix una especificació de latència en una funció que retorna segons
+
+    Formats: 'fixed:MS', 'uniform:MIN_MS,MAX_MS', 'lognormal:MEDIAN_MS,SIGMA'
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',')] if params else []
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal':
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f'Unknown latency distribution: {spec}')
+
+
+def build_feed(lang: str, month: int, day: int, events: int = 100,
+               extract_words: int = 60) -> Dict:
+    """Genera un feed onthisday sintètic i reproduïble per (idioma, mes, dia)"""
+    rng = random.Random(f'{lang}-{month}-{day}')
+    result = []
+    for index in range(events):
+        pages = []
+        for page_index in range(rng.randint(0, 4)):
+            title = f'{rng.choice(WORDS).capitalize()}_{month}_{day}_{index}_{page_index}'
+            pages.append({
+                'title': title,
+                'description': ' '.join(rng.choices(WORDS, k=5)),
+                'extract': ' '.join(rng.choices(
+                    WORDS, k=rng.randint(extract_words // 2, extract_words))),
+                'revision': str(rng.randint(10 ** 8, 10 ** 9)),
+                'thumbnail': {
+                    'source': f'{THUMBNAIL_BASE}/{title}.jpg/320px-{title}.jpg',
+                    'width': 320,
+                    'height': 240
+                },
+                'content_urls': {
+                    'desktop': {'page': f'https://{lang}.wikipedia.org/wiki/{title}'},
+                    'mobile': {'page': f'https://{lang}.m.wikipedia.org/wiki/{title}'}
+                }
+            })
+        result.append({
+            'year': rng.randint(-500, 2025),
+            'text': ' '.join(rng.choices(WORDS, k=rng.randint(6, 20))).capitalize(),
+            'pages': pages
+        })
+    return {'events': result}
+
+
+def build_summary(lang: str, title: str, extract_words: int = 60) -> Dict:
+    """Genera el resum sintètic (page/summary) d'una pàgina, estable per títol"""
+    rng = random.Random(f'{lang}-{title}')
+    return {
+        'title': title,
+        'description': ' '.join(rng.choices(WORDS, k=5)),
+        'extract': ' '.join(rng.choices(WORDS, k=extract_words)),
+        'thumbnail': {
+            'source': f'{THUMBNAIL_BASE}/{title}.jpg/320px-{title}.jpg',
+            'width': 320,
+            'height': 240
+        },
+        'content_urls': {
+            'desktop': {'page': f'https://{lang}.wikipedia.org/wiki/{title}'}
+        }
+    }
+
+
+class MockUpstream:
+    """Servidor HTTP fals de Wikipedia que s'executa en un fil de fons"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, events: int = 100,
+                 extract_words: int = 60, latency: str = 'fixed:0',
+                 error_rate: float = 0.0, seed: int = 1234):
+        self.events = events
+        self.extract_words = extract_words
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._payloads = {}
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def base_url_template(self) -> str:
+        """Plantilla compatible amb Config.WIKIPEDIA_API_BASE"""
+        return (f'http://127.0.0.1:{self.port}'
+                '/{lang}/feed/onthisday/{type}/{month:02d}/{day:02d}')
+
+    @property
+    def summary_url_template(self) -> str:
+        """Plantilla compatible amb Config.WIKIPEDIA_SUMMARY_BASE"""
+        return f'http://127.0.0.1:{self.port}' + '/{lang}/page/summary/{title}'
+
+    def payload(self, lang: str, month: int, day: int) -> bytes:
+        """Cos JSON del feed (es genera una sola vegada per dia i idioma)"""
+        key = (lang, month, day)
+        with self._lock:
+            if key not in self._payloads:
+                feed = build_feed(lang, month, day, self.events, self.extract_words)
+                self._payloads[key] = json.dumps(feed).encode()
+            return self._payloads[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors}
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+
+    def _next_delay_and_error(self):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency(self._rng)
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def _make_handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                feed = FEED_PATH.match(self.path)
+                summary = SUMMARY_PATH.match(self.path)
+                if not feed and not summary:
+                    return self._send(404, b'{"title": "Not found"}')
+                delay, failed = upstream._next_delay_and_error()
+                if delay > 0:
+                    time.sleep(delay)
+                if failed:
+                    return self._send(503, b'{"title": "Injected error"}')
+                if summary:
+                    title = unquote(summary['title'])
+                    body = json.dumps(build_summary(summary['lang'], title,
+                                                    upstream.extract_words)).encode()
+                else:
+                    body = upstream.payload(feed['lang'], int(feed['month']), int(feed['day']))
+                self._send(200, body)
+
+            def _send(self, status: int, body: bytes):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'MockUpstream':
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='mock-upstream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Mock de l\'API onthisday de Wikipedia')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--events', type=int, default=100, help='Events per dia')
+    parser.add_argument('--extract-words', type=int, default=60, help='Paraules per extracte')
+    parser.add_argument('--latency', default='fixed:0',
+                        help="fixed:MS, uniform:MIN,MAX o lognormal:MEDIAN,SIGMA")
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fracció de respostes 503')
+    args = parser.parse_args(argv)
+
+    upstream = MockUpstream(args.host, args.port, args.events, args.extract_words,
+                            args.latency, args.error_rate)
+    print(f'WIKIPEDIA_API_BASE={upstream.base_url_template}')
+    print(f'WIKIPEDIA_SUMMARY_BASE={upstream.summary_url_template}')
+    try:
+        upstream._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Reproducció d'una traça de peticions reals contra el mock local de Wikipedia
+
+Les traces es graven en producció amb TRACE_FILE (api/request_trace.py) i
+conserven la barreja real d'idiomes, dies, detalls i ràfegues de "següent".
+Aquí s'arrenquen el mock (benchmarks/mock_upstream.py) i l'aplicació en el
+mateix procés, i cada petició es llança al mateix instant relatiu que a la
+traça, a velocitat real o accelerada:
+
+    python -m benchmarks.replay trace.jsonl                  # 1x
+    python -m benchmarks.replay trace-*.jsonl --speed 20     # 20 vegades més ràpid
+    python -m benchmarks.replay trace.jsonl --speed 0        # tan ràpid com es pugui
+
+La latència es mesura des de l'instant programat, no des que un fil queda
+lliure: si l'aplicació no dona l'abast, les esperes surten als percentils.
+Els TTL de la cache són en temps real, de manera que amb --speed alt hi
+caduquen menys feeds que en producció i la taxa d'encerts surt optimista.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+
+from api.request_trace import load_trace
+from api.structured_logging import ACCESS_LOGGER
+from benchmarks.loadtest import LocalApp, summarize
+from benchmarks.mock_upstream import WORDS, MockUpstream, build_feed
+
+DETAILS_ROUTES = ('/api/ephemeris/details', '/api/ephemeris/details:batch')
+
+
+def build_request(entry: Dict, events_for: Callable[[str, str], List[Dict]],
+                  rng: random.Random) -> Tuple[str, str, Optional[Dict]]:
+    """
+    Converteix una línia de traça en (mètode, camí, cos JSON)
+
+    La traça no desa quin event es va mirar ni el text cercat: els detalls es
+    demanen d'un event a l'atzar del mateix dia i idioma, i les cerques, d'una
+    paraula del vocabulari del mock. Si la línia no porta idioma (traces
+    antigues), la petició tampoc el porta i l'aplicació aplica el de per defecte.
+    """
+    route, language, date = entry['r'], entry.get('l'), entry.get('d')
+    if route == '/api/translations/<lang>':
+        return 'GET', f'/api/translations/{language}', None
+    params = {'lang': language} if language else {}
+    if route in DETAILS_ROUTES:
+        events = events_for(language, date)
+        if route == '/api/ephemeris/details':
+            event = rng.choice(events)
+            return 'POST', route, {'year': event['year'], 'text': event['text'],
+                                   'date': date, **params}
+        chosen = rng.sample(events, min(entry.get('n') or 1, len(events)))
+        return 'POST', route, {'items': [{'year': e['year'], 'text': e['text']} for e in chosen],
+                               'date': date, **params}
+    if route == '/api/ephemeris/search':
+        params['q'] = rng.choice(WORDS).lower()
+    else:
+        params['date'] = date
+    return 'GET', f'{route}?{urlencode(params)}', None
+
+
+def replay(entries: List[Dict], send: Callable[[requests.Session, Dict], int], speed: float,
+           concurrency: int) -> Dict:
+    """
+    Llança les peticions de la traça respectant els intervals (dividits per `speed`)
+
+    Args:
+        send: Envia una línia de traça i retorna el codi HTTP
+        speed: 1 = temps real, 10 = deu vegades més ràpid, 0 = sense esperes
+
+    Returns:
+        Resum global i per ruta (throughput, percentils, errors)
+    """
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(entry: Dict, due: Optional[float]):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = due if due is not None else time.perf_counter()
+        try:
+            failed = send(session, entry) >= 400
+        except requests.RequestException:
+            failed = True
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.setdefault(entry['r'], []).append(elapsed)
+            errors[entry['r']] = errors.get(entry['r'], 0) + failed
+
+    first = entries[0]['t'] if entries else 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in entries:
+            due = None
+            if speed > 0:
+                due = start + (entry['t'] - first) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(one, entry, due)
+    elapsed = time.perf_counter() - start
+
+    every = [value for values in latencies.values() for value in values]
+    return {
+        'overall': summarize(every, sum(errors.values()), elapsed),
+        'routes': {route: summarize(values, errors[route], elapsed)
+                   for route, values in sorted(latencies.items())},
+    }
+
+
+def cache_counts(registry) -> Dict[str, Dict[str, float]]:
+    """Encerts i errades acumulats de cada cache en memòria"""
+    return {name: {result: registry.get_sample_value(
+                       'ephemerides_feed_cache_requests_total',
+                       {'cache': name, 'result': result}) or 0.0
+                   for result in ('hit', 'miss')}
+            for name in ('feeds', 'summaries')}
+
+
+def hit_ratios(before: Dict, after: Dict) -> Dict[str, Optional[float]]:
+    """Taxa d'encerts de cada cache entre dues lectures de cache_counts()"""
+    ratios = {}
+    for name in after:
+        hits = after[name]['hit'] - before[name]['hit']
+        misses = after[name]['miss'] - before[name]['miss']
+        ratios[name] = round(hits / (hits + misses), 3) if hits + misses else None
+    return ratios
+
+
+def print_report(report: Dict):
+    trace = report['trace']
+    speed = f"{trace['speed']:g}x" if trace['speed'] > 0 else 'full speed'
+    print(f"trace: {trace['requests']} requests over {trace['durationSeconds']}s "
+          f"replayed at {speed}\n")
+    print(f"{'route':<32}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    rows = list(report['routes'].items()) + [('total', report['overall'])]
+    for name, r in rows:
+        print(f"{name:<32}{r['throughput']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['errors']:>8}")
+    ratios = (f"{name} {'n/a' if ratio is None else ratio}"
+              for name, ratio in report['cache'].items())
+    print('\ncache hit ratio: ' + ', '.join(ratios))
+    upstream = report['upstream']
+    print(f"upstream calls: {upstream['requests']} ({upstream['errors']} errors)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Reprodueix una traça contra el mock de Wikipedia')
+    parser.add_argument('traces', nargs='+', help='Fitxers de traça (TRACE_FILE)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Factor d\'acceleració (0 = sense esperes)')
+    parser.add_argument('--concurrency', type=int, default=64, help='Peticions simultànies màximes')
+    parser.add_argument('--limit', type=int, help='Reprodueix només les primeres N peticions')
+    parser.add_argument('--events', type=int, default=150, help='Events per dia al mock')
+    parser.add_argument('--latency', default='lognormal:40,0.6', help='Latència del mock')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--json', help='Desa l\'informe en aquest fitxer')
+    args = parser.parse_args(argv)
+
+    entries = load_trace(args.traces)[:args.limit]
+    if not entries:
+        print('No requests found in trace')
+        return 1
+
+    upstream = MockUpstream(events=args.events, latency=args.latency,
+                            error_rate=args.error_rate, seed=args.seed).start()
+    local_app = LocalApp(upstream).start()
+    if local_app.client.summary_url_template:
+        # ENRICHMENT_ENABLED=1: els resums també surten del mock
+        local_app.client.summary_url_template = upstream.summary_url_template
+    # El log d'accés de cada petició taparia l'informe
+    logging.getLogger(ACCESS_LOGGER).setLevel(logging.WARNING)
+    config = local_app.module.app.config
+    language_map = config['WIKIPEDIA_LANGUAGE_MAP']
+
+    @lru_cache(maxsize=None)
+    def events_for(language: Optional[str], date: str) -> List[Dict]:
+        month, day = (int(part) for part in date.split('-'))
+        language = language or config['DEFAULT_LANGUAGE']
+        return build_feed(language_map.get(language, language), month, day,
+                          upstream.events, upstream.extract_words)['events']
+
+    rng = random.Random(args.seed)
+    # Les peticions es preparen abans: l'atzar i la generació dels feeds no compten a la latència
+    prepared = {id(entry): build_request(entry, events_for, rng) for entry in entries}
+
+    def send(session: requests.Session, entry: Dict) -> int:
+        method, path, body = prepared[id(entry)]
+        return session.request(method, local_app.base_url + path, json=body, timeout=30).status_code
+
+    registry = local_app.module.metrics.REGISTRY
+    before = cache_counts(registry)
+    try:
+        report = replay(entries, send, args.speed, args.concurrency)
+    finally:
+        local_app.stop()
+        upstream.stop()
+
+    report['trace'] = {'requests': len(entries), 'speed': args.speed,
+                       'durationSeconds': round(entries[-1]['t'] - entries[0]['t'], 1)}
+    report['cache'] = hit_ratios(before, cache_counts(registry))
+    report['upstream'] = upstream.stats()
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
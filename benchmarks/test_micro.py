@@ -0,0 +1,60 @@
+"""
+Microbenchmarks de les rutes i del client de Wikipedia
+
+    make bench-save   # desa un baseline a .benchmarks/
+    make bench        # compara amb l'últim baseline i falla si empitjora
+"""
+import pytest
+import app as app_module
+from api.feed_cache import FeedCache
+
+pytest.importorskip('pytest_benchmark')
+
+
+def test_today_warm(benchmark, bench_client, today_event):
+    """GET /api/ephemeris/today amb el feed ja a la cache"""
+    response = benchmark(bench_client.get, '/api/ephemeris/today?lang=en')
+    assert response.status_code == 200
+
+
+def test_today_cold(benchmark, bench_client, monkeypatch):
+    """GET /api/ephemeris/today anant sempre a Wikipedia (cache desactivada)"""
+    monkeypatch.setattr(app_module.wiki_client.cache, 'ttl', 0)
+    response = benchmark(bench_client.get, '/api/ephemeris/today?lang=en')
+    assert response.status_code == 200
+
+
+def test_details_warm(benchmark, bench_client, today_event):
+    """POST /api/ephemeris/details amb el feed ja a la cache"""
+    body = {'year': today_event['year'], 'text': today_event['text'], 'lang': 'en'}
+    response = benchmark(bench_client.post, '/api/ephemeris/details', json=body)
+    assert response.status_code == 200
+
+
+def test_details_cold(benchmark, bench_client, today_event, monkeypatch):
+    """POST /api/ephemeris/details anant sempre a Wikipedia"""
+    monkeypatch.setattr(app_module.wiki_client.cache, 'ttl', 0)
+    app_module.wiki_client.cache.clear()
+    body = {'year': today_event['year'], 'text': today_event['text'], 'lang': 'en'}
+    response = benchmark(bench_client.post, '/api/ephemeris/details', json=body)
+    assert response.status_code == 200
+
+
+def test_translations(benchmark, bench_client):
+    """GET /api/translations/<lang>"""
+    response = benchmark(bench_client.get, '/api/translations/ca')
+    assert response.status_code == 200
+
+
+def test_get_event_details(benchmark, feed_events):
+    """WikipediaClient.get_event_details sobre un event amb pàgines"""
+    event = next(e for e in feed_events if e['pages'])
+    details = benchmark(app_module.wiki_client.get_event_details, event, 'en')
+    assert details['links']
+
+
+def test_feed_cache_hit(benchmark):
+    """FeedCache.get d'una entrada resident"""
+    cache = FeedCache(ttl=3600, max_entries=1000)
+    cache.set(('en', 'events', 2, 16), [])
+    assert benchmark(cache.get, ('en', 'events', 2, 16)) == []
@@ -6,8 +6,33 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     DEBUG = os.environ.get('FLASK_ENV') != 'production'
 
+    # Logs JSON escrits per un fil de fons (api/structured_logging.py)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_QUEUE_SIZE = 10000  # registres en cua; si s'omple es descarten
+    LOG_DEDUP_WINDOW = 60  # segons: un sol error igual per finestra
+    # Fracció de respostes correctes que van al log d'accés (els errors, sempre)
+    ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE', 0.1))
+    # Traça de totes les peticions per a benchmarks/replay.py (buit = desactivada;
+    # '{pid}' dona un fitxer per worker)
+    TRACE_FILE = os.environ.get('TRACE_FILE') or None
+
     # Wikipedia API
-    WIKIPEDIA_API_BASE = 'https://{lang}.wikipedia.org/api/rest_v1/feed/onthisday/{type}/{month:02d}/{day:02d}'
+    # Es pot sobreescriure (p.ex. per apuntar al mock de benchmarks/mock_upstream.py)
+    WIKIPEDIA_API_BASE = os.environ.get(
+        'WIKIPEDIA_API_BASE',
+        'https://{lang}.wikipedia.org/api/rest_v1/feed/onthisday/{type}/{month:02d}/{day:02d}'
+    )
+
+    # API page/summary per enriquir els detalls amb cada pàgina relacionada
+    WIKIPEDIA_SUMMARY_BASE = os.environ.get(
+        'WIKIPEDIA_SUMMARY_BASE',
+        'https://{lang}.wikipedia.org/api/rest_v1/page/summary/{title}'
+    )
+    # Opt-in: multiplica les peticions a Wikipedia la primera vegada
+    ENRICHMENT_ENABLED = os.environ.get('ENRICHMENT_ENABLED', '0') == '1'
+    ENRICHMENT_POOL_SIZE = 8  # resums descarregats en paral·lel
+    ENRICHMENT_TIMEOUT = 2.0  # segons màxims esperant els resums d'un event
+    SUMMARY_CACHE_MAX_ENTRIES = 5000
 
     # Supported languages for UI
     SUPPORTED_LANGUAGES = ['ca', 'es', 'en']
@@ -21,5 +46,89 @@ class Config:
         'en': 'en'
     }
 
-    # Cache settings (opcional per futura optimització)
-    CACHE_TIMEOUT = 3600  # 1 hora en segons
+    # Hedging de peticions a Wikipedia per retallar la latència de cua
+    # (0 = desactivat; 0.05 = com a màxim un 5% de peticions duplicades)
+    WIKIPEDIA_HEDGE_MAX_RATIO = float(os.environ.get('WIKIPEDIA_HEDGE_MAX_RATIO', 0))
+    # Segons abans d'enviar el duplicat (buit = p95 mòbil de latència)
+    WIKIPEDIA_HEDGE_DELAY = float(os.environ['WIKIPEDIA_HEDGE_DELAY']) \
+        if os.environ.get('WIKIPEDIA_HEDGE_DELAY') else None
+
+    # Límits de peticions a Wikipedia per procés (token bucket + concurrència)
+    UPSTREAM_RATE_LIMIT = float(os.environ.get('UPSTREAM_RATE_LIMIT', 20))  # peticions/segon
+    UPSTREAM_RATE_BURST = float(os.environ.get('UPSTREAM_RATE_BURST', 40))
+    UPSTREAM_MAX_CONCURRENCY = int(os.environ.get('UPSTREAM_MAX_CONCURRENCY', 8))
+    # Segons màxims en cua; passat aquest termini es respon 503 amb Retry-After
+    UPSTREAM_QUEUE_TIMEOUT = float(os.environ.get('UPSTREAM_QUEUE_TIMEOUT', 2))
+
+    # Profiling opt-in de peticions lentes (fitxers .prof de cProfile)
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # 0 = només amb token
+    PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 500))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+    # Capçalera amb token signat (flask profile-token) per forçar el profiling
+    PROFILE_HEADER = 'X-Profile-Token'
+
+    # Cache settings
+    CACHE_TIMEOUT = 3600  # 1 hora en segons (TTL inicial de cada feed)
+    # Límits del TTL adaptatiu: s'allarga als feeds que no canvien entre
+    # baixades i s'escurça als que sí (p.ex. el d'avui)
+    CACHE_MIN_TTL = int(os.environ.get('CACHE_MIN_TTL', 300))
+    CACHE_MAX_TTL = int(os.environ.get('CACHE_MAX_TTL', 86400))
+    CACHE_MAX_ENTRIES = 1000  # 366 dies x idiomes de Wikipedia, amb marge
+    # Memòria aproximada màxima dels feeds en cache (0 = només el límit d'entrades)
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+    # Token (Authorization: Bearer) dels endpoints /admin; sense token, no existeixen
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    # Operacions de /admin/cache/refresh i /warm amb més claus que aquestes
+    # s'executen en segon pla (202)
+    ADMIN_SYNC_MAX_KEYS = 20
+
+    # Fitxer compartit on es publiquen les operacions d'administració de la
+    # cache perquè les apliquin tots els workers (buit = només el procés actual)
+    CACHE_BROADCAST_FILE = os.environ.get('CACHE_BROADCAST_FILE')
+    CACHE_BROADCAST_INTERVAL = 2  # segons entre lectures del fitxer
+
+    # Amb PROMETHEUS_MULTIPROC_DIR (diversos workers), segons entre desades dels
+    # gauges que cada worker llegeix d'una funció (cua i peticions a Wikipedia)
+    METRICS_SAMPLE_INTERVAL = 5
+
+    # Proxy de miniatures (/img/<token>): WebP redimensionat i cache a disc (requereix Pillow)
+    IMAGE_PROXY_ENABLED = os.environ.get('IMAGE_PROXY_ENABLED', '1') == '1'
+    IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', 'image_cache')
+    IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+    IMAGE_PROXY_WIDTHS = (160, 320)  # amplades (px) que s'ofereixen al srcset
+    IMAGE_PROXY_HOSTS = ('upload.wikimedia.org',)
+    # Mida màxima de l'original que es descarrega (més gran: 502 sense passar per Pillow)
+    IMAGE_PROXY_MAX_DOWNLOAD_BYTES = int(os.environ.get('IMAGE_PROXY_MAX_DOWNLOAD_BYTES',
+                                                        10 * 1024 * 1024))
+
+    # Segons que el navegador (i el service worker) pot reutilitzar /api/ephemeris/feed
+    # sense revalidar-lo; després es revalida amb l'ETag
+    FEED_MAX_AGE = 300
+
+    # Events màxims per petició a /api/ephemeris/details:batch
+    DETAILS_BATCH_MAX_ITEMS = 50
+
+    # Flux SSE per a pantalles (/api/ephemeris/stream); per milers de connexions
+    # cal servir l'app amb gunicorn i workers gevent (vegeu Procfile i gunicorn.conf.py)
+    STREAM_MAX_CONNECTIONS = int(os.environ.get('STREAM_MAX_CONNECTIONS', 5000))
+    STREAM_DEFAULT_INTERVAL = 30  # segons entre efemèrides
+    STREAM_MIN_INTERVAL = 5
+    STREAM_MAX_INTERVAL = 3600
+    STREAM_HEARTBEAT = 15  # segons entre comentaris de keep-alive
+    STREAM_MAX_DURATION = 3600  # després el client es reconnecta
+    STREAM_RETRY_MS = 5000
+
+    # Llavor de /api/ephemeris/featured: canviar-la tria un altre destacat per a cada dia
+    FEATURED_SEED = os.environ.get('FEATURED_SEED', 'ephemerides')
+
+    # Cerca de text (només sobre feeds ja carregats)
+    SEARCH_MAX_RESULTS = 100
+
+    # Precàrrega dels feeds d'avui i demà en arrencar (i periòdicament)
+    PREWARM_ENABLED = os.environ.get('PREWARM_ENABLED', '1') == '1'
+    PREWARM_INTERVAL = 300  # segons entre passades
+    # Carregar els 366 dies en arrencar perquè la cerca cobreixi tot l'any
+    PREWARM_ALL_DAYS = os.environ.get('PREWARM_ALL_DAYS', '0') == '1'
+    # Dies (a partir d'avui) que han de ser a la cache perquè /ready retorni 200
+    READINESS_MIN_DAYS = 1
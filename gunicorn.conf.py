@@ -0,0 +1,46 @@
+"""
+Configuració de gunicorn per producció (vegeu Procfile)
+
+Workers gevent: gunicorn aplica el monkey-patching abans de carregar
+l'aplicació, de manera que cada connexió (p.ex. un flux SSE obert) és un
+greenlet. El servidor de desenvolupament de Werkzeug (python app.py) no
+s'ha de fer servir en producció: amb DEBUG porta el reloader i el debugger.
+
+Mètriques: cada worker escriu les seves a PROMETHEUS_MULTIPROC_DIR i
+/metrics les suma (api/metrics.py). El directori s'ha de definir abans que
+els workers importin prometheus_client, per això es fixa aquí.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                      os.path.join(tempfile.gettempdir(), 'ephemerides-metrics'))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 5000))
+# Amb workers gevent el timeout vigila el worker, no talla els fluxos SSE llargs
+timeout = 30
+graceful_timeout = 30
+accesslog = None  # el log d'accés el fa l'aplicació (api/structured_logging.py)
+
+
+def on_starting(server):
+    """Buida les mètriques d'una execució anterior (els comptadors tornen a zero)"""
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    """Els gauges d'un worker que ha mort deixen de comptar"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    """Cada worker arrenca la seva precàrrega i la difusió de cache en iniciar-se"""
+    from app import start_background_workers
+    start_background_workers()
@@ -0,0 +1,336 @@
+"""
+Empaqueta, minifica i posa hash als fitxers estàtics
+
+Concatena static/js/*.js i static/css/*.css (en l'ordre de la pàgina),
+els minifica i els escriu a static/dist/ amb el hash del contingut al nom,
+juntament amb un manifest.json que la plantilla fa servir per enllaçar-los:
+
+    python -m scripts.build_assets            # JS + CSS (+ fonts de static/fonts si n'hi ha)
+    python -m scripts.build_assets --fonts    # descarrega i subconjunta les fonts abans
+
+Com que el nom canvia amb el contingut, static/dist/ es pot servir amb
+Cache-Control: immutable. Els bundles anteriors no s'esborren en cada build
+(l'HTML en cache encara els referencia durant un desplegament); només
+s'eliminen quan fa més de DIST_MAX_AGE que no formen part del manifest.
+"""
+from typing import Dict, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import requests
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:  # fontTools és opcional: sense ell les fonts no es retallen
+    font_subset = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(ROOT, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+FONTS_DIR = os.path.join(STATIC_DIR, 'fonts')
+
+# Mateix ordre que les etiquetes <script>/<link> de templates/index.html
+JS_SOURCES = ['js/i18n.js', 'js/api-client.js', 'js/animations.js', 'js/app.js']
+CSS_SOURCES = ['css/vintage.css', 'css/responsive.css']
+
+GOOGLE_FONTS_URL = ('https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;700'
+                    '&family=Crimson+Text:ital@0;1&display=swap')
+# Google només serveix woff2 si l'User-Agent és d'un navegador modern
+FONT_USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+# Subconjunts de Google Fonts que cobreixen ca/es/en
+FONT_SUBSETS = ('latin', 'latin-ext')
+# Caràcters que necessiten els textos de la UI i els de Wikipedia en ca/es/en
+FONT_UNICODES = ('U+0020-007E,U+00A0-00FF,U+0131,U+013F-0140,U+0152-0153,'
+                 'U+2013-2014,U+2018-201E,U+2022,U+2026,U+2190-2193')
+
+HASH_LENGTH = 10
+FINGERPRINTED_RE = re.compile(r'\.[0-9a-f]{%d}\.\w+$' % HASH_LENGTH)
+# Temps que es conserven els bundles d'un build anterior (segons)
+DIST_MAX_AGE = 7 * 24 * 3600
+JS_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+# Paraules clau després de les quals una '/' comença una regex (i no és una divisió)
+JS_REGEX_KEYWORDS = frozenset(('return', 'typeof', 'case', 'void', 'delete', 'in', 'of',
+                               'instanceof', 'new', 'throw', 'yield', 'await', 'else', 'do'))
+
+
+def fingerprint(content: bytes) -> str:
+    """Hash curt del contingut per posar al nom del fitxer"""
+    return hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+
+
+def _skip_string(source: str, i: int) -> int:
+    """Retorna la posició just després del literal (string, template o regex) que comença a i"""
+    quote = source[i]
+    i += 1
+    while i < len(source):
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == quote:
+            return i + 1
+        if quote == '/' and c == '[':
+            # Dins d'una classe de caràcters '/' no tanca la regex
+            end = source.find(']', i + 1)
+            i = end if end != -1 else len(source)
+        i += 1
+    return i
+
+
+def _starts_regex(last: str, word: str) -> bool:
+    """
+    Una '/' comença una regex si no pot ser una divisió: després d'un
+    operador o d'una paraula clau com return (`word` és l'últim identificador)
+    """
+    if not last or last in JS_REGEX_PRECEDERS:
+        return True
+    return (last.isalnum() or last in '_$') and word in JS_REGEX_KEYWORDS
+
+
+def minify_js(source: str) -> str:
+    """
+    Minificació conservadora: treu comentaris i espais sobrers però manté
+    els salts de línia (la inserció automàtica de ';' continua funcionant)
+    i no toca mai strings, templates ni regex
+    """
+    out: List[str] = []
+    i = 0
+    last = ''  # últim caràcter significatiu (no espai)
+    word = ''  # últim identificador o paraula clau
+    while i < len(source):
+        c = source[i]
+        nxt = source[i + 1] if i + 1 < len(source) else ''
+        if c == '/' and nxt == '/':
+            i = source.find('\n', i)
+            i = len(source) if i == -1 else i
+            continue
+        if c == '/' and nxt == '*':
+            end = source.find('*/', i + 2)
+            i = len(source) if end == -1 else end + 2
+            continue
+        if c in '\'"`' or (c == '/' and _starts_regex(last, word)):
+            end = _skip_string(source, i)
+            out.append(source[i:end])
+            last = source[end - 1]
+            word = ''
+            i = end
+            continue
+        if c.isspace():
+            end = i
+            while end < len(source) and source[end].isspace():
+                end += 1
+            separator = '\n' if '\n' in source[i:end] else ' '
+            if out and out[-1] in (' ', '\n'):
+                # Espais a banda i banda d'un comentari eliminat: un sol separador
+                out[-1] = '\n' if '\n' in (out[-1], separator) else ' '
+            elif out:
+                out.append(separator)
+            i = end
+            continue
+        if c.isalnum() or c in '_$':
+            word = c if not out or out[-1] in (' ', '\n') or not word else word + c
+        else:
+            word = ''
+        out.append(c)
+        last = c
+        i += 1
+
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source: str) -> str:
+    """Treu comentaris i espais sobrers del CSS sense tocar els strings"""
+    out: List[str] = []
+    i = 0
+    while i < len(source):
+        c = source[i]
+        if c == '/' and source[i + 1:i + 2] == '*':
+            end = source.find('*/', i + 2)
+            i = len(source) if end == -1 else end + 2
+            continue
+        if c in '\'"':
+            end = _skip_string(source, i)
+            out.append(source[i:end])
+            i = end
+            continue
+        if c.isspace():
+            while i < len(source) and source[i].isspace():
+                i += 1
+            following = source[i:i + 1]
+            if out and out[-1] not in '{};,>' and following not in ('{', '}', ';', ',', '>', ''):
+                out.append(' ')
+            continue
+        if c in '{};,>' and out and out[-1] == ' ':
+            out.pop()
+        if c == '}' and out and out[-1] == ';':
+            out.pop()
+        out.append(c)
+        i += 1
+    return ''.join(out) + '\n'
+
+
+def read_sources(paths: List[str]) -> str:
+    parts = []
+    for path in paths:
+        with open(os.path.join(STATIC_DIR, path), encoding='utf-8') as f:
+            parts.append(f.read())
+    return '\n'.join(parts)
+
+
+def write_fingerprinted(directory: str, name: str, content: bytes) -> str:
+    """Escriu `name` amb el hash abans de l'extensió i retorna el nom final"""
+    stem, ext = os.path.splitext(name)
+    filename = f'{stem}.{fingerprint(content)}{ext}'
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, filename), 'wb') as f:
+        f.write(content)
+    return filename
+
+
+def download_fonts(url: str = GOOGLE_FONTS_URL, directory: str = FONTS_DIR) -> str:
+    """
+    Descarrega les fonts de Google Fonts (només els subconjunts FONT_SUBSETS)
+    i escriu directory/fonts.css amb les regles @font-face apuntant als fitxers locals
+    """
+    headers = {'User-Agent': FONT_USER_AGENT}
+    response = requests.get(url, headers=headers, timeout=30)
+    response.raise_for_status()
+
+    os.makedirs(directory, exist_ok=True)
+    rules = []
+    # Google precedeix cada @font-face amb un comentari amb el nom del subconjunt
+    font_faces = re.findall(r'/\* ([\w-]+) \*/\s*(@font-face\s*\{[^}]*\})', response.text)
+    for subset, rule in font_faces:
+        if subset not in FONT_SUBSETS:
+            continue
+        family = re.search(r"font-family:\s*'([^']+)'", rule).group(1)
+        style = re.search(r'font-style:\s*(\w+)', rule).group(1)
+        weight = re.search(r'font-weight:\s*(\d+)', rule).group(1)
+        source_url = re.search(r'url\(([^)]+)\)', rule).group(1)
+        italic = 'i' if style == 'italic' else ''
+        filename = f"{family.replace(' ', '')}-{weight}{italic}-{subset}.woff2"
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            font = requests.get(source_url, headers=headers, timeout=30)
+            font.raise_for_status()
+            with open(path, 'wb') as f:
+                f.write(font.content)
+        rules.append(rule.replace(source_url, filename))
+
+    css_path = os.path.join(directory, 'fonts.css')
+    with open(css_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(rules) + '\n')
+    return css_path
+
+
+def subset_font(data: bytes, unicodes: str = FONT_UNICODES) -> bytes:
+    """Retalla la font als caràcters que fa servir l'aplicació (cal fontTools)"""
+    from io import BytesIO
+    options = font_subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['kern', 'liga']
+    font = font_subset.load_font(BytesIO(data), options)
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=font_subset.parse_unicodes(unicodes))
+    subsetter.subset(font)
+    buffer = BytesIO()
+    font_subset.save_font(font, buffer, options)
+    return buffer.getvalue()
+
+
+def build_fonts(fonts_dir: str, dist_dir: str) -> Tuple[str, List[str]]:
+    """
+    Copia les fonts de fonts_dir/fonts.css a dist amb hash (retallades si hi ha fontTools)
+
+    Returns:
+        (regles @font-face amb les URLs noves, URLs de les fonts a precarregar)
+    """
+    css_path = os.path.join(fonts_dir, 'fonts.css')
+    if not os.path.exists(css_path):
+        return '', []
+    with open(css_path, encoding='utf-8') as f:
+        css = f.read()
+
+    preload = []
+
+    def replace(match):
+        with open(os.path.join(fonts_dir, match.group(1)), 'rb') as f:
+            data = f.read()
+        if font_subset is not None:
+            data = subset_font(data)
+        filename = write_fingerprinted(os.path.join(dist_dir, 'fonts'), match.group(1), data)
+        # Només es precarreguen les fonts del subconjunt bàsic (sempre necessàries)
+        if match.group(1).endswith('-latin.woff2'):
+            preload.append(f'fonts/{filename}')
+        return f'url(fonts/{filename})'
+
+    css = re.sub(r'url\(([^)/]+\.woff2)\)', replace, css)
+    return css, preload
+
+
+def prune_dist(dist_dir: str, keep: List[str], max_age: float = DIST_MAX_AGE) -> List[str]:
+    """
+    Esborra els fitxers amb hash de dist_dir que no són a `keep` i fa més de
+    max_age segons que no s'han escrit; retorna els camins relatius esborrats
+    """
+    cutoff = time.time() - max_age
+    removed = []
+    for directory, _, filenames in os.walk(dist_dir):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            relative = os.path.relpath(path, dist_dir).replace(os.sep, '/')
+            if (FINGERPRINTED_RE.search(filename) and relative not in keep
+                    and os.path.getmtime(path) < cutoff):
+                os.remove(path)
+                removed.append(relative)
+    return sorted(removed)
+
+
+def build(static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR,
+          fonts_dir: str = FONTS_DIR, max_age: float = DIST_MAX_AGE) -> Dict:
+    """Genera els bundles i el manifest; retorna el manifest"""
+    os.makedirs(dist_dir, exist_ok=True)
+
+    font_css, preload = build_fonts(fonts_dir, dist_dir)
+    js = minify_js(read_sources(JS_SOURCES)).encode()
+    css = minify_css(font_css + read_sources(CSS_SOURCES)).encode()
+
+    manifest = {
+        'app.js': write_fingerprinted(dist_dir, 'app.js', js),
+        'app.css': write_fingerprinted(dist_dir, 'app.css', css),
+        'fonts': preload,
+    }
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    fonts = re.findall(r'url\((fonts/[^)]+)\)', font_css)
+    prune_dist(dist_dir, [manifest['app.js'], manifest['app.css']] + fonts, max_age)
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Genera static/dist amb hash als noms')
+    parser.add_argument('--fonts', action='store_true',
+                        help='Descarrega les fonts de Google Fonts a static/fonts abans')
+    args = parser.parse_args(argv)
+
+    if args.fonts:
+        download_fonts()
+        if font_subset is None:
+            print('fontTools no està instal·lat: les fonts no es retallaran')
+    manifest = build()
+    for name in ('app.js', 'app.css'):
+        size = os.path.getsize(os.path.join(DIST_DIR, manifest[name]))
+        print(f'{name:<8} -> static/dist/{manifest[name]} ({size} bytes)')
+    print(f"fonts    -> {len(manifest['fonts'])} precarregades")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,24 +1,56 @@
 /**
  * Client per comunicar-se amb el backend Flask
+ *
+ * Totes les peticions passen per request(): quan hi ha service worker
+ * (/sw.js), les respostes GET es serveixen de la seva cache.
  */
 class ApiClient {
     constructor(baseUrl = '') {
         this.baseUrl = baseUrl;
     }
 
+    /**
+     * Data en format MM-DD (la del navegador, no la del servidor)
+     */
+    static formatDate(date) {
+        const month = String(date.getMonth() + 1).padStart(2, '0');
+        const day = String(date.getDate()).padStart(2, '0');
+        return `${month}-${day}`;
+    }
+
+    /**
+     * URL de l'efemèride d'un dia (la mateixa que prefetch el service worker)
+     */
+    ephemerisUrl(language, date = new Date()) {
+        return `${this.baseUrl}/api/ephemeris/today?lang=${language}&date=${ApiClient.formatDate(date)}`;
+    }
+
+    /**
+     * URL del feed compacte d'un dia (la mateixa que prefetch el service worker)
+     */
+    feedUrl(language, date = new Date()) {
+        return `${this.baseUrl}/api/ephemeris/feed?lang=${language}&date=${ApiClient.formatDate(date)}`;
+    }
+
+    /**
+     * Fa una petició i retorna el JSON (error si l'estat no és 2xx)
+     */
+    async request(url, options = {}) {
+        const response = await fetch(url, options);
+
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        return response.json();
+    }
+
     /**
      * Obté una efemèride aleatòria del dia actual
      */
     async getTodayEphemeris(language = 'ca') {
         try {
-            const response = await fetch(`${this.baseUrl}/api/ephemeris/today?lang=${language}`);
-
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-
-            const data = await response.json();
-            return data;
+            return await this.request(this.ephemerisUrl(language));
         } catch (error) {
             console.error('Error fetching ephemeris:', error);
             throw error;
@@ -26,46 +58,96 @@ class ApiClient {
     }
 
     /**
-     * Obté detalls ampliats d'una efemèride
+     * Obté tots els events d'un dia (format columnar: years, texts, hasDetails, ids)
      */
-    async getEphemerisDetails(year, text, language = 'ca') {
+    async getDayFeed(language = 'ca', date = new Date()) {
         try {
-            const response = await fetch(`${this.baseUrl}/api/ephemeris/details`, {
+            return await this.request(this.feedUrl(language, date));
+        } catch (error) {
+            console.error('Error fetching day feed:', error);
+            throw error;
+        }
+    }
+
+    /**
+     * Obté detalls ampliats d'una efemèride pel seu identificador
+     */
+    async getEphemerisDetails(id, language = 'ca', date = new Date()) {
+        try {
+            return await this.request(`${this.baseUrl}/api/ephemeris/details`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ year, text, lang: language })
+                body: JSON.stringify({ id, lang: language, date: ApiClient.formatDate(date) })
             });
-
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-
-            const data = await response.json();
-            return data;
         } catch (error) {
             console.error('Error fetching details:', error);
             throw error;
         }
     }
 
+    /**
+     * Obté els detalls de diverses efemèrides d'un mateix dia en una sola petició
+     * (cada resultat és {id, details} o {id, error, status})
+     */
+    async getEphemerisDetailsBatch(ids, language = 'ca', date = new Date()) {
+        try {
+            const data = await this.request(`${this.baseUrl}/api/ephemeris/details:batch`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ items: ids, lang: language, date: ApiClient.formatDate(date) })
+            });
+            return data.results;
+        } catch (error) {
+            console.error('Error fetching batch details:', error);
+            throw error;
+        }
+    }
+
     /**
      * Obté traduccions per un idioma
      */
     async getTranslations(language) {
         try {
-            const response = await fetch(`${this.baseUrl}/api/translations/${language}`);
-
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-
-            const data = await response.json();
-            return data;
+            return await this.request(`${this.baseUrl}/api/translations/${language}`);
         } catch (error) {
             console.error('Error fetching translations:', error);
             throw error;
         }
     }
+
+    /**
+     * Registra el service worker (cache offline i prefetch); sense suport, no fa res
+     */
+    async registerServiceWorker() {
+        if (!('serviceWorker' in navigator)) {
+            return false;
+        }
+        try {
+            await navigator.serviceWorker.register(`${this.baseUrl}/sw.js`);
+            return true;
+        } catch (error) {
+            console.error('Error registering service worker:', error);
+            return false;
+        }
+    }
+
+    /**
+     * Demana al service worker que descarregui en segon pla el feed de demà
+     */
+    async prefetchTomorrow(language) {
+        if (!('serviceWorker' in navigator)) {
+            return;
+        }
+        const registration = await navigator.serviceWorker.ready;
+        const tomorrow = new Date();
+        tomorrow.setDate(tomorrow.getDate() + 1);
+        registration.active?.postMessage({
+            type: 'prefetch',
+            urls: [this.feedUrl(language, tomorrow)]
+        });
+    }
 }
@@ -7,6 +7,10 @@ class EphemerisApp {
         this.i18n = new I18n();
         this.currentEphemeris = null;
         this.detailsExpanded = false;
+        // Feed del dia (columnar) per triar efemèrides sense tornar al servidor
+        this.dayFeed = null;
+        this.dayFeedKey = null;
+        this.dayFeedDate = null;
 
         this.initElements();
         this.attachEventListeners();
@@ -50,14 +54,63 @@ class EphemerisApp {
      * Inicialitza l'aplicació
      */
     async init() {
-        // Carregar idioma per defecte
-        await this.i18n.loadLanguage('ca');
+        // El servidor ja ha renderitzat la data, les traduccions i (si era a
+        // la cache) la primera efemèride: només cal recuperar-ne l'estat
+        const initialState = this.readInitialState();
+        if (initialState) {
+            this.i18n.setLanguage(initialState.lang, initialState.translations);
+            const [year, month, day] = initialState.date.split('-').map(Number);
+            const stateDate = new Date(year, month - 1, day);
+            if (stateDate.toDateString() !== new Date().toDateString()) {
+                // Pàgina d'un altre dia (servidor en una altra zona horària o
+                // pàgina treta de la cache): es refà amb la data del navegador
+                this.updateCurrentDate();
+                this.loadNewEphemeris();
+            } else if (initialState.ephemeris) {
+                this.currentEphemeris = initialState.ephemeris;
+                // Els detalls s'han de demanar del mateix dia que l'efemèride
+                this.dayFeedDate = stateDate;
+            } else {
+                this.loadNewEphemeris();
+            }
+        } else {
+            // Carregar idioma per defecte
+            await this.i18n.loadLanguage('ca');
+
+            // Mostrar data actual
+            this.updateCurrentDate();
 
-        // Mostrar data actual
-        this.updateCurrentDate();
+            // Carregar primera efemèride
+            this.loadNewEphemeris();
+        }
+
+        // Cache offline i prefetch de demà, sense bloquejar la pàgina
+        this.startBackgroundCache();
+    }
 
-        // Carregar primera efemèride
-        this.loadNewEphemeris();
+    /**
+     * Registra el service worker i li demana que prepari l'efemèride de demà
+     */
+    async startBackgroundCache() {
+        if (await this.apiClient.registerServiceWorker()) {
+            this.apiClient.prefetchTomorrow(this.i18n.currentLanguage);
+        }
+    }
+
+    /**
+     * Llegeix l'estat inicial incrustat a la pàgina pel servidor
+     */
+    readInitialState() {
+        const element = document.getElementById('initial-state');
+        if (!element) {
+            return null;
+        }
+        try {
+            return JSON.parse(element.textContent);
+        } catch (error) {
+            console.error('Error reading initial state:', error);
+            return null;
+        }
     }
 
     /**
@@ -109,7 +162,7 @@ class EphemerisApp {
         this.ephemerisDetails.classList.add('hidden');
 
         try {
-            const ephemeris = await this.apiClient.getTodayEphemeris(this.i18n.currentLanguage);
+            const ephemeris = this.pickRandomEphemeris(await this.loadDayFeed());
             this.currentEphemeris = ephemeris;
 
             // Actualitzar UI
@@ -123,6 +176,39 @@ class EphemerisApp {
         }
     }
 
+    /**
+     * Retorna el feed d'avui per l'idioma actual (només el demana un cop al dia)
+     */
+    async loadDayFeed() {
+        const date = new Date();
+        const key = `${this.i18n.currentLanguage}|${ApiClient.formatDate(date)}`;
+        if (this.dayFeedKey !== key) {
+            this.dayFeed = await this.apiClient.getDayFeed(this.i18n.currentLanguage, date);
+            this.dayFeedKey = key;
+            this.dayFeedDate = date;
+        }
+        return this.dayFeed;
+    }
+
+    /**
+     * Tria un event aleatori del feed (diferent de l'actual si n'hi ha més d'un)
+     */
+    pickRandomEphemeris(feed) {
+        if (!feed.count) {
+            throw new Error('No events found for today');
+        }
+        let index = Math.floor(Math.random() * feed.count);
+        if (feed.count > 1 && feed.ids[index] === this.currentEphemeris?.id) {
+            index = (index + 1) % feed.count;
+        }
+        return {
+            id: feed.ids[index],
+            year: feed.years[index],
+            text: feed.texts[index],
+            hasDetails: feed.hasDetails[index]
+        };
+    }
+
     /**
      * Alterna la visualització de detalls
      */
@@ -139,15 +225,17 @@ class EphemerisApp {
 
             try {
                 const details = await this.apiClient.getEphemerisDetails(
-                    this.currentEphemeris.year,
-                    this.currentEphemeris.text,
-                    this.i18n.currentLanguage
+                    this.currentEphemeris.id,
+                    this.i18n.currentLanguage,
+                    this.dayFeedDate || new Date()
                 );
 
                 // Actualitzar UI amb detalls
                 this.detailsDescription.textContent = details.description || '';
 
                 if (details.thumbnail) {
+                    // srcset abans de src perquè el navegador no descarregui dues imatges
+                    this.detailsThumbnail.srcset = details.thumbnailSrcset || '';
                     this.detailsThumbnail.src = details.thumbnail;
                     this.detailsThumbnail.classList.remove('hidden');
                 } else {
@@ -156,11 +244,19 @@ class EphemerisApp {
 
                 // Renderitzar links
                 this.detailsLinks.innerHTML = '';
-                if (details.links && details.links.length > 0) {
-                    details.links.forEach(link => {
+                // Amb l'enriquiment activat, related porta també la descripció de cada pàgina
+                const links = (details.related || []).filter(page => page.url);
+                if (links.length === 0 && details.links) {
+                    links.push(...details.links);
+                }
+                if (links.length > 0) {
+                    links.forEach(link => {
                         const a = document.createElement('a');
                         a.href = link.url;
                         a.textContent = `→ ${link.title}`;
+                        if (link.description) {
+                            a.title = link.description;
+                        }
                         a.target = '_blank';
                         a.rel = 'noopener noreferrer';
                         this.detailsLinks.appendChild(a);
@@ -196,6 +292,7 @@ class EphemerisApp {
         if (success) {
             // Actualitzar data
             this.updateCurrentDate();
+            this.apiClient.prefetchTomorrow(language);
 
             // Recarregar efemèride en nou idioma
             this.loadNewEphemeris();
@@ -23,6 +23,14 @@ class I18n {
         }
     }
 
+    /**
+     * Fa servir unes traduccions ja carregades (p.ex. les incrustades a la pàgina)
+     */
+    setLanguage(language, translations) {
+        this.translations = translations;
+        this.currentLanguage = language;
+    }
+
     /**
      * Obté una traducció per clau
      */
@@ -0,0 +1,138 @@
+/**
+ * Service worker d'Efemèrides (generat per /sw.js)
+ *
+ * - Precarrega els bundles amb hash i les traduccions
+ * - Estàtics amb hash: primer la cache (no canvien mai)
+ * - Feeds del dia i traduccions: stale-while-revalidate (també des de la precàrrega)
+ * - Efemèride d'avui i pàgina principal: primer la xarxa, la cache si no n'hi ha (offline)
+ * - La cache de runtime es limita a RUNTIME_MAX_ENTRIES (s'esborren les més antigues)
+ * - Prefetch en segon pla del feed de demà (missatge 'prefetch')
+ */
+const VERSION = {{ version | tojson }};
+const STATIC_CACHE = `ephemerides-static-${VERSION}`;
+const RUNTIME_CACHE = 'ephemerides-runtime';
+const RUNTIME_MAX_ENTRIES = 150;
+const PRECACHE_URLS = {{ precache_urls | tojson }};
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(STATIC_CACHE)
+            .then(cache => cache.addAll(PRECACHE_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    // Esborrar les caches d'estàtics de versions anteriors i les còpies refrescades
+    // de la precàrrega, que taparien les que s'acaben de descarregar
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith('ephemerides-static-') && key !== STATIC_CACHE)
+                .map(key => caches.delete(key))))
+            .then(() => caches.open(RUNTIME_CACHE))
+            .then(cache => Promise.all(PRECACHE_URLS.map(url => cache.delete(url))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+
+    if (url.pathname.startsWith('/static/dist/') || url.pathname.startsWith('/img/')) {
+        event.respondWith(cacheFirst(request));
+    } else if (url.pathname.startsWith('/api/ephemeris/feed') ||
+               url.pathname.startsWith('/api/translations/')) {
+        event.respondWith(staleWhileRevalidate(request, event));
+    } else if (url.pathname.startsWith('/api/ephemeris/today')) {
+        // "Avui" canvia a mitjanit: una resposta desada només serveix sense connexió
+        event.respondWith(networkFirst(request));
+    } else if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(request, '/'));
+    }
+});
+
+self.addEventListener('message', event => {
+    if (event.data?.type === 'prefetch') {
+        event.waitUntil(Promise.all(event.data.urls.map(prefetch)));
+    }
+});
+
+async function cacheFirst(request) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        await putRuntime(request, response.clone());
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(request, event) {
+    // Primer la còpia refrescada (RUNTIME_CACHE) i, si no n'hi ha, la precarregada
+    // (STATIC_CACHE): així les traduccions precarregades també es troben offline
+    const runtime = await caches.open(RUNTIME_CACHE);
+    const cached = (await runtime.match(request)) ||
+        (await caches.match(request, {cacheName: STATIC_CACHE}));
+    const refresh = fetch(request).then(response => {
+        if (response.ok) {
+            return putRuntime(request, response.clone()).then(() => response);
+        }
+        return response;
+    });
+
+    if (cached) {
+        // Resposta immediata; la nova queda desada per la propera vegada
+        event.waitUntil(refresh.catch(() => undefined));
+        return cached;
+    }
+    return refresh;
+}
+
+async function networkFirst(request, fallbackUrl) {
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            await putRuntime(request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        return (await caches.match(request)) ||
+            (fallbackUrl && await caches.match(fallbackUrl)) ||
+            Response.error();
+    }
+}
+
+async function prefetch(url) {
+    if (await caches.match(url)) {
+        return;
+    }
+    try {
+        const response = await fetch(url);
+        if (response.ok) {
+            await putRuntime(url, response);
+        }
+    } catch (error) {
+        // Es tornarà a intentar a la propera visita
+    }
+}
+
+async function putRuntime(request, response) {
+    const cache = await caches.open(RUNTIME_CACHE);
+    // Tornar-la a afegir la posa al final: keys() queda en ordre d'ús
+    await cache.delete(request);
+    await cache.put(request, response);
+    const keys = await cache.keys();
+    await Promise.all(keys
+        .slice(0, Math.max(0, keys.length - RUNTIME_MAX_ENTRIES))
+        .map(key => cache.delete(key)));
+}
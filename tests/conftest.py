@@ -1,17 +1,33 @@
 """
 Fixtures compartits per tots els tests
 """
+import os
 import pytest
 from datetime import datetime
+
+# La precàrrega en segon pla aniria a Wikipedia des de qualsevol test
+os.environ.setdefault('PREWARM_ENABLED', '0')
+
 from api.wikipedia_client import WikipediaClient
 from config import Config
-from app import app as flask_app
+from app import app as flask_app, wiki_client as flask_wiki_client
+import app as app_module
+
+
+@pytest.fixture(autouse=True)
+def image_cache_dir(tmp_path, monkeypatch):
+    """La cache de miniatures de cada test va a tmp_path, mai a IMAGE_CACHE_DIR del repositori"""
+    if app_module.image_proxy is not None:
+        monkeypatch.setattr(app_module.image_proxy, 'cache_dir', str(tmp_path))
+    return tmp_path
 
 
 @pytest.fixture
 def app():
     """Flask application fixture"""
     flask_app.config['TESTING'] = True
+    flask_wiki_client.cache.clear()
+    flask_wiki_client.search_index.clear()
     yield flask_app
 
 
@@ -1,9 +1,20 @@
 """
 Tests d'integració per als endpoints de l'API Flask
 """
+import os
+import random
+import re
+import runpy
+import subprocess
+import sys
+import threading
+import time
 import pytest
 import responses
-from datetime import datetime
+from datetime import datetime, timedelta
+import app as app_module
+from api.rate_limit import UpstreamLimiter
+from benchmarks.replay import build_request
 
 
 class TestHealthEndpoint:
@@ -28,6 +39,187 @@ class TestHealthEndpoint:
         assert isinstance(timestamp, datetime)
 
 
+class TestReadinessEndpoint:
+    """Tests per l'endpoint de readiness"""
+
+    def test_ready_returns_503_when_cache_is_cold(self, client):
+        """Test: /ready retorna 503 mentre els feeds d'avui no són a la cache"""
+        response = client.get('/ready')
+
+        assert response.status_code == 503
+        data = response.get_json()
+        assert data['status'] == 'warming'
+        today = datetime.now().strftime('%m-%d')
+        assert data['feeds'][today] == {'en': False, 'es': False}
+        assert data['upstream']['queueDepth'] == 0
+
+    @responses.activate
+    def test_ready_returns_200_after_prewarm(self, client):
+        """Test: /ready retorna 200 quan avui i demà s'han precarregat"""
+        today = datetime.now()
+        for date in (today, today + timedelta(days=1)):
+            for lang in ('es', 'en'):
+                responses.add(
+                    responses.GET,
+                    (f'https://{lang}.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+                     f'{date.month:02d}/{date.day:02d}'),
+                    json={'events': [{'year': 1923, 'text': 'Test event', 'pages': []}]},
+                    status=200
+                )
+
+        app_module.wiki_client.prewarm(app_module.get_warm_dates(),
+                                       app_module.get_wikipedia_languages())
+        response = client.get('/ready')
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['status'] == 'ready'
+        assert all(all(langs.values()) for langs in data['feeds'].values())
+        assert data['upstream']['state'] == 'ok'
+
+    @responses.activate
+    def test_wsgi_worker_warms_itself_without_main(self, client, app, monkeypatch):
+        """Test: sota un servidor WSGI (sense __main__) el worker es precarrega i /ready dona 200"""
+        responses.add(
+            responses.GET,
+            re.compile(r'https://(es|en)\.wikipedia\.org/api/rest_v1/feed/onthisday/events/'
+                       r'\d{2}/\d{2}'),
+            json={'events': [{'year': 1923, 'text': 'Test event', 'pages': []}]},
+            status=200
+        )
+        monkeypatch.setitem(app.config, 'PREWARM_ENABLED', True)
+        # Com un worker acabat de crear (o fet amb fork): encara no té fils de fons
+        monkeypatch.setattr(app_module, 'background_pid', None)
+
+        try:
+            statuses = [client.get('/ready').status_code]
+            deadline = time.monotonic() + 5
+            while statuses[-1] != 200 and time.monotonic() < deadline:
+                time.sleep(0.02)
+                statuses.append(client.get('/ready').status_code)
+            prewarm_threads = [t for t in threading.enumerate() if t.name == 'feed-prewarm']
+        finally:
+            app_module.background_stop.set()
+            for thread in threading.enumerate():
+                if thread.name == 'feed-prewarm':
+                    thread.join(timeout=5)
+            app_module.background_stop.clear()
+
+        assert statuses[-1] == 200
+        # Les peticions següents no arrenquen més fils
+        assert len(prewarm_threads) == 1
+        assert app_module.start_background_workers() == []
+
+    def test_health_stays_ok_when_not_ready(self, client):
+        """Test: /health continua sent una sonda de vida barata"""
+        assert client.get('/ready').status_code == 503
+        assert client.get('/health').status_code == 200
+
+
+class TestMetricsEndpoint:
+    """Tests per l'endpoint de mètriques Prometheus"""
+
+    def test_metrics_exposes_route_metrics(self, client):
+        """Test: /metrics inclou comptadors i latències per ruta"""
+        client.get('/health')
+        response = client.get('/metrics')
+
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        body = response.data.decode()
+        assert 'ephemerides_http_requests_total{method="GET",route="/health",status="200"}' in body
+        assert 'ephemerides_http_request_duration_seconds_bucket' in body
+        assert 'ephemerides_http_requests_in_flight' in body
+
+    def test_access_log_records_errors_and_samples_successes(self, client, app, monkeypatch):
+        """Test: els errors sempre van al log d'accés i les respostes correctes segons la mostra"""
+        logged = []
+        monkeypatch.setattr(app_module.access_logger, 'info',
+                            lambda message, extra: logged.append(extra['fields']))
+        monkeypatch.setitem(app.config, 'ACCESS_LOG_SAMPLE_RATE', 0)
+
+        client.get('/health')
+        client.get('/api/ephemeris/today?lang=xx')
+
+        assert len(logged) == 1
+        entry = logged[0]
+        assert entry['method'] == 'GET'
+        assert entry['path'] == '/api/ephemeris/today'
+        assert entry['status'] == 400
+        assert entry['durationMs'] >= 0
+
+    def test_trace_records_api_requests_when_enabled(self, client, app, monkeypatch):
+        """Test: amb TRACE_FILE es desa idioma, dia i elements de les peticions a l'API"""
+        traced = []
+        monkeypatch.setattr(app_module.trace_logger, 'info',
+                            lambda message, extra: traced.append(extra['fields']))
+
+        client.get('/api/translations/es')
+        monkeypatch.setitem(app.config, 'TRACE_FILE', 'trace.jsonl')
+        client.get('/health')
+        client.get('/api/translations/es')
+        client.post('/api/ephemeris/details:batch',
+                    json={'items': [1, 2, 3], 'lang': 'en', 'date': 'bad'})
+
+        assert [(e['r'], e['l'], e['s']) for e in traced] == [
+            ('/api/translations/<lang>', 'es', 200),
+            ('/api/ephemeris/details:batch', 'en', 400),
+        ]
+        assert traced[0]['d'] == datetime.now().strftime('%m-%d')
+        assert traced[1]['d'] == 'bad'
+        assert traced[1]['n'] == 3
+
+    @responses.activate
+    def test_trace_without_lang_replays_successfully(self, client, app, monkeypatch):
+        """Test: una petició sense lang es desa amb l'idioma per defecte i es reprodueix amb 200"""
+        today = datetime.now()
+        responses.add(
+            responses.GET,
+            'https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+            f'{today.month:02d}/{today.day:02d}',
+            json={'events': [{'year': 1866, 'text': 'Test event', 'pages': []}]},
+            status=200
+        )
+        traced = []
+        monkeypatch.setattr(app_module.trace_logger, 'info',
+                            lambda message, extra: traced.append(extra['fields']))
+        monkeypatch.setitem(app.config, 'TRACE_FILE', 'trace.jsonl')
+
+        assert client.get('/api/ephemeris/today').status_code == 200
+        assert traced[0]['l'] == 'ca'
+
+        events = [{'year': 1866, 'text': 'Test event'}]
+        for entry in (traced[0], {**traced[0], 'l': None},
+                      {**traced[0], 'r': '/api/ephemeris/details', 'l': None}):
+            method, path, body = build_request(entry, lambda language, date: events,
+                                               random.Random(0))
+            assert 'None' not in path and None not in (body or {}).values()
+            assert client.open(path, method=method, json=body).status_code == 200
+
+    @responses.activate
+    def test_metrics_exposes_upstream_and_cache_metrics(self, client):
+        """Test: /metrics inclou latència de Wikipedia i hits de cache"""
+        now = datetime.now()
+        url = ('https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+               f'{now.month:02d}/{now.day:02d}')
+        responses.add(
+            responses.GET,
+            url,
+            json={'events': [{'year': 1923, 'text': 'Test event', 'pages': []}]},
+            status=200
+        )
+        client.get('/api/ephemeris/today?lang=en')
+        client.get('/api/ephemeris/today?lang=en')
+
+        body = client.get('/metrics').data.decode()
+
+        assert ('ephemerides_upstream_request_duration_seconds_count'
+                '{language="en",status="200"}') in body
+        assert 'ephemerides_upstream_response_size_bytes_count{language="en"}' in body
+        assert 'ephemerides_feed_cache_requests_total{cache="feeds",result="hit"}' in body
+        assert responses.assert_call_count(url, 1)
+
+
 class TestMainPageEndpoint:
     """Tests per la pàgina principal"""
 
@@ -46,6 +238,92 @@ class TestMainPageEndpoint:
         assert b'Hist' in response.data  # Part de "Històriques"
         assert b'app-title' in response.data  # Classe del títol
 
+    @responses.activate
+    def test_main_page_embeds_cached_ephemeris(self, client):
+        """Test: amb el feed a la cache, / ja porta l'efemèride, la data i les traduccions"""
+        today = datetime.now()
+        responses.add(
+            responses.GET,
+            ('https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+             f'{today.month:02d}/{today.day:02d}'),
+            json={'events': [{'year': 1492, 'text': 'Test event', 'pages': [{'title': 'P'}]}]},
+            status=200
+        )
+        app_module.wiki_client.get_events(today.month, today.day, 'es')
+
+        html = client.get('/?lang=es').get_data(as_text=True)
+
+        assert '<html lang="es">' in html
+        assert '<p class="ephemeris-text" id="ephemeris-text">Test event</p>' in html
+        assert 'Siguiente efeméride' in html
+        assert app_module.format_long_date(today, app_module.load_translations('es')) in html
+        state = html.split('<script id="initial-state" type="application/json">')[1]
+        state = state.split('</script>')[0]
+        assert '"hasDetails": true' in state or '"hasDetails":true' in state
+
+    def test_main_page_never_waits_for_wikipedia(self, client):
+        """Test: sense cache, / no fa peticions i deixa la càrrega al client"""
+        with responses.RequestsMock() as mock:
+            html = client.get('/').get_data(as_text=True)
+
+        assert len(mock.calls) == 0
+        assert '"ephemeris": null' in html or '"ephemeris":null' in html
+        assert 'id="next-btn" disabled' in html
+
+    def test_format_long_date(self):
+        """Test: la data llarga segueix el format de cada idioma"""
+        date = datetime(2026, 10, 19)
+
+        assert app_module.format_long_date(date, app_module.load_translations('ca')) == \
+            'dilluns, 19 d’octubre de 2026'
+        assert app_module.format_long_date(date, app_module.load_translations('en')) == \
+            'Monday, October 19, 2026'
+
+    def test_main_page_uses_fingerprinted_bundles(self, client, monkeypatch, tmp_path):
+        """Test: amb manifest, / enllaça els bundles amb hash i les fonts locals"""
+        manifest = tmp_path / 'manifest.json'
+        manifest.write_text('{"app.js": "app.abc.js", "app.css": "app.def.css", '
+                            '"fonts": ["fonts/Crimson-400-latin.123.woff2"]}')
+        monkeypatch.setattr(app_module.asset_manifest, 'path', str(manifest))
+
+        html = client.get('/').data
+
+        assert b'/static/dist/app.abc.js' in html
+        assert b'/static/dist/app.def.css' in html
+        assert b'/static/js/app.js' not in html
+        assert b'fonts.googleapis.com' not in html
+
+    def test_main_page_falls_back_without_manifest(self, client, monkeypatch, tmp_path):
+        """Test: sense build, / enllaça els fitxers originals"""
+        monkeypatch.setattr(app_module.asset_manifest, 'path', str(tmp_path / 'missing.json'))
+
+        html = client.get('/').data
+
+        assert b'/static/js/app.js' in html
+        assert b'fonts.googleapis.com' in html
+
+    def test_dist_assets_are_immutable(self, client, monkeypatch, tmp_path):
+        """Test: els fitxers de static/dist es serveixen amb Cache-Control immutable"""
+        from scripts import build_assets
+        assert 'immutable' not in client.get('/static/js/app.js').headers.get('Cache-Control', '')
+        # El build va a tmp_path: mai s'escriu al static/dist del repositori
+        static = tmp_path / 'static'
+        manifest = build_assets.build(dist_dir=str(static / 'dist'),
+                                      fonts_dir=str(tmp_path / 'fonts'))
+        monkeypatch.setattr(app_module.app, 'static_folder', str(static))
+        monkeypatch.setattr(app_module.asset_manifest, 'path',
+                            str(static / 'dist' / 'manifest.json'))
+
+        assert f'/static/dist/{manifest["app.js"]}'.encode() in client.get('/').data
+        response = client.get(f'/static/dist/{manifest["app.js"]}')
+        response.close()
+
+        assert response.status_code == 200
+        assert 'immutable' in response.headers['Cache-Control']
+        response = client.get('/static/dist/manifest.json')
+        response.close()
+        assert response.headers['Cache-Control'] == 'no-cache'
+
 
 class TestEphemerisTodayEndpoint:
     """Tests per l'endpoint d'efemèrides del dia"""
@@ -131,6 +409,334 @@ class TestEphemerisTodayEndpoint:
         data = response.get_json()
         assert 'error' in data
 
+    @responses.activate
+    def test_get_ephemeris_year_range(self, client):
+        """Test: year_from/year_to filtren l'any de l'efemèride"""
+        responses.add(
+            responses.GET,
+            ('https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+             f'{datetime.now().month:02d}/{datetime.now().day:02d}'),
+            json={'events': [
+                {'year': 1492, 'text': 'Old event', 'pages': []},
+                {'year': 1969, 'text': 'Modern event', 'pages': []}
+            ]},
+            status=200
+        )
+
+        for _ in range(5):
+            response = client.get('/api/ephemeris/today?lang=en&year_from=1901&year_to=2000')
+            assert response.get_json()['year'] == 1969
+
+        response = client.get('/api/ephemeris/today?lang=en&year_to=1000')
+        assert response.status_code == 404
+
+    def test_get_ephemeris_invalid_weighting(self, client):
+        """Test: un mode de ponderació desconegut retorna 400"""
+        response = client.get('/api/ephemeris/today?lang=en&weighted=popularity')
+
+        assert response.status_code == 400
+
+    def test_get_ephemeris_invalid_year_range(self, client):
+        """Test: un any no numèric retorna 400"""
+        response = client.get('/api/ephemeris/today?lang=en&year_from=abc')
+
+        assert response.status_code == 400
+
+    @responses.activate
+    def test_get_ephemeris_for_client_date(self, client):
+        """Test: date=MM-DD demana el feed d'aquell dia (p.ex. el prefetch de demà)"""
+        responses.add(
+            responses.GET,
+            'https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/02/29',
+            json={'events': [{'year': 1504, 'text': 'Leap day event', 'pages': []}]},
+            status=200
+        )
+
+        response = client.get('/api/ephemeris/today?lang=en&date=02-29')
+
+        assert response.status_code == 200
+        assert response.get_json()['text'] == 'Leap day event'
+
+    def test_get_ephemeris_invalid_date(self, client):
+        """Test: una data inexistent o mal formada retorna 400"""
+        assert client.get('/api/ephemeris/today?lang=en&date=02-30').status_code == 400
+        assert client.get('/api/ephemeris/today?lang=en&date=tomorrow').status_code == 400
+
+    @responses.activate
+    def test_get_ephemeris_upstream_rate_limited(self, client, monkeypatch):
+        """Test: un 429 de Wikipedia retorna 503 amb Retry-After"""
+        monkeypatch.setattr(app_module.wiki_client, 'limiter',
+                            UpstreamLimiter(rate=10, burst=10, max_concurrency=2, queue_timeout=1))
+        now = datetime.now()
+        url = ('https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+               f'{now.month:02d}/{now.day:02d}')
+        responses.add(
+            responses.GET,
+            url,
+            status=429,
+            headers={'Retry-After': '30'}
+        )
+
+        response = client.get('/api/ephemeris/today?lang=ca')
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '30'
+
+        # Mentre dura la penalització, es descarta sense tornar a Wikipedia
+        response = client.get('/api/ephemeris/today?lang=ca')
+
+        assert response.status_code == 503
+        assert responses.assert_call_count(url, 1)
+
+
+class TestEphemerisFeedEndpoint:
+    """Tests per l'endpoint del feed compacte del dia"""
+
+    URL = 'https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/03/15'
+
+    @responses.activate
+    def test_get_feed_returns_columns(self, client):
+        """Test: /api/ephemeris/feed retorna tot el dia en columnes, cacheable"""
+        responses.add(responses.GET, self.URL, json={'events': [
+            {'year': -44, 'text': 'Caesar', 'pages': [{'title': 'Caesar'}]},
+            {'year': 1917, 'text': 'Abdication', 'pages': []}
+        ]}, status=200)
+
+        response = client.get('/api/ephemeris/feed?lang=en&date=03-15')
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert data['count'] == 2
+        assert data['years'] == [-44, 1917]
+        assert data['hasDetails'] == [True, False]
+        assert len(set(data['ids'])) == 2
+        assert response.headers['ETag']
+        assert 'max-age' in response.headers['Cache-Control']
+
+    @responses.activate
+    def test_get_feed_not_modified(self, client):
+        """Test: amb l'ETag vigent es respon 304 sense cos"""
+        responses.add(responses.GET, self.URL, json={'events': []}, status=200)
+        etag = client.get('/api/ephemeris/feed?lang=en&date=03-15').headers['ETag']
+
+        response = client.get('/api/ephemeris/feed?lang=en&date=03-15',
+                              headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.data == b''
+
+    @responses.activate
+    def test_details_by_feed_id(self, client):
+        """Test: els detalls es poden demanar amb l'id del feed"""
+        responses.add(responses.GET, self.URL, json={'events': [
+            {'year': -44, 'text': 'Caesar', 'pages': [{'title': 'Caesar', 'extract': 'Ides'}]}
+        ]}, status=200)
+        event_id = client.get('/api/ephemeris/feed?lang=en&date=03-15').get_json()['ids'][0]
+
+        response = client.post('/api/ephemeris/details',
+                               json={'id': event_id, 'lang': 'en', 'date': '03-15'})
+
+        assert response.status_code == 200
+        assert response.get_json()['description'] == 'Ides'
+
+    @responses.activate
+    def test_get_feed_sparse_fields(self, client):
+        """Test: amb fields només s'envien les columnes demanades, amb ETag propi"""
+        responses.add(responses.GET, self.URL, json={'events': [
+            {'year': -44, 'text': 'Caesar', 'pages': []}
+        ]}, status=200)
+
+        full = client.get('/api/ephemeris/feed?lang=en&date=03-15')
+        sparse = client.get('/api/ephemeris/feed?lang=en&date=03-15&fields=text,year')
+
+        assert sparse.get_json() == {'count': 1, 'years': [-44], 'texts': ['Caesar']}
+        assert len(sparse.data) < len(full.data)
+        assert sparse.headers['ETag'] != full.headers['ETag']
+
+    def test_get_feed_invalid_params(self, client):
+        """Test: idioma, data o camps no vàlids retornen 400"""
+        assert client.get('/api/ephemeris/feed?lang=en&fields=pages').status_code == 400
+        assert client.get('/api/ephemeris/feed?lang=fr').status_code == 400
+        assert client.get('/api/ephemeris/feed?lang=en&date=13-01').status_code == 400
+
+
+class TestEphemerisFeaturedEndpoint:
+    """Tests per l'endpoint de l'efemèride destacada"""
+
+    URL = 'https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/03/15'
+    EVENTS = [{'year': 1900 + i, 'text': f'Event {i}', 'pages': []} for i in range(20)]
+
+    @responses.activate
+    def test_featured_is_deterministic_and_cacheable(self, client):
+        """Test: sempre el mateix event, amb s-maxage fins a mitjanit i ETag fort"""
+        responses.add(responses.GET, self.URL, json={'events': self.EVENTS}, status=200)
+
+        first = client.get('/api/ephemeris/featured?lang=en&date=03-15')
+        second = client.get('/api/ephemeris/featured?lang=en&date=03-15')
+
+        assert first.status_code == 200
+        assert first.get_json() == second.get_json()
+        assert first.get_json()['text'].startswith('Event ')
+        assert first.headers['ETag'] == second.headers['ETag']
+        assert not first.headers['ETag'].startswith('W/')
+        cache_control = first.headers['Cache-Control']
+        assert cache_control.startswith('public')
+        s_maxage = int(cache_control.split('s-maxage=')[1])
+        assert 0 < s_maxage <= 86400
+
+    @responses.activate
+    def test_featured_not_modified(self, client):
+        """Test: amb l'ETag vigent es respon 304"""
+        responses.add(responses.GET, self.URL, json={'events': self.EVENTS}, status=200)
+        etag = client.get('/api/ephemeris/featured?lang=en&date=03-15').headers['ETag']
+
+        response = client.get('/api/ephemeris/featured?lang=en&date=03-15',
+                              headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+
+    @responses.activate
+    def test_featured_is_shared_by_languages_with_the_same_feed(self, client):
+        """Test: ca i es llegeixen el feed en castellà i tenen el mateix destacat"""
+        responses.add(responses.GET, self.URL.replace('en.', 'es.'),
+                      json={'events': self.EVENTS}, status=200)
+
+        catalan = client.get('/api/ephemeris/featured?lang=ca&date=03-15')
+        spanish = client.get('/api/ephemeris/featured?lang=es&date=03-15')
+
+        assert catalan.get_json()['text'] == spanish.get_json()['text']
+        assert catalan.headers['ETag'] == spanish.headers['ETag']
+        assert len(app_module.wiki_client.get_feed(3, 15, 'es')._featured) == 1
+
+    @responses.activate
+    def test_featured_empty_day(self, client):
+        """Test: un dia sense events retorna 404"""
+        responses.add(responses.GET, self.URL, json={'events': []}, status=200)
+
+        assert client.get('/api/ephemeris/featured?lang=en&date=03-15').status_code == 404
+
+    def test_featured_invalid_params(self, client):
+        """Test: idioma, data o ponderació no vàlids retornen 400"""
+        assert client.get('/api/ephemeris/featured?lang=fr').status_code == 400
+        assert client.get('/api/ephemeris/featured?lang=en&date=02-30').status_code == 400
+        assert client.get('/api/ephemeris/featured?lang=en&weighted=x').status_code == 400
+
+    def test_seconds_until_midnight(self):
+        """Test: segons fins a la mitjanit local, mínim 1"""
+        assert app_module.seconds_until_midnight(datetime(2026, 3, 15, 23, 0, 0)) == 3600
+        assert app_module.seconds_until_midnight(datetime(2026, 3, 15, 23, 59, 59, 999999)) == 1
+
+
+class TestEphemerisStreamEndpoint:
+    """Tests pel flux SSE de les pantalles"""
+
+    @responses.activate
+    def test_stream_pushes_events_from_cached_feed(self, client, monkeypatch):
+        """Test: el flux envia l'obertura i efemèrides del feed (una sola baixada)"""
+        now = datetime.now()
+        url = ('https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+               f'{now.month:02d}/{now.day:02d}')
+        responses.add(responses.GET, url, json={'events': [
+            {'year': 1923, 'text': 'Test event', 'pages': []}
+        ]}, status=200)
+        clock = [0.0]
+        monkeypatch.setattr(app_module.event_streams, 'clock', lambda: clock[0])
+        monkeypatch.setattr(app_module.event_streams, 'sleep',
+                            lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+
+        response = client.get('/api/ephemeris/stream?lang=en&interval=5&fields=year,text')
+        chunks = iter(response.response)
+        received = [next(chunks).decode() for _ in range(3)]
+        response.close()
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert received[0].startswith('retry: ')
+        assert received[1].startswith('event: ephemeris\nid: ')
+        assert received[1].endswith('data: {"year": 1923, "text": "Test event"}\n\n')
+        assert received[2] == received[1]
+        assert app_module.event_streams.active == 0
+        responses.assert_call_count(url, 1)
+
+    def test_stream_connection_limit(self, client, monkeypatch):
+        """Test: amb totes les places ocupades es respon 503 amb Retry-After"""
+        monkeypatch.setattr(app_module.event_streams, 'max_connections', 0)
+
+        response = client.get('/api/ephemeris/stream?lang=en')
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+
+    def test_stream_invalid_params(self, client):
+        """Test: idioma o interval no vàlids retornen 400"""
+        assert client.get('/api/ephemeris/stream?lang=fr').status_code == 400
+        assert client.get('/api/ephemeris/stream?lang=en&interval=abc').status_code == 400
+        assert client.get('/api/ephemeris/stream?lang=en&interval=1').status_code == 400
+
+
+class TestEphemerisDetailsBatchEndpoint:
+    """Tests per l'endpoint de detalls per lots"""
+
+    URL = 'https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/03/15'
+    EVENTS = [
+        {'year': -44, 'text': 'Caesar', 'pages': [{'title': 'Caesar', 'extract': 'Ides'}]},
+        {'year': 1917, 'text': 'Abdication', 'pages': [{'title': 'Nicholas', 'extract': 'Tsar'}]}
+    ]
+
+    @responses.activate
+    def test_batch_resolves_ids_and_pairs_with_per_item_errors(self, client):
+        """Test: ids i parells any/text en ordre, amb errors per element"""
+        responses.add(responses.GET, self.URL, json={'events': self.EVENTS}, status=200)
+        ids = client.get('/api/ephemeris/feed?lang=en&date=03-15').get_json()['ids']
+
+        response = client.post('/api/ephemeris/details:batch', json={
+            'lang': 'en', 'date': '03-15',
+            'items': [ids[1], {'year': -44, 'text': 'Caesar'}, 'unknown', {'year': 1},
+                      {'id': ['a']}, {'id': {'a': 1}}]
+        })
+
+        assert response.status_code == 200
+        results = response.get_json()['results']
+        assert [r.get('status') for r in results] == [None, None, 404, 400, 400, 400]
+        assert results[0] == {'id': ids[1], 'details': results[0]['details']}
+        assert results[0]['details']['description'] == 'Tsar'
+        assert results[1]['id'] == ids[0]
+        assert results[1]['details']['description'] == 'Ides'
+        assert results[2]['error'] == 'Event not found'
+        responses.assert_call_count(self.URL, 1)
+
+    @responses.activate
+    def test_batch_sparse_fields(self, client):
+        """Test: fields i max_extract s'apliquen a cada element del lot"""
+        responses.add(responses.GET, self.URL, json={'events': self.EVENTS}, status=200)
+
+        response = client.post('/api/ephemeris/details:batch?fields=year,description&max_extract=3',
+                               json={'lang': 'en', 'date': '03-15',
+                                     'items': [{'year': -44, 'text': 'Caesar'}]})
+
+        assert response.get_json()['results'][0]['details'] == {'year': -44, 'description': 'Id…'}
+
+    def test_batch_invalid_requests(self, client):
+        """Test: cos sense items, massa elements o data no vàlida retornen 400"""
+        assert client.post('/api/ephemeris/details:batch', json={}).status_code == 400
+        too_many = {'items': ['x'] * (app_module.app.config['DETAILS_BATCH_MAX_ITEMS'] + 1)}
+        assert client.post('/api/ephemeris/details:batch', json=too_many).status_code == 400
+        response = client.post('/api/ephemeris/details:batch',
+                               json={'items': ['x'], 'date': '13-01'})
+        assert response.status_code == 400
+
+    @responses.activate
+    def test_batch_rejects_unsupported_language(self, client):
+        """Test: un idioma no suportat o que no és un string retorna 400 sense anar a Wikipedia"""
+        for lang in ('evil.example/x?', ['es'], 'fr'):
+            response = client.post('/api/ephemeris/details:batch',
+                                   json={'items': ['abc'], 'lang': lang, 'date': '10-19'})
+
+            assert response.status_code == 400
+            assert response.get_json()['error'] == 'Unsupported language'
+        assert len(responses.calls) == 0
+
 
 class TestEphemerisDetailsEndpoint:
     """Tests per l'endpoint de detalls d'efemèrides"""
@@ -164,6 +770,136 @@ class TestEphemerisDetailsEndpoint:
         assert 'description' in data
         assert 'links' in data
 
+    @responses.activate
+    def test_get_details_sparse_fields(self, client):
+        """Test: fields=year,text,thumbnail deixa fora la descripció i els links"""
+        today = datetime.now()
+        responses.add(
+            responses.GET,
+            ('https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+             f'{today.month:02d}/{today.day:02d}'),
+            json={'events': [{'year': 1492, 'text': 'Test event', 'pages': [{
+                'title': 'Test Page', 'extract': 'Test description',
+                'content_urls': {'desktop': {'page': 'https://test.com'}}
+            }]}]},
+            status=200
+        )
+
+        response = client.post('/api/ephemeris/details?fields=year,text,thumbnail',
+                               json={'year': 1492, 'text': 'Test event', 'lang': 'es'})
+
+        assert response.status_code == 200
+        assert response.get_json() == {'year': 1492, 'text': 'Test event', 'thumbnail': ''}
+
+    def test_get_details_invalid_fields(self, client):
+        """Test: camps desconeguts o max_extract no vàlid retornen 400"""
+        body = {'id': 'x', 'lang': 'es'}
+        fields = client.post('/api/ephemeris/details?fields=pages', json=body)
+        max_extract = client.post('/api/ephemeris/details?max_extract=0', json=body)
+        batch = client.post('/api/ephemeris/details:batch?max_extract=abc', json={'items': []})
+
+        assert fields.status_code == 400
+        assert fields.get_json() == {'error': 'Invalid fields'}
+        assert max_extract.status_code == 400
+        assert max_extract.get_json() == {'error': 'Invalid max_extract'}
+        assert batch.get_json() == {'error': 'Invalid max_extract'}
+
+    @responses.activate
+    def test_get_details_server_timing(self, client):
+        """Test: la resposta de detalls inclou Server-Timing per fases"""
+        today = datetime.now()
+        responses.add(
+            responses.GET,
+            ('https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+             f'{today.month:02d}/{today.day:02d}'),
+            json={'events': [{'year': 1492, 'text': 'Test event', 'pages': []}]},
+            status=200
+        )
+
+        response = client.post('/api/ephemeris/details',
+                               json={'year': 1492, 'text': 'Test event', 'lang': 'es'})
+
+        phases = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+        assert phases == ['fetch', 'match', 'details', 'encode', 'total']
+
+    @responses.activate
+    def test_get_details_profile_token_dumps_profile(self, client, monkeypatch, tmp_path):
+        """Test: un token de profiling vàlid desa el perfil de la petició"""
+        monkeypatch.setattr(app_module.request_profiler, 'directory', str(tmp_path))
+        today = datetime.now()
+        responses.add(
+            responses.GET,
+            ('https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+             f'{today.month:02d}/{today.day:02d}'),
+            json={'events': [{'year': 1492, 'text': 'Test event', 'pages': []}]},
+            status=200
+        )
+
+        client.post('/api/ephemeris/details',
+                    json={'year': 1492, 'text': 'Test event', 'lang': 'es'},
+                    headers={'X-Profile-Token': app_module.request_profiler.make_token()})
+        client.post('/api/ephemeris/details',
+                    json={'year': 1492, 'text': 'Test event', 'lang': 'es'},
+                    headers={'X-Profile-Token': 'forged'})
+
+        assert len(list(tmp_path.glob('*.prof'))) == 1
+
+    @responses.activate
+    def test_get_details_thumbnail_is_proxied(self, client, image_cache_dir):
+        """Test: la miniatura dels detalls apunta al proxy i /img la serveix en WebP"""
+        from io import BytesIO
+        from PIL import Image
+        source = 'https://upload.wikimedia.org/wikipedia/commons/a/ab/Test.jpg'
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480)).save(buffer, 'JPEG')
+        today = datetime.now()
+        responses.add(
+            responses.GET,
+            ('https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+             f'{today.month:02d}/{today.day:02d}'),
+            json={'events': [{'year': 1492, 'text': 'Test event', 'pages': [
+                {'title': 'Test Page', 'thumbnail': {'source': source}}
+            ]}]},
+            status=200
+        )
+        responses.add(responses.GET, source, body=buffer.getvalue(), status=200)
+
+        data = client.post('/api/ephemeris/details',
+                           json={'year': 1492, 'text': 'Test event', 'lang': 'es'}).get_json()
+        # Els detalls no escriuen res a disc: el token porta la URL signada
+        assert list(image_cache_dir.iterdir()) == []
+        image = client.get(data['thumbnail'])
+        token = data['thumbnail'].split('/')[2].split('?')[0]
+
+        assert data['thumbnail'].startswith('/img/')
+        assert '160w' in data['thumbnailSrcset']
+        assert image.status_code == 200
+        assert image.mimetype == 'image/webp'
+        assert 'immutable' in image.headers['Cache-Control']
+        assert client.get('/img/' + token[:-4] + 'AAAA').status_code == 404
+
+    @responses.activate
+    def test_proxied_image_that_is_not_an_image_returns_502(self, client):
+        """Test: si Wikimedia retorna HTML en lloc de la imatge, /img respon 502"""
+        source = 'https://upload.wikimedia.org/wikipedia/commons/a/ab/Broken.jpg'
+        responses.add(responses.GET, source, body='<html>Error</html>', status=200,
+                      content_type='text/html')
+
+        response = client.get(app_module.image_proxy.url_for(source)['src'])
+
+        assert response.status_code == 502
+        assert response.get_json() == {'error': 'Upstream image unavailable'}
+
+    @responses.activate
+    def test_proxied_image_is_fetched_with_the_app_user_agent(self, client):
+        """Test: les descàrregues de miniatures porten el User-Agent de l'aplicació"""
+        source = 'https://upload.wikimedia.org/wikipedia/commons/a/ab/Agent.jpg'
+        responses.add(responses.GET, source, body='<html>Error</html>', status=200)
+
+        client.get(app_module.image_proxy.url_for(source)['src'])
+
+        assert responses.calls[0].request.headers['User-Agent'].startswith('EphemeridesApp/')
+
     def test_get_details_missing_fields(self, client):
         """Test: detalls sense year o text retorna 400"""
         response = client.post('/api/ephemeris/details',
@@ -192,6 +928,278 @@ class TestEphemerisDetailsEndpoint:
         assert response.status_code == 404
 
 
+class TestServiceWorker:
+    """Tests pel service worker"""
+
+    def test_service_worker_is_served_from_root(self, client):
+        """Test: /sw.js és JavaScript, no es guarda en cache i precarrega traduccions"""
+        response = client.get('/sw.js')
+        body = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/javascript'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        for lang in ('ca', 'es', 'en'):
+            assert f'"/api/translations/{lang}"' in body
+
+    def test_service_worker_precaches_fingerprinted_bundles(self, client, monkeypatch, tmp_path):
+        """Test: amb build, es precarreguen els bundles amb hash i la versió canvia amb ells"""
+        manifest = tmp_path / 'manifest.json'
+        manifest.write_text('{"app.js": "app.abc.js", "app.css": "app.def.css", "fonts": []}')
+        monkeypatch.setattr(app_module.asset_manifest, 'path', str(manifest))
+        first = client.get('/sw.js').get_data(as_text=True)
+
+        manifest.write_text('{"app.js": "app.xyz.js", "app.css": "app.def.css", "fonts": []}')
+        os.utime(manifest, (1, 1))
+        second = client.get('/sw.js').get_data(as_text=True)
+
+        assert '"/static/dist/app.abc.js"' in first
+        assert '/static/js/app.js' not in first
+        version = [line for line in first.splitlines() if line.startswith('const VERSION')]
+        assert version and version[0] not in second
+
+    def test_service_worker_version_changes_with_translations(self, client, monkeypatch,
+                                                              tmp_path):
+        """Test: editar un fitxer de traduccions canvia la versió del service worker"""
+        (tmp_path / 'translations').mkdir()
+        for lang in ('ca', 'es', 'en'):
+            (tmp_path / 'translations' / f'{lang}.json').write_text('{"title": "Efemèrides"}')
+        monkeypatch.chdir(tmp_path)
+        first = client.get('/sw.js').get_data(as_text=True)
+
+        (tmp_path / 'translations' / 'es.json').write_text('{"title": "Efemérides"}')
+        second = client.get('/sw.js').get_data(as_text=True)
+
+        version = [line for line in first.splitlines() if line.startswith('const VERSION')]
+        assert version and version[0] not in second
+
+
+class TestDeployment:
+    """Tests de la configuració de producció (Procfile i gunicorn.conf.py)"""
+
+    ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def test_procfile_does_not_use_development_server(self):
+        """Test: el Procfile serveix app:app amb gunicorn, no amb app.run()"""
+        with open(os.path.join(self.ROOT, 'Procfile')) as f:
+            command = f.read()
+
+        assert 'gunicorn' in command and 'app:app' in command
+        assert 'app.py' not in command
+
+    def test_gunicorn_uses_gevent_and_starts_background_workers(self, monkeypatch):
+        """Test: workers gevent i precàrrega arrencada a post_worker_init"""
+        # El fitxer fixa PROMETHEUS_MULTIPROC_DIR: monkeypatch el treu en acabar
+        monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+        settings = runpy.run_path(os.path.join(self.ROOT, 'gunicorn.conf.py'))
+        started = []
+        monkeypatch.setattr(app_module, 'start_background_workers', lambda: started.append(True))
+
+        settings['post_worker_init'](worker=None)
+
+        assert settings['worker_class'] == 'gevent'
+        assert started == [True]
+
+    def test_metrics_are_summed_across_worker_processes(self, tmp_path):
+        """Test: amb PROMETHEUS_MULTIPROC_DIR, /metrics suma els comptadors de tots els processos"""
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+        increment = ("from api import metrics; metrics.HTTP_REQUESTS"
+                     ".labels(route='/health', method='GET', status=200).inc()")
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', increment], cwd=self.ROOT, env=env, check=True)
+
+        render = 'from api import metrics; print(metrics.render()[0].decode())'
+        body = subprocess.run([sys.executable, '-c', render], cwd=self.ROOT, env=env, check=True,
+                              capture_output=True, text=True).stdout
+
+        assert ('ephemerides_http_requests_total{method="GET",route="/health",status="200"} 2.0'
+                in body)
+
+
+class TestAdminCacheEndpoint:
+    """Tests per l'endpoint d'introspecció de la cache"""
+
+    @pytest.fixture
+    def admin_token(self, app):
+        app.config['ADMIN_TOKEN'] = 'secret-token'
+        yield 'secret-token'
+        app.config['ADMIN_TOKEN'] = None
+
+    def test_admin_cache_hidden_without_token_configured(self, client):
+        """Test: sense ADMIN_TOKEN l'endpoint no existeix"""
+        assert client.get('/admin/cache').status_code == 404
+
+    def test_admin_cache_requires_valid_token(self, client, admin_token):
+        """Test: sense capçalera 401, amb token incorrecte 403"""
+        assert client.get('/admin/cache').status_code == 401
+        response = client.get('/admin/cache', headers={'Authorization': 'Bearer wrong'})
+        assert response.status_code == 403
+
+    @responses.activate
+    def test_admin_cache_lists_resident_feeds(self, client, admin_token):
+        """Test: retorna les entrades residents amb mida i encerts"""
+        now = datetime.now()
+        responses.add(
+            responses.GET,
+            ('https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+             f'{now.month:02d}/{now.day:02d}'),
+            json={'events': [{'year': 1923, 'text': 'Test event', 'pages': []}]},
+            status=200
+        )
+        client.get('/api/ephemeris/today?lang=en')
+        client.get('/api/ephemeris/today?lang=en')
+
+        response = client.get('/admin/cache', headers={'Authorization': f'Bearer {admin_token}'})
+
+        assert response.status_code == 200
+        feeds = response.get_json()['caches'][0]
+        assert feeds['name'] == 'feeds'
+        item = feeds['items'][0]
+        assert item['key'] == f'en:events:{now.month}:{now.day}'
+        assert item['bytes'] > 0
+        assert item['hits'] >= 1
+        assert feeds['bytes'] >= item['bytes']
+
+
+class TestAdminCacheOperations:
+    """Tests per invalidar, refrescar i precarregar feeds des de /admin i la CLI"""
+
+    URL = 'https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/03/15'
+
+    @pytest.fixture
+    def auth(self, app):
+        app.config['ADMIN_TOKEN'] = 'secret-token'
+        yield {'Authorization': 'Bearer secret-token'}
+        app.config['ADMIN_TOKEN'] = None
+
+    @responses.activate
+    def test_invalidate_and_refresh(self, client, auth):
+        """Test: invalidar treu el feed; refrescar el torna a baixar"""
+        responses.add(responses.GET, self.URL, json={'events': [{'year': 1, 'text': 'Old'}]})
+        responses.add(responses.GET, self.URL, json={'events': [{'year': 1, 'text': 'New'}]})
+        client.get('/api/ephemeris/feed?lang=en&date=03-15')
+
+        response = client.post('/admin/cache/refresh', json={'keys': ['en:events:3:15']},
+                               headers=auth)
+
+        assert response.status_code == 200
+        assert response.get_json()['keys'] == ['en:events:3:15']
+        assert client.get('/api/ephemeris/feed?lang=en&date=03-15').get_json()['texts'] == ['New']
+
+        response = client.post('/admin/cache/invalidate', json={'keys': ['*:events:3']},
+                               headers=auth)
+
+        assert response.get_json() == {'operation': 'invalidate', 'status': 'done',
+                                       'keys': ['en:events:3:15']}
+        assert not app_module.wiki_client.is_cached(3, 15, 'en')
+
+    @responses.activate
+    def test_warm_loads_missing_feeds(self, client, auth, monkeypatch):
+        """Test: precarregar baixa els feeds que no hi són"""
+        monkeypatch.setattr(app_module, 'get_wikipedia_languages', lambda: ['en'])
+        responses.add(responses.GET, self.URL, json={'events': []})
+
+        response = client.post('/admin/cache/warm', json={'keys': ['*:events:3:15']}, headers=auth)
+
+        assert response.get_json()['keys'] == ['en:events:3:15']
+        assert app_module.wiki_client.is_cached(3, 15, 'en')
+
+    def test_invalid_operations(self, client, auth):
+        """Test: operació, cos o claus no vàlids; sense token no hi ha accés"""
+        response = client.post('/admin/cache/drop', json={'keys': ['en']}, headers=auth)
+        assert response.status_code == 404
+        assert client.post('/admin/cache/warm', json={}, headers=auth).status_code == 400
+        response = client.post('/admin/cache/warm', json={'keys': ['en:events:2:30']}, headers=auth)
+        assert response.status_code == 400
+        assert client.post('/admin/cache/invalidate', json={'keys': ['en']}).status_code == 401
+
+    def test_cli_publishes_to_broadcast_file(self, app, tmp_path, monkeypatch):
+        """Test: la CLI publica l'operació al fitxer que llegeixen els workers"""
+        path = str(tmp_path / 'broadcast.log')
+        worker = app_module.CacheBroadcast(path, worker_id='worker')
+        monkeypatch.setattr(app_module.cache_admin, 'broadcast',
+                            app_module.CacheBroadcast(path, worker_id='cli'))
+
+        result = app.test_cli_runner().invoke(args=['cache', 'invalidate', 'es:events:10'])
+
+        assert result.exit_code == 0
+        assert [(m['op'], m['keys']) for m in worker.poll()] == [('invalidate', ['es:events:10:*'])]
+
+    @responses.activate
+    def test_worker_applies_broadcast_without_main(self, client, app, tmp_path, monkeypatch):
+        """Test: cada worker WSGI llegeix el fitxer de difusió pel seu compte"""
+        responses.add(responses.GET, self.URL, json={'events': [{'year': 1, 'text': 'Old'}]})
+        path = str(tmp_path / 'broadcast.log')
+        monkeypatch.setattr(app_module.cache_admin, 'broadcast',
+                            app_module.CacheBroadcast(path, worker_id='worker'))
+        monkeypatch.setitem(app.config, 'CACHE_BROADCAST_INTERVAL', 0.01)
+        monkeypatch.setattr(app_module, 'background_pid', None)
+        client.get('/api/ephemeris/feed?lang=en&date=03-15')
+
+        try:
+            broadcast = app_module.CacheBroadcast(path, worker_id='cli')
+            broadcast.publish('invalidate', ['en:events:3:15'])
+            deadline = time.monotonic() + 5
+            while app_module.wiki_client.is_cached(3, 15, 'en') and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            app_module.background_stop.set()
+            for thread in threading.enumerate():
+                if thread.name == 'cache-broadcast':
+                    thread.join(timeout=5)
+            app_module.background_stop.clear()
+
+        assert not app_module.wiki_client.is_cached(3, 15, 'en')
+
+    def test_cli_requires_broadcast_file(self, app, monkeypatch):
+        """Test: sense fitxer de difusió la CLI no pot arribar als workers"""
+        monkeypatch.setattr(app_module.cache_admin, 'broadcast', None)
+
+        result = app.test_cli_runner().invoke(args=['cache', 'warm', 'es'])
+
+        assert result.exit_code != 0
+        assert 'CACHE_BROADCAST_FILE' in result.output
+
+
+class TestEphemerisSearchEndpoint:
+    """Tests per l'endpoint de cerca"""
+
+    @responses.activate
+    def test_search_finds_loaded_events(self, client):
+        """Test: GET /api/ephemeris/search troba events dels feeds carregats"""
+        now = datetime.now()
+        responses.add(
+            responses.GET,
+            ('https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/'
+             f'{now.month:02d}/{now.day:02d}'),
+            json={'events': [
+                {'year': 1492, 'text': 'Colón llega a América', 'pages': []},
+                {'year': 1936, 'text': 'Comienza la Guerra Civil', 'pages': []}
+            ]},
+            status=200
+        )
+        client.get('/api/ephemeris/today?lang=ca')
+
+        response = client.get('/api/ephemeris/search?q=colon+america&lang=ca')
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['total'] == 1
+        assert data['indexedDays'] == 1
+        assert data['results'][0]['year'] == 1492
+
+    def test_search_does_not_call_upstream(self, client):
+        """Test: la cerca sense feeds carregats no va a Wikipedia"""
+        response = client.get('/api/ephemeris/search?q=guerra&lang=es')
+
+        assert response.status_code == 200
+        assert response.get_json()['results'] == []
+
+    def test_search_missing_query(self, client):
+        """Test: sense q retorna 400"""
+        assert client.get('/api/ephemeris/search?lang=es').status_code == 400
+
+
 class TestTranslationsEndpoint:
     """Tests per l'endpoint de traduccions"""
 
@@ -0,0 +1,43 @@
+"""
+Tests unitaris pel TTL adaptatiu dels feeds
+"""
+from api import metrics
+from api.adaptive_ttl import AdaptiveTTL
+
+
+class TestAdaptiveTTL:
+    """Tests per AdaptiveTTL"""
+
+    def test_first_download_uses_initial_ttl(self):
+        """Test: una clau nova comença amb el TTL inicial (dins dels límits)"""
+        assert AdaptiveTTL(3600, 300, 86400).observe('a', 'h1') == 3600
+        assert AdaptiveTTL(10, 300, 86400).observe('a', 'h1') == 300
+
+    def test_stable_content_gets_longer_ttl_up_to_max(self):
+        """Test: si el contingut no canvia el TTL es duplica fins al màxim"""
+        ttl = AdaptiveTTL(3600, 300, 10000)
+        ttl.observe('a', 'h1')
+
+        assert [ttl.observe('a', 'h1') for _ in range(3)] == [7200, 10000, 10000]
+        assert ttl.get('a') == {'ttl': 10000, 'refreshes': 3, 'changes': 0}
+
+    def test_changing_content_gets_shorter_ttl_down_to_min(self):
+        """Test: si el contingut canvia el TTL es redueix a la meitat fins al mínim"""
+        ttl = AdaptiveTTL(3600, 1000, 86400)
+        ttl.observe('a', 'h0')
+
+        assert [ttl.observe('a', f'h{i}') for i in range(1, 4)] == [1800, 1000, 1000]
+        assert ttl.get('a')['changes'] == 3
+        assert ttl.get('b') is None
+
+    def test_refreshes_are_counted_in_metrics(self):
+        """Test: cada refresc es compta com a canviat o no canviat"""
+        changed = metrics.FEED_REFRESHES.labels(result='changed')._value.get()
+        unchanged = metrics.FEED_REFRESHES.labels(result='unchanged')._value.get()
+        ttl = AdaptiveTTL(3600, 300, 86400)
+        ttl.observe('a', 'h1')
+        ttl.observe('a', 'h1')
+        ttl.observe('a', 'h2')
+
+        assert metrics.FEED_REFRESHES.labels(result='changed')._value.get() == changed + 1
+        assert metrics.FEED_REFRESHES.labels(result='unchanged')._value.get() == unchanged + 1
@@ -0,0 +1,143 @@
+"""
+Tests unitaris pel pipeline d'estàtics (build i manifest)
+"""
+import json
+import os
+import subprocess
+import shutil
+import pytest
+from api.assets import AssetManifest
+from scripts import build_assets
+
+
+class TestMinify:
+    """Tests pels minificadors de scripts/build_assets.py"""
+
+    def test_minify_js_removes_comments_and_indentation(self):
+        """Test: es treuen comentaris i sagnat però no el codi"""
+        source = '/** doc */\nclass A {\n    // comentari\n    f() { return 1; }  // final\n}\n'
+
+        assert build_assets.minify_js(source) == 'class A {\nf() { return 1; }\n}\n'
+
+    def test_minify_js_keeps_literals_intact(self):
+        """Test: strings, templates i regex amb // o /* no es toquen"""
+        source = ("const url = 'http://a/*b*/';\n"
+                  "const css = `\n    .a { color: red; }\n`;\n"
+                  "const re = /\\/\\/[a/]*/g;  // regex\n"
+                  "const half = total / 2 / 1;\n")
+
+        result = build_assets.minify_js(source)
+
+        assert "'http://a/*b*/'" in result
+        assert '`\n    .a { color: red; }\n`' in result
+        assert '/\\/\\/[a/]*/g;' in result
+        assert 'total / 2 / 1' in result
+
+    @pytest.mark.parametrize('statement', [
+        'return /["\\\']  +/.test(s);',
+        'const kind = typeof /a  b/;',
+        'switch (s) { case /`  /.source: break; }',
+    ])
+    def test_minify_js_regex_after_keyword(self, statement):
+        """Test: després de return, typeof o case una '/' és una regex, no una divisió"""
+        source = f'function f(s) {{\n    {statement}  // comentari\n}}\n'
+
+        assert build_assets.minify_js(source) == f'function f(s) {{\n{statement}\n}}\n'
+
+    def test_minify_js_division_after_identifier(self):
+        """Test: després d'un identificador (encara que sembli una paraula clau) és una divisió"""
+        source = 'const r = returned / 2 // meitat\nconst g = /a/g / 2\n'
+
+        assert build_assets.minify_js(source) == 'const r = returned / 2\nconst g = /a/g / 2\n'
+
+    @pytest.mark.skipif(shutil.which('node') is None, reason='Cal node per validar la sintaxi')
+    def test_minified_bundle_is_valid_javascript(self, tmp_path):
+        """Test: el bundle real continua sent JavaScript vàlid"""
+        bundle = tmp_path / 'app.js'
+        source = build_assets.read_sources(build_assets.JS_SOURCES)
+        bundle.write_text(build_assets.minify_js(source))
+
+        assert subprocess.run(['node', '--check', str(bundle)]).returncode == 0
+
+    def test_minify_css(self):
+        """Test: es treuen comentaris i espais al voltant de { } ; ,"""
+        source = '/* c */\n.a , .b > p {\n    color: red;\n    content: "x  /* y */";\n}\n'
+
+        assert build_assets.minify_css(source) == '.a,.b>p{color: red;content: "x  /* y */"}\n'
+
+
+class TestBuild:
+    """Tests per la generació de static/dist"""
+
+    def test_build_writes_fingerprinted_files_and_manifest(self, tmp_path):
+        """Test: el manifest apunta a fitxers amb el hash del contingut"""
+        dist = tmp_path / 'dist'
+        manifest = build_assets.build(dist_dir=str(dist), fonts_dir=str(tmp_path / 'fonts'))
+
+        content = (dist / manifest['app.js']).read_bytes()
+        assert manifest['app.js'] == f'app.{build_assets.fingerprint(content)}.js'
+        assert json.loads((dist / 'manifest.json').read_text()) == manifest
+        assert manifest['fonts'] == []
+
+    def test_build_self_hosts_fonts(self, tmp_path):
+        """Test: les fonts de fonts.css es copien amb hash i s'inclouen al CSS"""
+        fonts = tmp_path / 'fonts'
+        fonts.mkdir()
+        (fonts / 'Crimson-400-latin.woff2').write_bytes(b'font')
+        (fonts / 'fonts.css').write_text(
+            "@font-face { font-family: 'Crimson'; "
+            "src: url(Crimson-400-latin.woff2) format('woff2'); }")
+        if build_assets.font_subset is not None:
+            pytest.skip('Amb fontTools la font de prova no es pot retallar')
+
+        dist = tmp_path / 'dist'
+        manifest = build_assets.build(dist_dir=str(dist), fonts_dir=str(fonts))
+
+        assert manifest['fonts'][0].startswith('fonts/Crimson-400-latin.')
+        assert f"url({manifest['fonts'][0]})" in (dist / manifest['app.css']).read_text()
+
+    def test_build_keeps_recent_bundles_and_prunes_old_ones(self, tmp_path):
+        """Test: els bundles d'un build anterior es conserven fins que passa DIST_MAX_AGE"""
+        dist = tmp_path / 'dist'
+        dist.mkdir()
+        recent = dist / 'app.0123456789.js'
+        old = dist / 'app.abcdefabcd.css'
+        other = dist / 'robots.txt'
+        for path in (recent, old, other):
+            path.write_text('x')
+        stale = os.path.getmtime(old) - build_assets.DIST_MAX_AGE - 60
+        os.utime(old, (stale, stale))
+        os.utime(other, (stale, stale))
+
+        manifest = build_assets.build(dist_dir=str(dist), fonts_dir=str(tmp_path / 'fonts'))
+
+        assert recent.exists()
+        assert not old.exists()
+        assert other.exists()
+        assert (dist / manifest['app.js']).exists()
+        assert (dist / manifest['app.css']).exists()
+
+
+class TestAssetManifest:
+    """Tests per la classe AssetManifest"""
+
+    def test_missing_manifest_returns_none(self, tmp_path):
+        """Test: sense build, la plantilla fa servir els fitxers originals"""
+        manifest = AssetManifest(str(tmp_path / 'manifest.json'))
+
+        assert manifest.url('app.js') is None
+        assert manifest.fonts() == []
+
+    def test_manifest_is_reloaded_when_it_changes(self, tmp_path):
+        """Test: un build nou es veu sense reiniciar"""
+        path = tmp_path / 'manifest.json'
+        path.write_text(json.dumps({'app.js': 'app.1.js', 'fonts': ['fonts/a.woff2']}))
+        manifest = AssetManifest(str(path))
+
+        assert manifest.url('app.js') == '/static/dist/app.1.js'
+        assert manifest.fonts() == ['/static/dist/fonts/a.woff2']
+
+        path.write_text(json.dumps({'app.js': 'app.2.js'}))
+        os.utime(path, (1, 1))
+
+        assert manifest.url('app.js') == '/static/dist/app.2.js'
@@ -0,0 +1,167 @@
+"""
+Tests unitaris per l'administració de la cache de feeds
+"""
+import json
+import os
+import pytest
+from api import cache_admin
+from api.cache_admin import CacheAdmin, CacheBroadcast, CacheKeyPattern
+from api.day_feed import DayFeed
+from api.wikipedia_client import WikipediaClient
+from config import Config
+
+
+class TestCacheKeyPattern:
+    """Tests per CacheKeyPattern"""
+
+    def test_wildcards_match(self):
+        """Test: '*' i les parts que falten encaixen amb qualsevol valor"""
+        assert CacheKeyPattern.parse('es:events:10:19').matches(('es', 'events', 10, 19))
+        assert CacheKeyPattern.parse('*:events:10').matches(('ca', 'events', 10, 3))
+        assert CacheKeyPattern.parse('es').matches(('es', 'events', 1, 1))
+        assert not CacheKeyPattern.parse('es:events:10:19').matches(('es', 'events', 10, 20))
+        assert not CacheKeyPattern.parse('en:*:*:*').matches(('es', 'events', 10, 19))
+
+    def test_expand(self):
+        """Test: l'expansió recorre idiomes i els dies que existeixen"""
+        assert len(CacheKeyPattern.parse('*:events:2').expand(['ca', 'es'])) == 2 * 29
+        assert len(CacheKeyPattern.parse('es:events:*:31').expand(['es'])) == 7
+        assert len(CacheKeyPattern.parse('es').expand(['ca', 'es'])) == 366
+
+    @pytest.mark.parametrize('text', ['', 'es:births', 'es:events:13', 'es:events:2:30',
+                                      'es:events:x', 'es:events:1:1:1'])
+    def test_invalid_patterns(self, text):
+        """Test: tipus, mes o dia no vàlids són un error"""
+        with pytest.raises(ValueError):
+            CacheKeyPattern.parse(text)
+
+    def test_str_roundtrip(self):
+        """Test: el patró es pot tornar a escriure (per publicar-lo)"""
+        assert str(CacheKeyPattern.parse('es:events:10')) == 'es:events:10:*'
+
+
+class TestCacheBroadcast:
+    """Tests per la difusió entre workers"""
+
+    def test_other_workers_receive_operations(self, tmp_path):
+        """Test: cada worker rep les operacions dels altres, no les seves"""
+        path = str(tmp_path / 'broadcast.log')
+        first = CacheBroadcast(path, worker_id='a')
+        second = CacheBroadcast(path, worker_id='b')
+
+        first.publish('invalidate', ['es:events:10:19'])
+
+        assert first.poll() == []
+        messages = second.poll()
+        assert [(m['op'], m['keys']) for m in messages] == [('invalidate', ['es:events:10:19'])]
+        assert second.poll() == []
+
+    def test_new_worker_skips_history_and_partial_lines(self, tmp_path):
+        """Test: un worker nou no aplica l'historial; una línia a mig escriure s'espera"""
+        path = tmp_path / 'broadcast.log'
+        path.write_text(json.dumps({'origin': 'x', 'op': 'invalidate', 'keys': ['es']}) + '\n')
+        worker = CacheBroadcast(str(path), worker_id='b')
+
+        with open(path, 'a') as f:
+            f.write('{"origin": "x", "op": "warm", ')
+        assert worker.poll() == []
+        with open(path, 'a') as f:
+            f.write('"keys": ["ca"]}\n')
+        assert [m['op'] for m in worker.poll()] == ['warm']
+
+    def test_rotation_keeps_operations_not_yet_polled(self, tmp_path):
+        """Test: passat max_bytes el fitxer es rota i un lector endarrerit no perd res"""
+        path = str(tmp_path / 'broadcast.log')
+        writer = CacheBroadcast(path, max_bytes=300, worker_id='a')
+        reader = CacheBroadcast(path, worker_id='b')
+        writer.publish('invalidate', ['es:events:1:1'])
+        assert len(reader.poll()) == 1
+
+        for day in range(2, 8):
+            writer.publish('invalidate', [f'es:events:1:{day}'])
+
+        assert os.path.exists(path + '.1')
+        keys = [m['keys'][0] for m in reader.poll()]
+        assert keys == [f'es:events:1:{day}' for day in range(2, 8)]
+        assert reader.poll() == []
+
+    def test_reader_is_not_confused_by_a_larger_new_generation(self, tmp_path):
+        """Test: la generació nova es llegeix des del principi encara que superi l'offset"""
+        path = str(tmp_path / 'broadcast.log')
+        writer = CacheBroadcast(path, max_bytes=250, worker_id='a')
+        writer.publish('invalidate', ['es:events:1:1'])
+        reader = CacheBroadcast(path, worker_id='b')
+        offset = os.path.getsize(path)
+
+        for day in range(2, 6):
+            writer.publish('invalidate', [f'es:events:1:{day}'])
+
+        assert os.path.getsize(path) > offset
+        keys = [m['keys'][0] for m in reader.poll()]
+        assert keys == [f'es:events:1:{day}' for day in range(2, 6)]
+
+    def test_missed_rotations_invalidate_everything(self, tmp_path):
+        """Test: si entre dues lectures hi ha hagut més d'una rotació, s'invalida tota la cache"""
+        path = str(tmp_path / 'broadcast.log')
+        writer = CacheBroadcast(path, max_bytes=100, worker_id='a')
+        writer.publish('invalidate', ['es:events:1:1'])
+        reader = CacheBroadcast(path, worker_id='b')
+
+        for day in range(2, 6):
+            writer.publish('invalidate', [f'es:events:1:{day}'])
+
+        messages = reader.poll()
+        assert (messages[0]['op'], messages[0]['keys']) == ('invalidate', ['*'])
+        assert CacheKeyPattern.parse('*').matches(('es', 'events', 1, 2))
+
+    def test_publish_takes_cross_process_lock(self, tmp_path, monkeypatch):
+        """Test: escriptura amb flock exclusiu i lectura amb flock compartit"""
+        calls = []
+        real_flock = cache_admin.fcntl.flock
+        monkeypatch.setattr(cache_admin.fcntl, 'flock',
+                            lambda f, op: (calls.append(op), real_flock(f, op)))
+        broadcast = CacheBroadcast(str(tmp_path / 'broadcast.log'), worker_id='a')
+        calls.clear()
+
+        broadcast.publish('warm', ['ca'])
+        broadcast.poll()
+
+        fcntl = cache_admin.fcntl
+        assert calls == [fcntl.LOCK_EX, fcntl.LOCK_UN, fcntl.LOCK_SH, fcntl.LOCK_UN]
+
+
+class TestCacheAdmin:
+    """Tests per CacheAdmin"""
+
+    def make_admin(self, broadcast=None):
+        client = WikipediaClient(Config.WIKIPEDIA_API_BASE)
+        for key in [('es', 'events', 10, 19), ('es', 'events', 10, 20), ('ca', 'events', 10, 19)]:
+            client.cache.set(key, DayFeed([]))
+        return CacheAdmin(client, lambda: ['ca', 'es'], broadcast), client
+
+    def test_invalidate_matching_keys(self):
+        """Test: s'esborren només les claus que encaixen"""
+        admin, client = self.make_admin()
+
+        keys = admin.target_keys('invalidate', admin.parse(['*:events:10:19']))
+        done = admin.run('invalidate', keys)
+
+        assert sorted(done) == ['ca:events:10:19', 'es:events:10:19']
+        assert client.cache.keys() == [('es', 'events', 10, 20)]
+
+    def test_warm_targets_only_missing_keys(self):
+        """Test: precarregar no torna a baixar el que ja és a la cache"""
+        admin, _ = self.make_admin()
+
+        keys = admin.target_keys('warm', admin.parse(['*:events:10:19', 'es:events:10:21']))
+
+        assert keys == [('es', 'events', 10, 21)]
+
+    def test_remote_refresh_invalidates(self, tmp_path):
+        """Test: un refresc d'un altre worker aquí només invalida"""
+        path = str(tmp_path / 'broadcast.log')
+        admin, client = self.make_admin(CacheBroadcast(path, worker_id='b'))
+        CacheBroadcast(path, worker_id='a').publish('refresh', ['es:events:10'])
+
+        assert admin.apply_broadcast() == 1
+        assert sorted(client.cache.keys()) == [('ca', 'events', 10, 19)]
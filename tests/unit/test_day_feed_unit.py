@@ -0,0 +1,241 @@
+"""
+Tests unitaris pel feed d'un dia i el seu índex per any
+"""
+import random
+import threading
+import pytest
+from collections import Counter
+import json
+from api.day_feed import AliasTable, DayFeed, event_id, numeric_year
+from api.feed_cache import approximate_size
+
+
+class TestNumericYear:
+    """Tests per la interpretació de l'any"""
+
+    @pytest.mark.parametrize('value,expected', [
+        (1492, 1492),
+        (-44, -44),
+        ('1492', 1492),
+        ('44 BC', -44),
+        ('44 a. C.', -44),
+        ('44 aC', -44),
+        ('-44', -44),
+        ('Unknown', None),
+        (None, None),
+    ])
+    def test_numeric_year(self, value, expected):
+        """Test: anys enters, textos i aC es converteixen correctament"""
+        assert numeric_year(value) == expected
+
+
+class TestDayFeed:
+    """Tests per la classe DayFeed"""
+
+    @pytest.fixture
+    def feed(self):
+        return DayFeed([
+            {'year': 1969, 'text': 'Apollo 11'},
+            {'year': '44 BC', 'text': 'Mort de Juli Cèsar'},
+            {'year': 1492, 'text': 'Colom'},
+            {'year': 1914, 'text': 'Primera Guerra Mundial'},
+            {'year': 'Unknown', 'text': 'Sense any'},
+        ])
+
+    def test_events_sorted_by_year(self, feed):
+        """Test: la vista per any està ordenada i exclou anys desconeguts"""
+        assert feed.years == [-44, 1492, 1914, 1969]
+        assert len(feed) == 5
+
+    def test_events_in_range(self, feed):
+        """Test: les consultes de rang són inclusives"""
+        assert [e['text'] for e in feed.events_in_range(1901, 2000)] == [
+            'Primera Guerra Mundial', 'Apollo 11']
+        assert [e['text'] for e in feed.events_in_range(year_to=1499)] == [
+            'Mort de Juli Cèsar', 'Colom']
+        assert feed.events_in_range(2001, None) == []
+
+    def test_random_event_in_range(self, feed):
+        """Test: l'event aleatori respecta el rang"""
+        rng = random.Random(0)
+        for _ in range(20):
+            assert 1901 <= feed.random_event(1901, 2000, rng=rng)['year'] <= 2000
+
+    def test_random_event_without_range_uses_all_events(self, feed):
+        """Test: sense rang es pot triar qualsevol event, també sense any"""
+        rng = random.Random(0)
+        texts = {feed.random_event(rng=rng)['text'] for _ in range(200)}
+        assert 'Sense any' in texts
+
+    def test_random_event_empty_range(self, feed):
+        """Test: un rang buit retorna None"""
+        assert feed.random_event(1500, 1600) is None
+
+
+class TestWeightedSelection:
+    """Tests pel mostreig ponderat amb taula d'àlies"""
+
+    def test_alias_table_follows_weights(self):
+        """Test: les freqüències observades segueixen els pesos"""
+        table = AliasTable([1, 2, 7])
+        rng = random.Random(42)
+        counts = Counter(table.sample(rng) for _ in range(20000))
+
+        assert counts[0] / 20000 == pytest.approx(0.1, abs=0.02)
+        assert counts[1] / 20000 == pytest.approx(0.2, abs=0.02)
+        assert counts[2] / 20000 == pytest.approx(0.7, abs=0.02)
+
+    @pytest.fixture
+    def feed(self):
+        return DayFeed([
+            {'year': 1800, 'text': 'Poc documentat', 'pages': []},
+            {'year': 1900, 'text': 'Molt documentat', 'pages': [
+                {'extract': 'x' * 2000}, {'extract': 'y' * 2000}, {'extract': 'z' * 2000}]},
+            {'year': 2000, 'text': 'Recent', 'pages': []},
+        ])
+
+    def test_weighted_by_pages_prefers_documented_events(self, feed):
+        """Test: amb weighted=pages l'event amb pàgines surt més sovint"""
+        rng = random.Random(1)
+        counts = Counter(feed.random_event(rng=rng, weighted='pages')['text'] for _ in range(6000))
+
+        assert counts['Molt documentat'] / 6000 == pytest.approx(4 / 6, abs=0.03)
+
+    def test_weighted_by_extract_within_year_range(self, feed):
+        """Test: la ponderació també funciona dins d'un rang d'anys"""
+        rng = random.Random(1)
+        counts = Counter(feed.random_event(1850, 2050, rng=rng, weighted='extract')['text']
+                         for _ in range(4000))
+
+        assert set(counts) == {'Molt documentat', 'Recent'}
+        assert counts['Molt documentat'] / 4000 == pytest.approx(31 / 32, abs=0.02)
+
+    def test_alias_table_is_built_once_per_feed(self, feed):
+        """Test: la taula es reutilitza entre peticions"""
+        feed.random_event(weighted='pages')
+        table = feed._alias_tables['pages']
+        feed.random_event(weighted='pages')
+
+        assert feed._alias_tables['pages'] is table
+
+    def test_unknown_weighting(self, feed):
+        """Test: un mode desconegut és un error"""
+        with pytest.raises(ValueError):
+            feed.random_event(weighted='popularity')
+
+
+class TestCompactFeed:
+    """Tests pel format columnar i els identificadors d'event"""
+
+    EVENTS = [
+        {'year': 1492, 'text': 'Colom', 'pages': [{'title': 'Colom'}]},
+        {'year': '44 BC', 'text': 'Cèsar', 'pages': []},
+    ]
+
+    def test_event_id_is_stable(self):
+        """Test: el mateix any i text donen sempre el mateix identificador"""
+        assert event_id(1492, 'Colom') == event_id(1492, 'Colom')
+        assert event_id(1492, 'Colom') != event_id(1493, 'Colom')
+
+    def test_get_by_id(self):
+        """Test: cada event es pot recuperar pel seu identificador"""
+        feed = DayFeed(self.EVENTS)
+
+        assert feed.get(event_id('44 BC', 'Cèsar'))['text'] == 'Cèsar'
+        assert feed.get('desconegut') is None
+
+    def test_compact_payload_is_columnar(self):
+        """Test: el payload té una columna per camp, en l'ordre del feed"""
+        body, etag = DayFeed(self.EVENTS).compact()
+        data = json.loads(body)
+
+        assert data == {
+            'count': 2,
+            'years': [1492, '44 BC'],
+            'texts': ['Colom', 'Cèsar'],
+            'hasDetails': [True, False],
+            'ids': [event_id(1492, 'Colom'), event_id('44 BC', 'Cèsar')],
+        }
+        assert etag == DayFeed([dict(e) for e in self.EVENTS]).compact()[1]
+        assert etag != DayFeed(self.EVENTS[:1]).compact()[1]
+
+
+class TestFeaturedEvent:
+    """Tests per l'event destacat determinista"""
+
+    EVENTS = [{'year': 1900 + i, 'text': f'Event {i}', 'pages': [{'title': 'x'}] * (i % 4)}
+              for i in range(50)]
+
+    def test_same_seed_same_event(self):
+        """Test: la mateixa llavor tria el mateix event, encara que canviï l'ordre"""
+        first = DayFeed(self.EVENTS).featured('ca|03-15')
+        shuffled = list(self.EVENTS)
+        random.Random(1).shuffle(shuffled)
+
+        assert DayFeed(shuffled).featured('ca|03-15') is first
+
+    def test_different_seeds_spread(self):
+        """Test: llavors diferents trien events diferents"""
+        feed = DayFeed(self.EVENTS)
+        picks = {feed.featured(f'ca|{day}')['text'] for day in range(30)}
+
+        assert len(picks) > 10
+
+    def test_weighted_prefers_heavier_events(self):
+        """Test: amb pes per pàgines, guanyen més sovint els events amb més pàgines"""
+        feed = DayFeed(self.EVENTS)
+        pages = [len(feed.featured(f'seed-{i}', 'pages')['pages']) for i in range(300)]
+
+        assert sum(pages) / len(pages) > 1.7  # uniforme: 1.5, ponderat: 2.0
+
+    def test_memos_are_bounded_and_reported(self):
+        """Test: destacats i variants són LRU acotats i la variació de bytes arriba a on_resize"""
+        feed = DayFeed(self.EVENTS)
+        deltas = []
+        feed.on_resize = deltas.append
+
+        for day in range(3 * DayFeed.MAX_FEATURED):
+            feed.featured(f'ca|{day}')
+            feed.serialized(('featured', day), lambda: {'day': day})
+        feed.random_event(weighted='pages')
+
+        assert len(feed._featured) == DayFeed.MAX_FEATURED
+        assert len(feed._serialized) == DayFeed.MAX_SERIALIZED
+        expected = (sum(DayFeed._memo_size(k, v) for k, v in feed._featured.items()) +
+                    sum(DayFeed._memo_size(k, v) for k, v in feed._serialized.items()) +
+                    approximate_size(feed._alias_tables['pages']))
+        assert sum(deltas) == expected
+
+    def test_memos_are_safe_across_threads(self):
+        """Test: consultes i desalotjaments concurrents no fallen ni desquadren el compte"""
+        feed = DayFeed(self.EVENTS)
+        deltas = []
+        feed.on_resize = deltas.append
+        errors = []
+
+        def hammer(offset):
+            try:
+                for i in range(200):
+                    day = (offset + i) % (2 * DayFeed.MAX_FEATURED)
+                    feed.featured(f'ca|{day}')
+                    feed.serialized(('featured', day), lambda: {'day': day})
+            except Exception as error:  # qualsevol error fa fallar el test
+                errors.append(error)
+
+        threads = [threading.Thread(target=hammer, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert len(feed._featured) == DayFeed.MAX_FEATURED
+        expected = (sum(DayFeed._memo_size(k, v) for k, v in feed._featured.items()) +
+                    sum(DayFeed._memo_size(k, v) for k, v in feed._serialized.items()))
+        assert sum(deltas) == expected
+
+    def test_empty_feed_and_unknown_weighting(self):
+        """Test: feed buit retorna None; ponderació desconeguda és un error"""
+        assert DayFeed([]).featured('seed') is None
+        with pytest.raises(ValueError):
+            DayFeed(self.EVENTS).featured('seed', 'unknown')
@@ -0,0 +1,94 @@
+"""
+Tests unitaris pel flux SSE
+"""
+import pytest
+from api import metrics
+from api.event_stream import (
+    HEARTBEAT, EventStreamRegistry, StreamLimitExceeded, format_event
+)
+
+
+class FakeClock:
+    """Rellotge que només avança quan es crida sleep"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_registry(clock, **kwargs):
+    kwargs.setdefault('max_connections', 10)
+    return EventStreamRegistry(sleep=clock.sleep, clock=clock, **kwargs)
+
+
+class TestFormatEvent:
+    """Tests per format_event"""
+
+    def test_multiline_data_and_fields(self):
+        """Test: cada línia de dades porta el seu prefix i el missatge acaba amb línia buida"""
+        assert format_event('a\nb', event='ephemeris', event_id='42', retry_ms=1000) == (
+            'retry: 1000\nevent: ephemeris\nid: 42\ndata: a\ndata: b\n\n')
+
+
+class TestEventStreamRegistry:
+    """Tests per EventStreamRegistry"""
+
+    def test_messages_are_pushed_on_schedule_with_heartbeats(self):
+        """Test: un missatge per interval i heartbeats mentre s'espera"""
+        clock = FakeClock()
+        registry = make_registry(clock, heartbeat=10)
+        stream = registry.open(lambda: f'msg {clock.now:.0f}\n\n', interval=25)
+
+        chunks = iter(stream)
+        received = [next(chunks) for _ in range(6)]
+
+        assert received[0].startswith('retry: 5000\nevent: open')
+        assert received[1:] == ['msg 0\n\n', HEARTBEAT, HEARTBEAT, 'msg 25\n\n', HEARTBEAT]
+        assert clock.sleeps[:3] == [10, 10, 5]
+        stream.close()
+
+    def test_skipped_messages_keep_the_connection_alive(self):
+        """Test: si no hi ha missatge (Wikipedia no respon) només s'envia heartbeat"""
+        clock = FakeClock()
+        registry = make_registry(clock, heartbeat=10)
+        chunks = iter(registry.open(lambda: None, interval=10))
+
+        next(chunks)
+        assert [next(chunks) for _ in range(3)] == [HEARTBEAT] * 3
+        assert clock.now == 20
+
+    def test_stream_ends_after_max_duration(self):
+        """Test: passada la durada màxima el flux s'acaba (el client es reconnecta)"""
+        clock = FakeClock()
+        registry = make_registry(clock, heartbeat=100, max_duration=60)
+        stream = registry.open(lambda: 'msg\n\n', interval=25)
+
+        received = list(stream)
+
+        assert received.count('msg\n\n') == 3  # t = 0, 25, 50
+        assert clock.now == 60
+
+    def test_connection_limit_and_release(self):
+        """Test: passat el límit es rebutja; tancar allibera la plaça encara que no s'hagi llegit"""
+        clock = FakeClock()
+        registry = make_registry(clock, max_connections=2)
+        first = registry.open(lambda: None, interval=10)
+        second = registry.open(lambda: None, interval=10)
+
+        with pytest.raises(StreamLimitExceeded):
+            registry.open(lambda: None, interval=10)
+        assert metrics.STREAM_CONNECTIONS._value.get() == 2
+
+        first.close()
+        first.close()
+        assert registry.active == 1
+        registry.open(lambda: None, interval=10).close()
+        second.close()
+        assert registry.active == 0
@@ -0,0 +1,176 @@
+"""
+Tests unitaris per la cache de feeds
+"""
+import time
+from api import metrics
+from api.feed_cache import FeedCache, approximate_size
+
+
+def counter_value(counter, **labels):
+    """Valor actual d'un comptador Prometheus"""
+    return counter.labels(**labels)._value.get()
+
+
+class TestFeedCache:
+    """Tests per la classe FeedCache"""
+
+    def test_get_returns_stored_value(self):
+        """Test: un valor desat es pot recuperar"""
+        cache = FeedCache(ttl=60, max_entries=10)
+        cache.set(('es', 'events', 2, 16), ['event'])
+
+        assert cache.get(('es', 'events', 2, 16)) == ['event']
+        assert cache.get(('en', 'events', 2, 16)) is None
+
+    def test_entries_expire_after_ttl(self):
+        """Test: les entrades caducades no es retornen"""
+        cache = FeedCache(ttl=0.01, max_entries=10)
+        cache.set('key', 'value')
+        time.sleep(0.02)
+
+        assert cache.get('key') is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_is_evicted(self):
+        """Test: en superar el límit s'expulsa l'entrada menys usada"""
+        cache = FeedCache(ttl=60, max_entries=2)
+        evictions = counter_value(metrics.CACHE_EVICTIONS, cache='feeds', reason='capacity')
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.peek('a') == 1
+        assert cache.peek('b') is None
+        assert cache.peek('c') == 3
+        evicted = counter_value(metrics.CACHE_EVICTIONS, cache='feeds', reason='capacity')
+        assert evicted == evictions + 1
+
+    def test_hits_and_misses_are_counted(self):
+        """Test: get actualitza els comptadors de hit/miss"""
+        cache = FeedCache(ttl=60, max_entries=10)
+        hits = counter_value(metrics.CACHE_REQUESTS, cache='feeds', result='hit')
+        misses = counter_value(metrics.CACHE_REQUESTS, cache='feeds', result='miss')
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+
+        assert counter_value(metrics.CACHE_REQUESTS, cache='feeds', result='hit') == hits + 1
+        assert counter_value(metrics.CACHE_REQUESTS, cache='feeds', result='miss') == misses + 1
+
+    def test_per_entry_ttl(self):
+        """Test: una entrada pot tenir el seu propi TTL"""
+        cache = FeedCache(ttl=60, max_entries=10)
+        cache.set('short', 1, ttl=0.01)
+        cache.set('default', 2)
+        time.sleep(0.02)
+
+        assert cache.get('short') is None
+        assert cache.get('default') == 2
+        assert 59 < cache.remaining_ttl('default') <= 60
+
+    def test_zero_ttl_disables_cache(self):
+        """Test: amb TTL 0 no es desa res"""
+        cache = FeedCache(ttl=0, max_entries=10)
+        cache.set('a', 1)
+
+        assert not cache.enabled
+        assert cache.peek('a') is None
+
+
+class TestFeedCacheMemoryBudget:
+    """Tests pel pressupost de memòria de FeedCache"""
+
+    def test_approximate_size_counts_nested_values_once(self):
+        """Test: la mida inclou el contingut i no compta dues vegades un objecte compartit"""
+        text = 'x' * 1000
+        assert approximate_size([text]) > 1000
+        assert approximate_size([text, text]) < 2 * approximate_size([text])
+
+    def test_total_bytes_tracks_entries(self):
+        """Test: la mida total se suma en desar i es resta en substituir o buidar"""
+        cache = FeedCache(ttl=60, max_entries=10, sizeof=len)
+        cache.set('a', 'x' * 100)
+        cache.set('b', 'x' * 50)
+        cache.set('a', 'x' * 10)
+
+        assert cache.total_bytes == 60
+        cache.clear()
+        assert cache.total_bytes == 0
+
+    def test_large_cold_entries_are_evicted_first(self):
+        """Test: en superar el pressupost surt l'entrada gran i poc consultada"""
+        cache = FeedCache(ttl=60, max_entries=10, max_bytes=1000, sizeof=len)
+        cache.set('big', 'x' * 600)
+        cache.set('small', 'x' * 100)
+        cache.get('small')
+        cache.set('new', 'x' * 400)
+
+        assert cache.peek('big') is None
+        assert cache.peek('small') is not None
+        assert cache.peek('new') is not None
+        assert cache.total_bytes <= 1000
+
+    def test_frequently_used_entry_survives(self):
+        """Test: a igual mida, es conserva l'entrada amb més encerts"""
+        cache = FeedCache(ttl=60, max_entries=10, max_bytes=250, sizeof=len)
+        cache.set('hot', 'x' * 100)
+        cache.set('cold', 'x' * 100)
+        for _ in range(5):
+            cache.get('hot')
+        cache.get('cold')
+        cache.set('new', 'x' * 100)
+
+        assert cache.peek('hot') is not None
+        assert cache.peek('cold') is None
+
+    def test_resize_accounts_growth_and_evicts(self):
+        """Test: si un valor creix després de desar-lo, es compta i s'expulsen altres entrades"""
+        cache = FeedCache(ttl=60, max_entries=10, max_bytes=1000, sizeof=len)
+        value = 'x' * 400
+        cache.set('old', 'x' * 400)
+        cache.set('feed', value)
+
+        cache.resize('feed', value, 300)
+
+        assert cache.total_bytes == 700
+        assert cache.peek('old') is None
+        assert cache.peek('feed') is value
+
+    def test_resize_ignores_replaced_value(self):
+        """Test: un valor que ja no és a la cache (refrescat) no altera el compte"""
+        cache = FeedCache(ttl=60, max_entries=10, sizeof=len)
+        stale = 'x' * 10
+        cache.set('feed', stale)
+        cache.set('feed', 'y' * 10)
+
+        cache.resize('feed', stale, 500)
+
+        assert cache.total_bytes == 10
+
+    def test_entry_larger_than_budget_is_kept_alone(self):
+        """Test: una sola entrada més gran que el pressupost no es descarta"""
+        cache = FeedCache(ttl=60, max_entries=10, max_bytes=10, sizeof=len)
+        cache.set('a', 'x' * 5)
+        cache.set('b', 'x' * 50)
+
+        assert cache.peek('a') is None
+        assert cache.peek('b') is not None
+
+    def test_stats_lists_resident_entries(self):
+        """Test: stats retorna mida, edat, TTL i encerts per entrada, de més gran a més petita"""
+        cache = FeedCache(ttl=60, max_entries=10, max_bytes=1000, sizeof=len)
+        cache.set(('es', 'events', 2, 16), 'x' * 20)
+        cache.set(('ca', 'events', 2, 16), 'x' * 200)
+        cache.get(('es', 'events', 2, 16))
+
+        stats = cache.stats()
+
+        assert stats['name'] == 'feeds'
+        assert stats['entries'] == 2
+        assert stats['bytes'] == 220
+        assert stats['maxBytes'] == 1000
+        assert [item['key'] for item in stats['items']] == ['ca:events:2:16', 'es:events:2:16']
+        assert stats['items'][1]['hits'] == 1
+        assert 0 < stats['items'][0]['ttlSeconds'] <= 60
+        assert stats['items'][0]['ageSeconds'] >= 0
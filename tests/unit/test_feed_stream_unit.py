@@ -0,0 +1,102 @@
+"""
+Tests unitaris per la lectura incremental dels feeds
+"""
+import json
+import pytest
+from api.feed_stream import parse_feed, project_event
+
+
+def chunked(data: bytes, size: int):
+    """Trossos de `size` bytes (pot tallar caràcters UTF-8 i números)"""
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+FEED = {
+    'events': [
+        {
+            'year': 1714,
+            'text': 'Setge de Barcelona: capitulació de la ciutat',
+            'pages': [{
+                'title': 'Setge_de_Barcelona',
+                'extract': 'El setge de Barcelona… ' * 20,
+                'extract_html': '<p>' + 'html ' * 200 + '</p>',
+                'description': 'setge de la Guerra de Successió',
+                'revision': '123456789',
+                'thumbnail': {'source': 'https://upload.wikimedia.org/a.jpg', 'width': 320},
+                'originalimage': {'source': 'https://upload.wikimedia.org/big.jpg'},
+                'content_urls': {
+                    'desktop': {'page': 'https://ca.wikipedia.org/wiki/Setge_de_Barcelona'},
+                    'mobile': {'page': 'https://ca.m.wikipedia.org/wiki/Setge_de_Barcelona'}
+                }
+            }]
+        },
+        {'year': -44, 'text': 'Assassinat de Juli Cèsar', 'pages': []},
+        {'year': 2001, 'text': 'Sense pàgines'}
+    ]
+}
+
+
+class TestParseFeed:
+    """Tests per parse_feed"""
+
+    @pytest.mark.parametrize('chunk_size', [1, 3, 7, 64, 65536])
+    def test_matches_full_parse_for_any_chunking(self, chunk_size):
+        """Test: el resultat no depèn de com arribin els trossos"""
+        body = json.dumps(FEED, ensure_ascii=False, indent=1).encode()
+
+        result = parse_feed(chunked(body, chunk_size))
+
+        assert result == {'events': [project_event(event) for event in FEED['events']]}
+
+    def test_unused_fields_are_dropped(self):
+        """Test: només es conserven els camps que fa servir l'aplicació"""
+        result = parse_feed([json.dumps(FEED).encode()])
+        page = result['events'][0]['pages'][0]
+
+        assert set(page) == {'title', 'extract', 'description', 'revision',
+                             'thumbnail', 'content_urls'}
+        assert page['thumbnail'] == {'source': 'https://upload.wikimedia.org/a.jpg'}
+        assert page['content_urls'] == {
+            'desktop': {'page': 'https://ca.wikipedia.org/wiki/Setge_de_Barcelona'}}
+        assert result['events'][2]['pages'] == []
+
+    def test_other_keys_and_split_numbers_are_kept(self):
+        """Test: les claus que no són llistes es conserven, també números tallats"""
+        body = b'{"count": 123456, "events": [], "ok": true, "ratio": 1.5e-7}'
+
+        for size in (2, 3, 5):
+            assert parse_feed(chunked(body, size)) == {
+                'count': 123456, 'events': [], 'ok': True, 'ratio': 1.5e-7}
+
+    @pytest.mark.parametrize('body', [b'', b'[]', b'{"events": [{"year": 1}', b'{"events": [1 2]}'])
+    def test_invalid_json_raises_value_error(self, body):
+        """Test: un cos buit, truncat o mal format és un ValueError"""
+        with pytest.raises(ValueError):
+            parse_feed(chunked(body, 4))
+
+    @pytest.mark.parametrize('body', [b'{"a": 1}x', b'{}{}', b'{"events": []} [1]'])
+    def test_trailing_data_raises_value_error(self, body):
+        """Test: després de l'objecte arrel només s'accepten espais"""
+        with pytest.raises(ValueError):
+            parse_feed(chunked(body, 3))
+
+    def test_trailing_whitespace_is_accepted(self):
+        """Test: els espais i salts de línia finals no són un error"""
+        assert parse_feed(chunked(b'{"events": []}\n \r\n', 3)) == {'events': []}
+
+    @pytest.mark.parametrize('first', [
+        b'{"events": [{"year": 1,, "text": "x"}, ',
+        b'{"events": []} trailing ',
+    ])
+    def test_stops_reading_at_first_invalid_chunk(self, first):
+        """Test: un error es detecta al tros on apareix, sense llegir la resta del cos"""
+        consumed = []
+
+        def chunks():
+            for chunk in [first] + [b'{"year": 2}, '] * 1000 + [b']}']:
+                consumed.append(chunk)
+                yield chunk
+
+        with pytest.raises(ValueError):
+            parse_feed(chunks())
+        assert len(consumed) <= 2
@@ -0,0 +1,68 @@
+"""
+Tests unitaris pels camps parcials i el retall de textos
+"""
+import pytest
+from api.fieldsets import (
+    DETAILS_FIELDS, SUMMARY_FIELDS, parse_fields, parse_max_length, select_fields,
+    trim_details, truncate_text
+)
+
+
+class TestParseFields:
+    """Tests per parse_fields"""
+
+    def test_fields_are_returned_in_canonical_order(self):
+        """Test: l'ordre de la query no importa (mateixa variant)"""
+        assert parse_fields('text, year', SUMMARY_FIELDS) == ('year', 'text')
+        assert parse_fields('year,text', SUMMARY_FIELDS) == ('year', 'text')
+
+    @pytest.mark.parametrize('value', [None, '', ' , '])
+    def test_empty_means_all(self, value):
+        """Test: sense camps es retornen tots"""
+        assert parse_fields(value, DETAILS_FIELDS) is None
+
+    def test_unknown_field_raises(self):
+        """Test: un camp desconegut és un error"""
+        with pytest.raises(ValueError):
+            parse_fields('year,pages', SUMMARY_FIELDS)
+
+    @pytest.mark.parametrize('value,expected', [(None, None), ('', None), ('120', 120)])
+    def test_parse_max_length(self, value, expected):
+        """Test: longitud màxima buida o enter positiu"""
+        assert parse_max_length(value) == expected
+
+    @pytest.mark.parametrize('value', ['0', '-5', 'abc'])
+    def test_parse_max_length_invalid(self, value):
+        """Test: zero, negatius o no numèrics són un error"""
+        with pytest.raises(ValueError):
+            parse_max_length(value)
+
+
+class TestTrimming:
+    """Tests per select_fields i el retall de textos"""
+
+    def test_select_fields(self):
+        """Test: només es conserven els camps demanats que existeixen"""
+        data = {'year': 1, 'text': 'a', 'links': []}
+
+        assert select_fields(data, ('year', 'thumbnail')) == {'year': 1}
+        assert select_fields(data, None) is data
+
+    def test_truncate_text_at_word_boundary(self):
+        """Test: es talla pel darrer espai i s'afegeix '…' sense passar del límit"""
+        text = 'La batalla de Lepant va ser una gran batalla naval'
+
+        assert truncate_text(text, 20) == 'La batalla de…'
+        assert truncate_text(text, 100) == text
+        assert truncate_text(text, None) == text
+
+    def test_trim_details_cuts_description_and_related(self):
+        """Test: es retallen la descripció i els extractes de related, sense modificar l'original"""
+        details = {'description': 'x ' * 100, 'related': [{'title': 'A', 'extract': 'y ' * 100}]}
+
+        trimmed = trim_details(details, 30)
+
+        assert len(trimmed['description']) <= 30
+        assert len(trimmed['related'][0]['extract']) <= 30
+        assert trimmed['related'][0]['title'] == 'A'
+        assert len(details['description']) == 200
@@ -0,0 +1,150 @@
+"""
+Tests unitaris pel proxy de miniatures
+"""
+from io import BytesIO
+import hashlib
+import os
+import pytest
+import responses
+from PIL import Image
+from api import image_proxy
+from api.image_proxy import ImageNotFound, ImageProxy, InvalidImage
+
+SOURCE_URL = 'https://upload.wikimedia.org/wikipedia/commons/thumb/a/ab/Colon.jpg/640px-Colon.jpg'
+
+
+def jpeg_bytes(width=640, height=480):
+    """Imatge JPEG de prova"""
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (120, 80, 40)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def token_for(proxy, url=SOURCE_URL):
+    return proxy.url_for(url)['src'].split('/')[2].split('?')[0]
+
+
+def cached_path(directory, url, width):
+    digest = hashlib.sha256(url.encode()).hexdigest()[:24]
+    return os.path.join(str(directory), f'{digest}-{width}.webp')
+
+
+@pytest.fixture
+def proxy(tmp_path):
+    return ImageProxy(str(tmp_path), max_bytes=10 * 1024 * 1024, widths=(160, 320))
+
+
+class TestImageProxy:
+    """Tests per la classe ImageProxy"""
+
+    def test_url_for_returns_src_and_srcset(self, proxy):
+        """Test: les URLs del proxy inclouen totes les amplades"""
+        urls = proxy.url_for(SOURCE_URL)
+
+        assert urls['src'].startswith('/img/') and urls['src'].endswith('?w=320')
+        assert urls['srcset'].count('/img/') == 2
+        assert '160w' in urls['srcset'] and '320w' in urls['srcset']
+
+    def test_url_for_rejects_other_hosts(self, proxy):
+        """Test: només es fa de proxy d'imatges dels hosts permesos"""
+        assert proxy.url_for('https://example.com/image.jpg') is None
+        assert proxy.url_for('http://upload.wikimedia.org/image.jpg') is None
+
+    @responses.activate
+    def test_get_resizes_to_webp_and_fetches_once(self, proxy):
+        """Test: l'original es descarrega un sol cop i se'n generen totes les amplades"""
+        responses.add(responses.GET, SOURCE_URL, body=jpeg_bytes(), status=200)
+        token = token_for(proxy)
+
+        small = proxy.get(token, 100)
+        large = proxy.get(token, 320)
+
+        responses.assert_call_count(SOURCE_URL, 1)
+        with Image.open(small) as image:
+            assert image.format == 'WEBP'
+            assert image.size == (160, 120)
+        with Image.open(large) as image:
+            assert image.width == 320
+
+    @responses.activate
+    def test_get_never_upscales(self, proxy):
+        """Test: una imatge més petita que l'amplada demanada no s'amplia"""
+        small_url = SOURCE_URL.replace('640px', '100px')
+        responses.add(responses.GET, small_url, body=jpeg_bytes(100, 50), status=200)
+        token = token_for(proxy, small_url)
+
+        with Image.open(proxy.get(token, 320)) as image:
+            assert image.size == (100, 50)
+
+    def test_url_for_does_not_touch_disk(self, tmp_path):
+        """Test: generar les URLs no crea cap fitxer (ni el directori de la cache)"""
+        proxy = ImageProxy(str(tmp_path / 'cache'), max_bytes=1024)
+
+        proxy.url_for(SOURCE_URL)
+
+        assert not (tmp_path / 'cache').exists()
+
+    def test_get_rejects_forged_tokens(self, proxy):
+        """Test: un token sense signatura vàlida retorna ImageNotFound"""
+        forged = ImageProxy(proxy.cache_dir, max_bytes=1024, secret_key='una altra clau')
+        with pytest.raises(ImageNotFound):
+            proxy.get(token_for(forged))
+        with pytest.raises(ImageNotFound):
+            proxy.get('../etc/passwd')
+
+    def test_get_rejects_hosts_no_longer_allowed(self, proxy):
+        """Test: un token signat per un host que ja no és permès retorna ImageNotFound"""
+        token = token_for(proxy)
+        proxy.allowed_hosts = frozenset()
+        with pytest.raises(ImageNotFound):
+            proxy.get(token)
+
+    def test_locks_are_bounded(self, proxy):
+        """Test: el nombre de locks és fix encara que es demanin moltes imatges"""
+        keys = (hashlib.sha256(str(i).encode()).hexdigest() for i in range(1000))
+        locks = {id(proxy._lock_for(key)) for key in keys}
+        assert len(locks) == ImageProxy.LOCK_STRIPES
+
+    def test_requires_pillow(self, tmp_path, monkeypatch):
+        """Test: sense Pillow el proxy falla en construir-se, no en servir"""
+        monkeypatch.setattr(image_proxy, 'Image', None)
+        with pytest.raises(RuntimeError):
+            ImageProxy(str(tmp_path), max_bytes=1024)
+
+    @responses.activate
+    @pytest.mark.parametrize('body', [b'<html>Error 503</html>', jpeg_bytes()[:200]])
+    def test_get_rejects_non_images(self, proxy, body):
+        """Test: una pàgina d'error o un JPEG truncat donen InvalidImage i no es desa res"""
+        responses.add(responses.GET, SOURCE_URL, body=body, status=200)
+        token = token_for(proxy)
+
+        with pytest.raises(InvalidImage):
+            proxy.get(token, 160)
+        assert not os.path.exists(cached_path(proxy.cache_dir, SOURCE_URL, 160))
+
+    @responses.activate
+    @pytest.mark.parametrize('declared', [True, False])
+    def test_get_rejects_oversized_originals(self, tmp_path, declared):
+        """Test: un original més gran que el límit es talla sense arribar a Pillow"""
+        proxy = ImageProxy(str(tmp_path), max_bytes=1024 * 1024, max_download_bytes=1000)
+        body = jpeg_bytes()
+        responses.add(responses.GET, SOURCE_URL, body=body, status=200,
+                      auto_calculate_content_length=declared)
+
+        with pytest.raises(InvalidImage):
+            proxy.get(token_for(proxy), 160)
+        assert len(body) > 1000
+        assert not os.path.exists(cached_path(tmp_path, SOURCE_URL, 160))
+
+    @responses.activate
+    def test_cache_is_bounded_by_size(self, tmp_path):
+        """Test: en superar el límit s'esborren els fitxers menys usats"""
+        proxy = ImageProxy(str(tmp_path), max_bytes=1, widths=(160, 320))
+        responses.add(responses.GET, SOURCE_URL, body=jpeg_bytes(), status=200)
+        token = token_for(proxy)
+
+        path = proxy.get(token, 160)
+
+        # El fitxer que es serveix es manté; l'altra amplada s'esborra
+        assert os.path.exists(path)
+        assert not os.path.exists(cached_path(tmp_path, SOURCE_URL, 320))
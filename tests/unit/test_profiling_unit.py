@@ -0,0 +1,66 @@
+"""
+Tests unitaris per Server-Timing i el profiler per petició
+"""
+import os
+from api.profiling import RequestProfiler, ServerTiming
+
+
+class TestServerTiming:
+    """Tests per la classe ServerTiming"""
+
+    def test_phases_are_recorded_in_order(self):
+        """Test: cada fase apareix a la capçalera amb la seva durada"""
+        timing = ServerTiming()
+        with timing.phase('fetch'):
+            pass
+        with timing.phase('encode'):
+            pass
+
+        header = timing.header_value(total_ms=3.14159)
+
+        assert header.startswith('fetch;dur=')
+        assert ', encode;dur=' in header
+        assert header.endswith('total;dur=3.1')
+
+    def test_phase_is_recorded_on_exception(self):
+        """Test: la fase es registra encara que el bloc falli"""
+        timing = ServerTiming()
+        try:
+            with timing.phase('fetch'):
+                raise ValueError()
+        except ValueError:
+            pass
+
+        assert [name for name, _ in timing.phases] == ['fetch']
+
+
+class TestRequestProfiler:
+    """Tests per la classe RequestProfiler"""
+
+    def test_token_validation(self, tmp_path):
+        """Test: només s'accepten tokens signats amb la clau correcta"""
+        profiler = RequestProfiler(str(tmp_path), 'secret')
+        other = RequestProfiler(str(tmp_path), 'other-secret')
+
+        assert profiler.is_valid_token(profiler.make_token())
+        assert not profiler.is_valid_token(other.make_token())
+        assert not profiler.is_valid_token('garbage')
+        assert not profiler.is_valid_token(None)
+
+    def test_not_started_without_sampling_or_token(self, tmp_path):
+        """Test: amb sample_rate 0 no es perfila cap petició no forçada"""
+        profiler = RequestProfiler(str(tmp_path), 'secret', sample_rate=0)
+
+        assert profiler.start() is None
+
+    def test_only_slow_requests_are_dumped(self, tmp_path):
+        """Test: els perfils de peticions ràpides es descarten"""
+        profiler = RequestProfiler(str(tmp_path), 'secret', sample_rate=1, slow_ms=100)
+
+        fast = profiler.start()
+        assert profiler.finish(fast, '/api/ephemeris/details', 5) is None
+
+        slow = profiler.start()
+        path = profiler.finish(slow, '/api/ephemeris/details', 250)
+        assert os.path.basename(path).endswith('-api_ephemeris_details-250ms.prof')
+        assert os.path.exists(path)
@@ -0,0 +1,126 @@
+"""
+Tests unitaris per la limitació de peticions a Wikipedia
+"""
+import threading
+import time
+import pytest
+import responses
+from api.rate_limit import TokenBucket, UpstreamLimiter, UpstreamOverloadedError
+from api.wikipedia_client import WikipediaClient
+from config import Config
+
+
+class TestTokenBucket:
+    """Tests pel token bucket"""
+
+    def test_burst_is_served_without_waiting(self):
+        """Test: les peticions dins de la ràfega no esperen"""
+        bucket = TokenBucket(rate=1, capacity=3)
+        deadline = time.monotonic() + 1
+
+        assert [bucket.reserve(deadline) for _ in range(3)] == [0, 0, 0]
+
+    def test_reserve_sheds_when_deadline_cannot_be_met(self):
+        """Test: si el token arribaria tard, es descarta amb Retry-After"""
+        bucket = TokenBucket(rate=1, capacity=1)
+        bucket.reserve(time.monotonic())
+
+        with pytest.raises(UpstreamOverloadedError) as exc_info:
+            bucket.reserve(time.monotonic() + 0.1)
+
+        assert exc_info.value.retry_after == pytest.approx(1, abs=0.05)
+        assert exc_info.value.retry_after_header == '1'
+
+    def test_penalize_blocks_new_requests(self):
+        """Test: després d'un 429 no es fan peticions fins que passa el temps"""
+        bucket = TokenBucket(rate=10, capacity=10)
+        bucket.penalize(5)
+
+        with pytest.raises(UpstreamOverloadedError):
+            bucket.reserve(time.monotonic() + 1)
+
+    def test_refund_returns_token_up_to_capacity(self):
+        """Test: un token retornat es pot tornar a reservar, sense passar de la capacitat"""
+        bucket = TokenBucket(rate=0.001, capacity=1)
+        bucket.reserve(time.monotonic())
+        bucket.refund()
+        bucket.refund()
+
+        assert bucket.reserve(time.monotonic()) == 0
+        with pytest.raises(UpstreamOverloadedError):
+            bucket.reserve(time.monotonic())
+
+
+class TestUpstreamLimiter:
+    """Tests pel limitador de concurrència"""
+
+    def test_concurrency_limit_sheds_after_timeout(self):
+        """Test: si tots els slots estan ocupats, es descarta dins del termini"""
+        limiter = UpstreamLimiter(rate=100, burst=100, max_concurrency=1, queue_timeout=0.05)
+        entered = threading.Event()
+        release = threading.Event()
+
+        def hold_slot():
+            with limiter.slot():
+                entered.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold_slot)
+        holder.start()
+        entered.wait()
+
+        start = time.monotonic()
+        with pytest.raises(UpstreamOverloadedError):
+            with limiter.slot():
+                pass
+        assert time.monotonic() - start < 0.5
+        assert limiter.in_flight == 1
+        assert limiter.waiting == 0
+
+        release.set()
+        holder.join()
+        assert limiter.in_flight == 0
+
+    def test_shed_request_refunds_its_token(self):
+        """Test: una petició descartada per concurrència no gasta token"""
+        limiter = UpstreamLimiter(rate=0.001, burst=2, max_concurrency=1, queue_timeout=0.05)
+        entered = threading.Event()
+        release = threading.Event()
+
+        def hold_slot():
+            with limiter.slot():
+                entered.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold_slot)
+        holder.start()
+        entered.wait()
+        with pytest.raises(UpstreamOverloadedError):
+            with limiter.slot():
+                pass
+        release.set()
+        holder.join()
+
+        # Sense la devolució el bucket estaria buit i aquesta també es descartaria
+        with limiter.slot():
+            pass
+
+
+class TestWikipediaClientRateLimit:
+    """Tests de la integració del limitador al client"""
+
+    @responses.activate
+    def test_upstream_429_raises_overloaded(self):
+        """Test: un 429 de Wikipedia es converteix en UpstreamOverloadedError"""
+        responses.add(
+            responses.GET,
+            'https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/02/16',
+            status=429,
+            headers={'Retry-After': '7'}
+        )
+        client = WikipediaClient(Config.WIKIPEDIA_API_BASE)
+
+        with pytest.raises(UpstreamOverloadedError) as exc_info:
+            client.get_events(2, 16, 'es')
+
+        assert exc_info.value.retry_after == 7
@@ -0,0 +1,52 @@
+"""
+Tests unitaris per la traça de peticions
+"""
+import json
+import logging
+
+from api.request_trace import TraceFormatter, load_trace, trace_entry
+
+
+class TestTraceEntry:
+    """Tests per trace_entry i TraceFormatter"""
+
+    def test_entry_is_compact(self):
+        """Test: claus curtes, temps arrodonits i `n` només als batch"""
+        entry = trace_entry(1760870400.12345, '/api/ephemeris/today', 'ca', '10-19', 200, 0.00412)
+
+        assert entry == {'t': 1760870400.123, 'r': '/api/ephemeris/today', 'l': 'ca',
+                         'd': '10-19', 's': 200, 'ms': 4.1}
+        batch = trace_entry(0, '/api/ephemeris/details:batch', 'en', '10-19', 200, 0, items=5)
+        assert batch['n'] == 5
+
+    def test_formatter_writes_only_the_fields(self):
+        """Test: la línia no porta nivell, logger ni missatge"""
+        record = logging.LogRecord('ephemerides.trace', logging.INFO, __file__, 1, 'request',
+                                   None, None)
+        record.fields = {'t': 1.0, 'r': '/api/ephemeris/feed'}
+
+        assert TraceFormatter().format(record) == '{"t":1.0,"r":"/api/ephemeris/feed"}'
+
+
+class TestLoadTrace:
+    """Tests per load_trace"""
+
+    def test_merges_files_in_time_order_and_skips_bad_lines(self, tmp_path):
+        """Test: les traces de diversos workers s'ordenen i es descarten línies trencades"""
+        first = tmp_path / 'trace-1.jsonl'
+        second = tmp_path / 'trace-2.jsonl'
+        first.write_text('\n'.join([
+            json.dumps({'t': 3, 'r': '/api/ephemeris/today'}),
+            json.dumps({'t': 1, 'r': '/api/ephemeris/details'}),
+            json.dumps({'t': 2, 'r': '/health'}),
+            '{"t": 4, "r": "/api/eph',
+        ]))
+        second.write_text(json.dumps({'t': 2, 'r': '/api/translations/<lang>'}) + '\n')
+
+        entries = load_trace([str(first), str(second)])
+
+        assert [(e['t'], e['r']) for e in entries] == [
+            (1, '/api/ephemeris/details'),
+            (2, '/api/translations/<lang>'),
+            (3, '/api/ephemeris/today'),
+        ]
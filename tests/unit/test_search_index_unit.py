@@ -0,0 +1,72 @@
+"""
+Tests unitaris per l'índex de cerca
+"""
+from api.search_index import SearchIndex, fold, tokenize
+
+
+class TestTokenize:
+    """Tests pel plegat i la tokenització"""
+
+    def test_fold_removes_accents_and_case(self):
+        """Test: accents i majúscules no afecten la cerca"""
+        assert fold('Revolución FRANCESA à') == 'revolucion francesa a'
+
+    def test_catalan_middle_dot_keeps_word(self):
+        """Test: 'col·legi' és una sola paraula"""
+        assert tokenize('El col·legi de Vic') == ['collegi', 'vic']
+
+    def test_stopwords_are_removed(self):
+        """Test: les paraules buides no s'indexen"""
+        assert tokenize('The battle of the Ebre') == ['battle', 'ebre']
+
+
+class TestSearchIndex:
+    """Tests per la classe SearchIndex"""
+
+    def build_index(self):
+        index = SearchIndex()
+        index.add_feed('es', 7, 14, [
+            {'year': 1789, 'text': 'Toma de la Bastilla: comienza la Revolución francesa',
+             'pages': [{'title': 'Revolución_francesa'}]},
+            {'year': 1790, 'text': 'Fiesta de la Federación en París', 'pages': []},
+        ])
+        index.add_feed('es', 11, 9, [
+            {'year': 1989, 'text': 'Cae el muro de Berlín, revolución pacífica', 'pages': []},
+        ])
+        return index
+
+    def test_search_across_days_ranked_by_frequency(self):
+        """Test: la cerca troba events de diversos dies ordenats per freqüència"""
+        total, results = self.build_index().search('revolucion', 'es')
+
+        assert total == 2
+        assert [r['year'] for r in results] == [1789, 1989]
+        assert results[0]['month'] == 7 and results[0]['day'] == 14
+        assert results[0]['hasDetails'] is True
+
+    def test_all_terms_must_match(self):
+        """Test: tots els termes de la consulta han d'aparèixer"""
+        total, results = self.build_index().search('revolución berlín', 'es')
+
+        assert total == 1
+        assert results[0]['year'] == 1989
+
+    def test_reindexing_a_day_replaces_its_events(self):
+        """Test: tornar a carregar un dia substitueix els seus documents"""
+        index = self.build_index()
+        index.add_feed('es', 7, 14, [{'year': 1902, 'text': 'Otro evento', 'pages': []}])
+
+        assert index.search('bastilla', 'es') == (0, [])
+        assert index.search('revolucion', 'es')[0] == 1
+        assert index.indexed_days('es') == 2
+
+    def test_languages_are_independent(self):
+        """Test: cada idioma té el seu índex"""
+        assert self.build_index().search('revolucion', 'en') == (0, [])
+
+    def test_limit(self):
+        """Test: el límit talla els resultats però no el total"""
+        total, results = self.build_index().search('revolucion', 'es', limit=1)
+
+        assert total == 2
+        assert len(results) == 1
@@ -0,0 +1,243 @@
+"""
+Tests unitaris pels logs estructurats
+"""
+import io
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from api import metrics
+from api.structured_logging import (
+    DeduplicateFilter, JsonFormatter, LogPipeline, NativeQueue, NonBlockingQueueHandler,
+    sample_access
+)
+
+
+def make_record(message='Wikipedia no respon', level=logging.ERROR, name='app', args=None, **extra):
+    record = logging.LogRecord(name, level, __file__, 1, message, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def dropped(reason):
+    return metrics.LOG_RECORDS_DROPPED.labels(reason=reason)._value.get()
+
+
+class TestJsonFormatter:
+    """Tests per JsonFormatter"""
+
+    def test_formats_one_json_line_with_extra_fields(self):
+        """Test: els camps de `fields` van al primer nivell"""
+        line = JsonFormatter().format(make_record('GET %s', logging.INFO, args=('/health',),
+                                                  fields={'status': 200}))
+
+        entry = json.loads(line)
+        assert '\n' not in line
+        assert entry['level'] == 'info'
+        assert entry['logger'] == 'app'
+        assert entry['message'] == 'GET /health'
+        assert entry['status'] == 200
+        assert 'suppressed' not in entry
+
+    def test_includes_exception_traceback(self):
+        """Test: la traça de l'excepció s'inclou com a text"""
+        try:
+            raise ValueError('feed trencat')
+        except ValueError:
+            record = make_record(exc_info=sys.exc_info())
+
+        entry = json.loads(JsonFormatter().format(record))
+        assert 'ValueError: feed trencat' in entry['exception']
+
+
+class TestDeduplicateFilter:
+    """Tests per DeduplicateFilter"""
+
+    def test_drops_repeated_errors_within_window(self):
+        """Test: el mateix error només passa un cop per finestra i es compta el descart"""
+        dedup = DeduplicateFilter(window=60)
+        before = dropped('duplicate')
+
+        results = [dedup.filter(make_record()) for _ in range(5)]
+
+        assert results == [True, False, False, False, False]
+        assert dropped('duplicate') - before == 4
+        assert dedup.filter(make_record('Un altre error'))
+
+    def test_reports_suppressed_count_after_window(self, monkeypatch):
+        """Test: passada la finestra, el registre porta el nombre de repeticions descartades"""
+        now = [1000.0]
+        monkeypatch.setattr('api.structured_logging.time.monotonic', lambda: now[0])
+        dedup = DeduplicateFilter(window=60)
+        dedup.filter(make_record())
+        dedup.filter(make_record())
+        dedup.filter(make_record())
+
+        now[0] += 61
+        record = make_record()
+
+        assert dedup.filter(record)
+        assert record.suppressed == 2
+
+    def test_info_records_are_never_deduplicated(self):
+        """Test: per sota de WARNING no es descarta res"""
+        dedup = DeduplicateFilter(window=60)
+        assert all(dedup.filter(make_record(level=logging.INFO)) for _ in range(3))
+
+    def test_forgets_oldest_messages_beyond_max_keys(self):
+        """Test: la memòria de missatges vistos està acotada"""
+        dedup = DeduplicateFilter(window=60, max_keys=2)
+        for i in range(3):
+            dedup.filter(make_record(f'error {i}'))
+
+        assert dedup.filter(make_record('error 0'))
+
+
+class TestNonBlockingQueueHandler:
+    """Tests per NonBlockingQueueHandler"""
+
+    def test_drops_records_when_queue_is_full(self):
+        """Test: amb la cua plena el registre es descarta sense bloquejar"""
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        before = dropped('queue_full')
+
+        handler.handle(make_record('primer'))
+        handler.handle(make_record('segon'))
+
+        assert handler.queue.qsize() == 1
+        assert handler.queue.get_nowait().msg == 'primer'
+        assert dropped('queue_full') - before == 1
+
+    def test_keeps_exception_for_background_formatting(self):
+        """Test: el missatge s'interpola però la traça es formata al fil de fons"""
+        handler = NonBlockingQueueHandler(queue.Queue())
+        try:
+            raise ValueError('x')
+        except ValueError:
+            handler.handle(make_record('error %d', args=(3,), exc_info=sys.exc_info()))
+
+        record = handler.queue.get_nowait()
+        assert record.msg == 'error 3'
+        assert record.args is None
+        assert record.exc_info is not None
+
+
+class TestSampleAccess:
+    """Tests per sample_access"""
+
+    def test_errors_are_always_logged(self):
+        assert sample_access(500, 0) and sample_access(404, 0)
+
+    def test_successes_follow_rate(self):
+        assert not sample_access(200, 0)
+        assert sample_access(200, 1)
+
+
+class TestLogPipeline:
+    """Tests per LogPipeline"""
+
+    def test_attached_logger_writes_json_through_background_thread(self):
+        """Test: el logger escriu a través de la cua i stop() ho buida tot"""
+        stream = io.StringIO()
+        pipeline = LogPipeline(stream=stream).start()
+        logger = logging.getLogger('test.structured_logging')
+        pipeline.attach(logger, 'INFO')
+
+        logger.info('request', extra={'fields': {'route': '/health', 'status': 200}})
+        logger.debug('no surt')
+        pipeline.stop()
+
+        lines = stream.getvalue().splitlines()
+        assert len(lines) == 1
+        entry = json.loads(lines[0])
+        assert entry['route'] == '/health'
+        assert logger.handlers == [pipeline.handler]
+        assert logger.propagate is False
+
+
+class TestNativeQueue:
+    """Tests per NativeQueue"""
+
+    def test_is_bounded_and_fifo(self):
+        """Test: respecta l'ordre i maxsize"""
+        items = NativeQueue(maxsize=2)
+        items.put_nowait(1)
+        items.put_nowait(2)
+
+        with pytest.raises(queue.Full):
+            items.put_nowait(3)
+        assert [items.get(), items.get_nowait()] == [1, 2]
+        with pytest.raises(queue.Empty):
+            items.get_nowait()
+
+    def test_get_waits_for_put_from_another_thread(self):
+        """Test: el fil lector es desperta quan arriba un element"""
+        items = NativeQueue()
+        received = []
+        reader = threading.Thread(target=lambda: received.append(items.get()))
+        reader.start()
+
+        time.sleep(0.02)
+        items.put_nowait('registre')
+        reader.join(timeout=2)
+
+        assert received == ['registre']
+
+
+class TestLogPipelineUnderGevent:
+    """Tests de la interacció amb gunicorn + gevent (Procfile)"""
+
+    def test_writer_uses_unpatched_thread_and_lock(self, monkeypatch):
+        """Test: amb gevent, l'escriptor i el lock de la cua són els originals, no greenlets"""
+        requested = []
+        originals = {('threading', 'Thread'): threading.Thread,
+                     ('_thread', 'allocate_lock'): __import__('_thread').allocate_lock}
+
+        def get_original(module, name):
+            requested.append((module, name))
+            return originals[(module, name)]
+
+        gevent = types.ModuleType('gevent')
+        gevent.monkey = types.SimpleNamespace(get_original=get_original)
+        monkeypatch.setitem(sys.modules, 'gevent', gevent)
+        stream = io.StringIO()
+
+        pipeline = LogPipeline(stream=stream).start()
+        logger = logging.getLogger('test.structured_logging.gevent')
+        pipeline.attach(logger)
+        logger.info('request')
+        pipeline.stop()
+
+        assert set(requested) == set(originals)
+        assert json.loads(stream.getvalue())['message'] == 'request'
+
+    def test_blocked_output_does_not_block_requests(self):
+        """Test: amb stderr bloquejat les peticions continuen i els registres sobrants es perden"""
+        unblock = threading.Event()
+
+        class BlockedStream(io.StringIO):
+            def write(self, text):
+                unblock.wait(5)
+                return super().write(text)
+
+        pipeline = LogPipeline(stream=BlockedStream(), queue_size=10).start()
+        logger = logging.getLogger('test.structured_logging.blocked')
+        pipeline.attach(logger)
+        before = dropped('queue_full')
+
+        start = time.monotonic()
+        for i in range(100):
+            logger.info('request %d', i)
+        elapsed = time.monotonic() - start
+        unblock.set()
+        pipeline.stop()
+
+        assert elapsed < 1
+        assert dropped('queue_full') - before >= 80
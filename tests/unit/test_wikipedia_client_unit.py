@@ -1,8 +1,15 @@
 """
 Tests unitaris per al client de Wikipedia
 """
+import hashlib
+import json
+import time
+from datetime import datetime
+from urllib.parse import unquote
 import pytest
 import responses
+from api import metrics
+from api.rate_limit import UpstreamOverloadedError
 from api.wikipedia_client import WikipediaClient
 from config import Config
 
@@ -128,6 +135,38 @@ class TestWikipediaClient:
 
         assert 'Error fetching events from Wikipedia' in str(exc_info.value)
 
+    @responses.activate
+    def test_get_events_uses_cache(self, wiki_client):
+        """Test: la segona consulta del mateix dia no torna a Wikipedia"""
+        responses.add(
+            responses.GET,
+            'https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/02/16',
+            json={'events': [{'year': 1866, 'text': 'Test event', 'pages': []}]},
+            status=200
+        )
+
+        first = wiki_client.get_events(2, 16, 'es')
+        second = wiki_client.get_events(2, 16, 'es')
+
+        assert first == second
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_feed_variants_count_towards_cache_bytes(self, wiki_client):
+        """Test: el que el feed construeix després de desar-lo se suma a la mida de la cache"""
+        responses.add(
+            responses.GET,
+            'https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/02/16',
+            json={'events': [{'year': 1866, 'text': 'Test event', 'pages': []}]},
+            status=200
+        )
+        feed = wiki_client.get_feed(2, 16, 'es')
+        before = wiki_client.cache.total_bytes
+
+        body, _ = feed.compact()
+
+        assert wiki_client.cache.total_bytes - before >= len(body)
+
     @responses.activate
     def test_get_events_handles_timeout(self, wiki_client):
         """Test: get_events gestiona timeout correctament"""
@@ -139,3 +178,261 @@ class TestWikipediaClient:
 
         with pytest.raises(Exception):
             wiki_client.get_events(2, 16, 'es')
+
+    @responses.activate
+    def test_prewarm_loads_missing_feeds(self, wiki_client):
+        """Test: prewarm carrega els feeds i tolera errors"""
+        responses.add(
+            responses.GET,
+            'https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/02/16',
+            json={'events': []},
+            status=200
+        )
+        responses.add(
+            responses.GET,
+            'https://en.wikipedia.org/api/rest_v1/feed/onthisday/events/02/16',
+            status=500
+        )
+
+        warmed = wiki_client.prewarm([datetime(2026, 2, 16)], ['es', 'en'])
+
+        assert warmed == 1
+        assert wiki_client.is_cached(2, 16, 'es')
+        assert not wiki_client.is_cached(2, 16, 'en')
+
+    @responses.activate
+    def test_upstream_state_tracks_failures(self, wiki_client):
+        """Test: els errors consecutius degraden l'estat de Wikipedia"""
+        url = 'https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/02/16'
+        responses.add(responses.GET, url, status=503)
+
+        for _ in range(WikipediaClient.UPSTREAM_DOWN_AFTER):
+            with pytest.raises(Exception):
+                wiki_client.get_events(2, 16, 'es')
+
+        state = wiki_client.get_upstream_state()
+        assert state['state'] == 'down'
+        assert state['lastFailure'] is not None
+
+        responses.replace(responses.GET, url, json={'events': []}, status=200)
+        wiki_client.get_events(2, 16, 'es')
+
+        assert wiki_client.get_upstream_state()['state'] == 'ok'
+
+
+class TestWikipediaClientHedging:
+    """Tests pel mode de hedging de get_events"""
+
+    URL = 'https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/02/16'
+
+    @responses.activate
+    def test_hedge_answers_when_primary_is_slow(self):
+        """Test: si la primera petició s'encalla, el duplicat respon"""
+        calls = []
+
+        def callback(request):
+            calls.append(request)
+            if len(calls) == 1:
+                time.sleep(0.5)
+                return (200, {}, json.dumps({'events': [{'year': 1, 'text': 'lenta'}]}))
+            return (200, {}, json.dumps({'events': [{'year': 2, 'text': 'ràpida'}]}))
+
+        responses.add_callback(responses.GET, self.URL, callback=callback)
+        client = WikipediaClient(Config.WIKIPEDIA_API_BASE, hedge_max_ratio=1.0,
+                                 hedge_delay=0.05)
+
+        start = time.monotonic()
+        events = client.get_events(2, 16, 'es')
+
+        assert time.monotonic() - start < 0.4
+        assert events[0]['text'] == 'ràpida'
+        assert client.get_hedge_stats() == {'requests': 1, 'hedges': 1}
+
+    @responses.activate
+    def test_no_hedge_when_primary_is_fast(self):
+        """Test: no s'envia cap duplicat si la resposta arriba a temps"""
+        responses.add(responses.GET, self.URL, json={'events': []}, status=200)
+        client = WikipediaClient(Config.WIKIPEDIA_API_BASE, hedge_max_ratio=1.0,
+                                 hedge_delay=1.0)
+
+        client.get_events(2, 16, 'es')
+
+        assert len(responses.calls) == 1
+        assert client.get_hedge_stats()['hedges'] == 0
+
+    @responses.activate
+    def test_hedge_rate_is_capped(self):
+        """Test: el percentatge de hedges no supera el màxim configurat"""
+        def callback(request):
+            time.sleep(0.05)
+            return (200, {}, json.dumps({'events': []}))
+
+        responses.add_callback(responses.GET, self.URL, callback=callback)
+        client = WikipediaClient(Config.WIKIPEDIA_API_BASE, hedge_max_ratio=0.25,
+                                 hedge_delay=0.01, cache_ttl=0)
+
+        for _ in range(8):
+            client.get_events(2, 16, 'es')
+
+        stats = client.get_hedge_stats()
+        assert stats['requests'] == 8
+        assert stats['hedges'] == 2
+
+    def test_hedge_delay_uses_rolling_p95(self):
+        """Test: sense retard fix, es fa servir el p95 de les latències"""
+        client = WikipediaClient(Config.WIKIPEDIA_API_BASE, hedge_max_ratio=0.1)
+        assert client.get_hedge_delay() is None
+
+        client._latencies.extend(i / 100 for i in range(1, 101))
+
+        assert client.get_hedge_delay() == pytest.approx(0.96)
+
+
+class TestWikipediaClientAdaptiveTTL:
+    """Tests pel TTL adaptatiu dels feeds al client"""
+
+    URL = 'https://es.wikipedia.org/api/rest_v1/feed/onthisday/events/03/15'
+
+    @responses.activate
+    def test_refreshed_feed_ttl_follows_changes(self):
+        """Test: un feed que no canvia allarga el TTL; si canvia, l'escurça"""
+        client = WikipediaClient(Config.WIKIPEDIA_API_BASE, cache_ttl=3600,
+                                 cache_min_ttl=300, cache_max_ttl=86400)
+        key = ('es', 'events', 3, 15)
+        for events in ([{'year': 1, 'text': 'A'}], [{'year': 1, 'text': 'A'}],
+                       [{'year': 1, 'text': 'B'}]):
+            responses.add(responses.GET, self.URL, json={'events': events}, status=200)
+
+        client._load_feed(3, 15, 'es')
+        assert 3590 < client.cache.remaining_ttl(key) <= 3600
+        client._load_feed(3, 15, 'es')
+        assert 7190 < client.cache.remaining_ttl(key) <= 7200
+        client._load_feed(3, 15, 'es')
+        assert 3590 < client.cache.remaining_ttl(key) <= 3600
+        assert client.adaptive_ttl.get(key) == {'ttl': 3600, 'refreshes': 2, 'changes': 1}
+
+    @responses.activate
+    def test_content_hash_is_taken_from_the_raw_body(self):
+        """Test: el hash per AdaptiveTTL és el dels bytes rebuts, sense tornar a serialitzar"""
+        client = WikipediaClient(Config.WIKIPEDIA_API_BASE, cache_ttl=3600,
+                                 cache_min_ttl=300, cache_max_ttl=86400)
+        body = b'{"events": [{"year": 1, "text": "A", "pages": []}]}'
+        responses.add(responses.GET, self.URL, body=body, status=200)
+        observed = []
+        client.adaptive_ttl.observe = lambda key, content_hash: observed.append(content_hash)
+
+        client._load_feed(3, 15, 'es')
+
+        assert observed == [hashlib.sha256(body).hexdigest()]
+
+    def test_fixed_ttl_without_bounds(self, wiki_client):
+        """Test: sense límits configurats el TTL és fix"""
+        assert wiki_client.adaptive_ttl is None
+
+
+class TestWikipediaClientEnrichment:
+    """Tests per l'enriquiment dels detalls amb page/summary"""
+
+    SUMMARY = 'https://es.wikipedia.org/api/rest_v1/page/summary/{title}'
+
+    def make_client(self, **kwargs):
+        return WikipediaClient(Config.WIKIPEDIA_API_BASE,
+                               summary_url_template=Config.WIKIPEDIA_SUMMARY_BASE, **kwargs)
+
+    @staticmethod
+    def summary_json(title):
+        return {
+            'title': title,
+            'description': f'Descripció de {title}',
+            'extract': f'Resum de {title}',
+            'thumbnail': {'source': f'https://upload.wikimedia.org/{title}.jpg'},
+            'content_urls': {'desktop': {'page': f'https://es.wikipedia.org/wiki/{title}'}}
+        }
+
+    @responses.activate
+    def test_details_include_summary_of_every_page(self):
+        """Test: cada pàgina relacionada porta el seu resum, en ordre"""
+        for title in ('España', 'Roma'):
+            responses.add(responses.GET, self.SUMMARY.format(title=title),
+                          json=self.summary_json(title), status=200)
+        event = {'year': 1, 'text': 'Event', 'pages': [
+            {'title': 'España', 'revision': '1'}, {'title': 'Roma', 'revision': '7'}
+        ]}
+
+        details = self.make_client().get_event_details(event, 'es')
+
+        assert [page['title'] for page in details['related']] == ['España', 'Roma']
+        assert details['related'][1]['description'] == 'Descripció de Roma'
+        assert details['description'] == 'Resum de España'
+
+    @responses.activate
+    def test_shared_pages_are_fetched_once(self):
+        """Test: una pàgina amb la mateixa revisió es demana un sol cop"""
+        url = self.SUMMARY.format(title='Roma')
+        responses.add(responses.GET, url, json=self.summary_json('Roma'), status=200)
+        client = self.make_client()
+        page = {'title': 'Roma', 'revision': '7'}
+
+        client.get_event_details({'year': 1, 'text': 'A', 'pages': [page]}, 'es')
+        client.get_event_details({'year': 2, 'text': 'B', 'pages': [dict(page)]}, 'es')
+
+        responses.assert_call_count(url, 1)
+
+    @responses.activate
+    def test_failed_summary_falls_back_to_feed_data(self):
+        """Test: si el resum falla, es fan servir les dades del feed"""
+        responses.add(responses.GET, self.SUMMARY.format(title='Roma'), status=500)
+        event = {'year': 1, 'text': 'Event', 'pages': [{
+            'title': 'Roma', 'extract': 'Del feed',
+            'content_urls': {'desktop': {'page': 'https://es.wikipedia.org/wiki/Roma'}}
+        }]}
+
+        details = self.make_client().get_event_details(event, 'es')
+
+        assert details['related'][0]['extract'] == 'Del feed'
+        assert details['description'] == 'Del feed'
+
+    @responses.activate
+    def test_summary_429_penalizes_bucket_and_is_observed(self):
+        """Test: un 429 als resums buida el token bucket, compta com a fallada i es mesura"""
+        responses.add(responses.GET, self.SUMMARY.format(title='Roma'), status=429,
+                      headers={'Retry-After': '30'})
+        client = self.make_client()
+        latency = metrics.UPSTREAM_LATENCY.labels(language='es', status=429)
+        before = latency._sum.get(), client._consecutive_failures
+
+        event = {'year': 1, 'text': 'Event',
+                 'pages': [{'title': 'Roma', 'extract': 'Del feed'}]}
+        details = client.get_event_details(event, 'es')
+
+        assert details['related'][0]['extract'] == 'Del feed'
+        assert latency._sum.get() > before[0]
+        assert client._consecutive_failures == before[1] + 1
+        with pytest.raises(UpstreamOverloadedError):
+            client.limiter.bucket.reserve(time.monotonic() + 1)
+
+    def test_enrichment_is_disabled_by_default(self, wiki_client, sample_event):
+        """Test: sense plantilla de resums no s'afegeix related"""
+        assert 'related' not in wiki_client.get_event_details(sample_event, 'es')
+
+    @responses.activate
+    def test_batch_details_start_all_summaries_together(self):
+        """Test: en un lot, els resums de tots els events s'esperen un sol cop"""
+        def slow_summary(request):
+            time.sleep(0.2)
+            title = unquote(request.url.rsplit('/', 1)[1])
+            return 200, {}, json.dumps(self.summary_json(title))
+
+        for title in ('España', 'Roma', 'Atenas'):
+            responses.add_callback(responses.GET, self.SUMMARY.format(title=title),
+                                   callback=slow_summary, content_type='application/json')
+        events = [{'year': i, 'text': title, 'pages': [{'title': title}]}
+                  for i, title in enumerate(('España', 'Roma', 'Atenas'))]
+        client = self.make_client(enrich_timeout=0.3)
+
+        start = time.monotonic()
+        details = client.get_events_details(events, 'es')
+
+        assert time.monotonic() - start < 0.5
+        assert [d['related'][0]['description'] for d in details] == [
+            'Descripció de España', 'Descripció de Roma', 'Descripció de Atenas']